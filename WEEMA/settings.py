@@ -16,6 +16,7 @@ import environ
 import os
 import cloudinary
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Initialize environ
 env = environ.Env(
@@ -126,6 +127,43 @@ DATABASES = {
 }
 
 
+# Caches
+# The "reports" alias holds analytics report results (see analytics/utils/report_cache.py).
+# Every web worker, the report worker and management commands must share it: a write
+# only invalidates reports cached where its version bump lands. REPORT_CACHE_URL
+# defaults to a database table (create it with python manage.py createcachetable);
+# redis:// or pymemcache:// are faster. locmemcache:// is per process, so it is only
+# accepted with DEBUG on.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    'reports': env.cache('REPORT_CACHE_URL', default='dbcache://report_cache?MAX_ENTRIES=20000'),
+}
+if not DEBUG and CACHES['reports']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    raise ImproperlyConfigured(
+        "REPORT_CACHE_URL must point to a cache shared by all processes (dbcache://, redis://, ...) "
+        "when DEBUG is off; a locmemcache:// report cache is never invalidated by other processes."
+    )
+REPORT_CACHE_TIMEOUT = env.int('REPORT_CACHE_TIMEOUT', default=60 * 60 * 24)
+
+# Files rendered by the report job worker (python manage.py run_report_worker)
+REPORT_ARTIFACT_ROOT = env('REPORT_ARTIFACT_ROOT', default=os.path.join(BASE_DIR, 'report_artifacts'))
+# Finished report jobs and their files are deleted this many days after they finish
+REPORT_JOB_RETENTION_DAYS = env.int('REPORT_JOB_RETENTION_DAYS', default=7)
+
+# Rendered chart pages of the graph PDF, keyed by a hash of their data; safe to clear
+CHART_CACHE_DIR = env('CHART_CACHE_DIR', default=os.path.join(BASE_DIR, 'chart_cache'))
+# Pages kept in CHART_CACHE_DIR; the least recently used beyond this are deleted
+CHART_CACHE_MAX_PAGES = env.int('CHART_CACHE_MAX_PAGES', default=2000)
+# Processes charts are drawn in; 1 renders in the request process
+CHART_RENDER_WORKERS = env.int('CHART_RENDER_WORKERS', default=min(3, os.cpu_count() or 1))
+
+# Answer survey metric queries from an in-process NumPy copy of SixMonthData and
+# AnnualData (analytics/utils/columnar_snapshot.py), caught up with the database
+# at most every ANALYTICS_SNAPSHOT_MAX_AGE seconds. Costs memory in every worker.
+ANALYTICS_SNAPSHOT_ENABLED = env.bool('ANALYTICS_SNAPSHOT_ENABLED', default=False)
+ANALYTICS_SNAPSHOT_MAX_AGE = env.int('ANALYTICS_SNAPSHOT_MAX_AGE', default=30)
+
+
 cloudinary.config(
     cloud_name = env('CLOUDINARY_CLOUD_NAME'),
     api_key = env('CLOUDINARY_API_KEY'),
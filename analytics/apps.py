@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "analytics"
+
+    def ready(self):
+        from .signals import (
+            connect_rollup_signals, connect_member_growth_signals, connect_bucket_signals, connect_report_cache_signals,
+            connect_deletion_signals,
+        )
+        connect_rollup_signals()
+        connect_member_growth_signals()
+        connect_bucket_signals()
+        connect_report_cache_signals()
+        connect_deletion_signals()
@@ -1,23 +1,15 @@
-import io
-from datetime import datetime
-
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.backends.backend_pdf import PdfPages
-
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils.dateparse import parse_datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .utils.graph_analytics import get_location_level_graph_data, get_group_level_financial_metrics
-from .utils.analytics_util import dump_all_data_report
+from .utils.analytics_util import dump_all_data_report, delta_export_report
+from .utils.chart_util import chart_spec, render_charts_pdf
+from .utils.export_util import stream_csv_zip
+from .utils.report_cache import get_cached_report
+from .utils.scope import AnalyticsScope, parse_id, parse_report_datetime
 from cluster_management.models import Cluster
-import csv
-import zipfile
-from io import BytesIO, StringIO
 
 
 class LocationAnalyticsGraphsPDFView(APIView):
@@ -40,7 +32,14 @@ class LocationAnalyticsGraphsPDFView(APIView):
         end_date = parse_datetime(end_date_str) if end_date_str else None
 
         # Get aggregated analytics per location
-        analytics = get_location_level_graph_data(start_date=start_date, end_date=end_date, cluster=cluster)
+        try:
+            scope = AnalyticsScope(start_date=start_date, end_date=end_date, cluster=cluster)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        analytics = get_cached_report(
+            "location_graph_data", scope,
+            lambda: get_location_level_graph_data(start_date=start_date, end_date=end_date, cluster=cluster),
+        )
         
         if json:
             return Response(analytics, status = status.HTTP_200_OK)
@@ -48,105 +47,28 @@ class LocationAnalyticsGraphsPDFView(APIView):
         # Sort locations for consistent ordering
         locations = sorted(analytics.keys())
 
-        # Prepare arrays for plotting
-        total_groups = [analytics[loc]["total_groups"] for loc in locations]
-        total_members = [analytics[loc]["total_members"] for loc in locations]
-        total_savings = [analytics[loc]["total_savings"] for loc in locations]
-        total_capital = [analytics[loc]["total_capital"] for loc in locations]
-        total_loan_circulated = [analytics[loc]["total_loan_circulated"] for loc in locations]
-        max_loan_taken = [analytics[loc]["max_loan_taken"] for loc in locations]
-        total_loan_other_sources = [analytics[loc]["total_loan_other_sources"] for loc in locations]
-
-        # Create a BytesIO buffer to save the PDF
-        buffer = io.BytesIO()
-
-        # Create a PdfPages object to compile multiple pages into a single PDF
-        with PdfPages(buffer) as pdf:
-            
-            # def add_header(canvas, doc):
-            #     canvas.saveState()
-                
-            #     # Logo
-            #     logo_path = os.path.join(settings.BASE_DIR, 'logo_real.png')
-            #     if os.path.exists(logo_path):
-            #         canvas.drawImage(logo_path, 40, 500, width=80, height=80, preserveAspectRatio=True)
-
-            #     # Company Name
-            #     canvas.setFont("Helvetica-Bold", 16)
-            #     canvas.drawCentredString(400, 560, "WEEMA")
-
-            #     # Report Title
-            #     canvas.setFont("Helvetica", 12)
-            #     canvas.drawCentredString(400, 540, "Self Help Group (SHG) Data Summary Report")
-
-            #     # Report Date
-            #     canvas.setFont("Helvetica", 10)
-            #     canvas.drawCentredString(400, 520, f"Date of Report: {datetime.now().strftime('%Y-%m-%d')}")
-
-            #     canvas.restoreState()
-            # -------------------
+        def column(key):
+            return [analytics[loc][key] for loc in locations]
+
+        charts = [
             # Graph 1: Stacked Bar Graph (Groups and Members)
-            fig1, ax1 = plt.subplots(figsize=(8, 6))
-            x = np.arange(len(locations))
-            # Plot total groups (bottom of the bar)
-            bar1 = ax1.bar(x, total_groups, label="Total Groups", color="skyblue")
-            # Plot total members on top of groups (stacked)
-            bar2 = ax1.bar(x, total_members, bottom=total_groups, label="Total Members", color="orange")
-            ax1.set_title("Number of Groups & Members by Location")
-            ax1.set_xticks(x)
-            ax1.set_xticklabels(locations, rotation=45, ha="right")
-            ax1.set_ylabel("Count")
-            ax1.legend()
-            fig1.tight_layout()
-            pdf.savefig(fig1)
-            plt.close(fig1)
-
-            # -------------------
+            chart_spec("stacked_bar", "Number of Groups & Members by Location", "Count", locations, [
+                ("Total Groups", column("total_groups"), "skyblue"),
+                ("Total Members", column("total_members"), "orange"),
+            ]),
             # Graph 2: Grouped Bar Chart for Financial Metrics
-            fig2, ax2 = plt.subplots(figsize=(8, 6))
-            x = np.arange(len(locations))
-            width = 0.25  # width of the bars
-            ax2.bar(x - width, total_savings, width, label="Total Savings", color="green")
-            ax2.bar(x, total_capital, width, label="Total Capital", color="blue")
-            ax2.bar(x + width, total_loan_circulated, width, label="Total Loan Circulated", color="red")
-            ax2.set_title("Financial Metrics by Location")
-            ax2.set_xticks(x)
-            ax2.set_xticklabels(locations, rotation=45, ha="right")
-            ax2.set_ylabel("Amount")
-            ax2.legend()
-            fig2.tight_layout()
-            pdf.savefig(fig2)
-            plt.close(fig2)
-
-            # -------------------
+            chart_spec("grouped_bar", "Financial Metrics by Location", "Amount", locations, [
+                ("Total Savings", column("total_savings"), "green"),
+                ("Total Capital", column("total_capital"), "blue"),
+                ("Total Loan Circulated", column("total_loan_circulated"), "red"),
+            ]),
             # Graph 3: Line Chart for Loan Data
-            fig3, ax3 = plt.subplots(figsize=(8, 6))
-            x = np.arange(len(locations))
-            ax3.plot(x, max_loan_taken, marker="o", linestyle="-", label="Max Loan Taken", color="purple")
-            ax3.plot(x, total_loan_other_sources, marker="o", linestyle="-", label="Total Loan from Other Sources", color="brown")
-            ax3.set_title("Loan Metrics by Location")
-            ax3.set_xticks(x)
-            ax3.set_xticklabels(locations, rotation=45, ha="right")
-            ax3.set_ylabel("Loan Amount")
-            ax3.legend()
-            fig3.tight_layout()
-            pdf.savefig(fig3)
-            plt.close(fig3)
-
-            # # Apply header to all pages
-            # from reportlab.pdfgen import canvas
-            # from reportlab.lib.pagesizes import landscape, letter
-            # import os
-            # from django.conf import settings
-           
-            # c = canvas.Canvas(pdf._file, pagesize=landscape(letter))
-            # add_header(c, pdf)
-            # c.showPage()
-            # c.save()
-
-        # Get PDF data from buffer
-        pdf_data = buffer.getvalue()
-        buffer.close()
+            chart_spec("line", "Loan Metrics by Location", "Loan Amount", locations, [
+                ("Max Loan Taken", column("max_loan_taken"), "purple"),
+                ("Total Loan from Other Sources", column("total_loan_other_sources"), "brown"),
+            ]),
+        ]
+        pdf_data = render_charts_pdf(charts)
 
         # Return PDF as response
         return HttpResponse(pdf_data, content_type="application/pdf")
@@ -166,7 +88,9 @@ class GroupLevelFinancialMetricsAPIView(APIView):
         cluster_obj = None
         if cluster_id:
             try:
-                cluster_obj = Cluster.objects.get(id=cluster_id)
+                cluster_obj = Cluster.objects.get(id=parse_id("cluster", cluster_id))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             except Cluster.DoesNotExist:
                 return Response({"error": "Cluster not found"}, status=status.HTTP_404_NOT_FOUND)
         
@@ -181,57 +105,54 @@ class GroupLevelFinancialMetricsAPIView(APIView):
 
 
 class DumpAllDataView(APIView):
+    """
+    ZIP of CSV dumps of the survey data. With delta=1 it is an incremental
+    export instead: every column of the rows created, changed (since=<the
+    previous X-Next-Watermark>) or deleted since the last pull, see
+    delta_export_report. Without since, delta=1 is the initial full load.
+    """
+
     def get(self, request, *args, **kwargs):
+        if request.query_params.get('delta'):
+            return self.get_delta(request)
+
         start_date_str = request.query_params.get('start_date', None)
         end_date_str = request.query_params.get('end_date', None)
         cluster = request.query_params.get('cluster', None)
         facilitator = request.query_params.get('facilitator', None)
         
-        # Extract data using your function (which returns dict of 2D arrays)
+        # Lazy row iterators, one per CSV file (nothing is loaded up front)
         data = dump_all_data_report(start_date=start_date_str, end_date=end_date_str, cluster=cluster, facilitator=facilitator)
-
-        # Create a BytesIO stream to hold the ZIP file
-        zip_buffer = BytesIO()
-
-        # Create a ZIP file in memory
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Prepare the 'annual_data' CSV file
-            annual_csv_file = StringIO()
-            writer = csv.writer(annual_csv_file)
-            for row in data["annual_data"]:
-                writer.writerow(row)
-            # Encode to bytes and write to ZIP
-            annual_bytes = annual_csv_file.getvalue().encode('utf-8')
-            zip_file.writestr("annual_data.csv", annual_bytes)
-
-            # Prepare the 'six_month_data' CSV file
-            six_month_csv_file = StringIO()
-            writer = csv.writer(six_month_csv_file)
-            for row in data["six_month_data"]:
-                writer.writerow(row)
-            six_month_bytes = six_month_csv_file.getvalue().encode('utf-8')
-            zip_file.writestr("six_month_data.csv", six_month_bytes)
-
-            # Prepare the 'children_status' CSV file
-            children_status_csv_file = StringIO()
-            writer = csv.writer(children_status_csv_file)
-            for row in data["children_status"]:
-                writer.writerow(row)
-            children_status_bytes = children_status_csv_file.getvalue().encode('utf-8')
-            zip_file.writestr("children_status.csv", children_status_bytes)
-
-            # Prepare the 'group_status' CSV file
-            group_status_csv_file = StringIO()
-            writer = csv.writer(group_status_csv_file)
-            for row in data["group_status"]:
-                writer.writerow(row)
-            group_status_bytes = group_status_csv_file.getvalue().encode('utf-8')
-            zip_file.writestr("group_status.csv", group_status_bytes)
-
-        # Ensure the buffer is at the beginning
-        zip_buffer.seek(0)
-
-        # Send the ZIP file as the response
-        response = HttpResponse(zip_buffer, content_type='application/zip')
+        if "error" in data:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+
+        # Stream the ZIP file as it is being written
+        response = StreamingHttpResponse(
+            stream_csv_zip({
+                "annual_data.csv": data["annual_data"],
+                "six_month_data.csv": data["six_month_data"],
+                "children_status.csv": data["children_status"],
+                "group_status.csv": data["group_status"],
+            }),
+            content_type='application/zip',
+        )
         response['Content-Disposition'] = 'attachment; filename="data.zip"'
-        return response
\ No newline at end of file
+        return response
+
+    def get_delta(self, request):
+        since = request.query_params.get('since')
+        if any(request.query_params.get(key) for key in ('start_date', 'end_date', 'cluster', 'facilitator')):
+            return Response({"error": "Delta exports cover all data; use since only."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since = parse_report_datetime(since) if since else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        watermark, sections = delta_export_report(since=since)
+        files = {f"{section}.csv": rows for section, rows in sections.items()}
+        files["watermark.csv"] = [["since", "next_watermark"], [since.isoformat() if since else "", watermark.isoformat()]]
+
+        response = StreamingHttpResponse(stream_csv_zip(files), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="delta_{watermark:%Y%m%dT%H%M%S}.zip"'
+        response['X-Next-Watermark'] = watermark.isoformat()
+        return response
@@ -0,0 +1,57 @@
+from django.http import FileResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import ReportJob
+from .serializers import ReportJobSerializer
+
+
+class ReportJobCreateView(APIView):
+    """
+    Queue a heavy report (pdf_table, pdf_graph or dump_all_data) for the
+    report worker. params are the query parameters the synchronous endpoint
+    takes (start_date, end_date, cluster, ...). Poll the returned job for
+    status and progress, then download its artifact.
+    """
+
+    def post(self, request):
+        serializer = ReportJobSerializer(data=request.data, context={"request": request})
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        requested_by = request.user if request.user.is_authenticated else None
+        job = serializer.save(requested_by=requested_by)
+        return Response(ReportJobSerializer(job, context={"request": request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ReportJobDetailView(APIView):
+    """
+    Status, progress and (once completed) download URL of a report job.
+    """
+
+    def get(self, request, job_id):
+        try:
+            job = ReportJob.objects.get(id=job_id)
+        except ReportJob.DoesNotExist:
+            return Response({"error": "Report job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ReportJobSerializer(job, context={"request": request}).data, status=status.HTTP_200_OK)
+
+
+class ReportJobDownloadView(APIView):
+    """
+    Stream the artifact of a completed report job from disk.
+    """
+
+    def get(self, request, job_id):
+        try:
+            job = ReportJob.objects.get(id=job_id)
+        except ReportJob.DoesNotExist:
+            return Response({"error": "Report job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if job.status != ReportJob.STATUS_COMPLETED or not job.artifact:
+            return Response({"error": f"Report job is {job.status}", "status": job.status},
+                            status=status.HTTP_409_CONFLICT)
+
+        return FileResponse(job.artifact.open("rb"), as_attachment=True, filename=job.filename,
+                            content_type=job.content_type)
@@ -0,0 +1,151 @@
+import re
+import statistics
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from analytics.views import (
+    SystemLevelReportView,
+    ClusterLevelReportView,
+    SelfHelpGroupLevelReportView,
+    FacilitatorAnalyticsView,
+    DashboardMetricsView,
+    LoanSavingReportView,
+    MemberDataReportView,
+    LocationLevelAnalyticsPDFView,
+)
+from analytics.graph_views import LocationAnalyticsGraphsPDFView, GroupLevelFinancialMetricsAPIView, DumpAllDataView
+from analytics.utils.report_cache import get_report_cache
+from cluster_management.models import Cluster, SelfHelpGroup
+from user_management.models import WEEMAEntities
+
+
+INDEX_IN_PLAN = re.compile(r"(?:Index Scan|Index Only Scan) using (\w+)|Bitmap Index Scan on (\w+)")
+
+
+class Command(BaseCommand):
+    help = ("Time every analytics endpoint and show the indexes its query plans use. "
+            "With --compare, the declared model indexes are dropped inside a rolled-back "
+            "transaction to show the before/after difference. Run against a copy of the "
+            "data: dropping an index locks its table until the rollback.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per endpoint; the median is reported.")
+        parser.add_argument("--start-date", help="Add a start_date/end_date range to the endpoints that accept one.")
+        parser.add_argument("--end-date")
+        parser.add_argument("--compare", action="store_true", help="Also measure without the declared indexes.")
+        parser.add_argument("--explain", action="store_true", help="Print the full EXPLAIN ANALYZE plan of every query.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        endpoints = self.get_endpoints()
+
+        with transaction.atomic():
+            results = {"with indexes": self.measure(endpoints)}
+            if options["compare"]:
+                dropped = self.drop_declared_indexes()
+                self.stdout.write(f"Dropped {len(dropped)} declared indexes (rolled back afterwards).")
+                results["without indexes"] = self.measure(endpoints)
+            transaction.set_rollback(True)
+
+        for phase, measurements in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{phase}"))
+            for label, (median_ms, query_count, indexes, plans) in measurements.items():
+                self.stdout.write(f"{label:<40} {median_ms:>9.1f} ms {query_count:>4} queries  "
+                                  f"indexes: {', '.join(sorted(indexes)) or '-'}")
+                if options["explain"]:
+                    for sql, plan in plans:
+                        self.stdout.write(f"\n  {sql[:200]}\n" + "\n".join(f"    {line}" for line in plan))
+
+        if options["compare"]:
+            self.stdout.write(self.style.MIGRATE_HEADING("\nspeed-up"))
+            for label, (after_ms, *_) in results["with indexes"].items():
+                before_ms = results["without indexes"][label][0]
+                self.stdout.write(f"{label:<40} {before_ms:>9.1f} -> {after_ms:>9.1f} ms "
+                                  f"({before_ms / after_ms if after_ms else 0:.1f}x)")
+
+    def get_endpoints(self):
+        """(label, view, kwargs, query params) of every analytics endpoint the data can serve."""
+        dates = {}
+        if self.options["start_date"] and self.options["end_date"]:
+            dates = {"start_date": self.options["start_date"], "end_date": self.options["end_date"]}
+
+        cluster = Cluster.objects.order_by("-total_groups").first()
+        group = SelfHelpGroup.objects.order_by("-total_members").first()
+        facilitator = WEEMAEntities.objects.filter(user__user_type="facilitator").first()
+
+        endpoints = [
+            ("system", SystemLevelReportView, {}, dates),
+            ("dashboard", DashboardMetricsView, {}, dates),
+            ("pdf table", LocationLevelAnalyticsPDFView, {}, dates),
+            ("graph data", LocationAnalyticsGraphsPDFView, {}, {**dates, "json": "1"}),
+            ("quality control", GroupLevelFinancialMetricsAPIView, {}, dates),
+            ("dump all data", DumpAllDataView, {}, dates),
+        ]
+        if cluster:
+            endpoints += [
+                ("cluster", ClusterLevelReportView, {"cluster_id": cluster.id}, dates),
+                ("loan-saving cluster", LoanSavingReportView, {"entity_type": "cluster", "entity_id": cluster.id}, dates),
+                ("member-data cluster", MemberDataReportView, {"cluster_id": cluster.id}, {}),
+            ]
+        if group:
+            endpoints += [
+                ("group", SelfHelpGroupLevelReportView, {"group_id": group.id}, dates),
+                ("member-data group", MemberDataReportView, {"group_id": group.id}, {}),
+            ]
+        if facilitator:
+            endpoints.append(("facilitator", FacilitatorAnalyticsView, {"facilitator_id": facilitator.id}, dates))
+        return endpoints
+
+    def measure(self, endpoints):
+        factory = RequestFactory()
+        measurements = {}
+        for label, view_class, kwargs, params in endpoints:
+            view = view_class.as_view()
+            timings = []
+            # The first run warms connections and caches and is not timed
+            for run in range(self.options["repeat"] + 1):
+                # Measure the queries, not the report cache
+                get_report_cache().clear()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = view(factory.get("/", params), **kwargs)
+                    if response.streaming:
+                        for _ in response.streaming_content:
+                            pass
+                    if run:
+                        timings.append((time.perf_counter() - started) * 1000)
+
+            indexes, plans = set(), []
+            for query in captured.captured_queries:
+                plan = self.explain(query["sql"])
+                if plan is None:
+                    continue
+                plans.append((query["sql"], plan))
+                for line in plan:
+                    for match in INDEX_IN_PLAN.finditer(line):
+                        indexes.add(match.group(1) or match.group(2))
+            measurements[label] = (statistics.median(timings), len(captured.captured_queries), indexes, plans)
+        return measurements
+
+    def explain(self, sql):
+        if not sql.lstrip().upper().startswith("SELECT"):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")
+            return [row[0] for row in cursor.fetchall()]
+
+    def drop_declared_indexes(self):
+        names = [
+            index.name
+            for model in apps.get_models()
+            for index in model._meta.indexes
+        ]
+        with connection.cursor() as cursor:
+            for name in names:
+                cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+        return names
@@ -0,0 +1,61 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Libraries only report rendering needs; a CRUD worker should load none of them
+RENDERING_MODULES = ["matplotlib", "numpy", "reportlab", "PIL", "pypdf"]
+
+# Modules that draw reports; importing them brings in RENDERING_MODULES
+RENDERER_MODULES = ["analytics.utils.pdf_util", "analytics.utils.chart_renderer", "pypdf"]
+
+# Run in a fresh interpreter: boot Django the way the WSGI server does,
+# load the URLconf, then import the modules given as arguments
+WORKER_BOOT = """
+import json, resource, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+for name in sys.argv[2:]:
+    __import__(name)
+print(json.dumps({
+    "ms": (time.perf_counter() - started) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in json.loads(sys.argv[1]) if name in sys.modules],
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = ("Measure the boot time and peak memory of a freshly started worker, and which "
+            "report rendering libraries it loads. The renderers row shows the cost a worker "
+            "pays once it renders its first PDF (and what every worker paid when the "
+            "analytics views imported them at module level).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Workers booted per row; the median is reported.")
+
+    def handle(self, *args, **options):
+        rows = {
+            "worker boot": [],
+            "worker boot + renderers": RENDERER_MODULES,
+        }
+        for label, modules in rows.items():
+            samples = [self.boot_worker(modules) for _ in range(options["repeat"])]
+            boot_ms = statistics.median(sample["ms"] for sample in samples)
+            rss_mb = statistics.median(sample["rss_mb"] for sample in samples)
+            loaded = ", ".join(samples[0]["loaded"]) or "-"
+            self.stdout.write(f"{label:<28} {boot_ms:>8.0f} ms {rss_mb:>7.1f} MB  rendering libraries: {loaded}")
+
+    def boot_worker(self, modules):
+        result = subprocess.run(
+            [sys.executable, "-c", WORKER_BOOT, json.dumps(RENDERING_MODULES), *modules],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from analytics.utils.metric_query import run_metric_query
+
+
+# Metric queries mixing snapshot models (SixMonthData, AnnualData) with SQL
+# models (SelfHelpGroup, Member), so both paths' rows must merge by key
+CHECK_QUERIES = [
+    (["members", "iga_capital_total"], ["group"]),
+    (["groups", "savings_total", "six_month_submissions"], ["cluster"]),
+    (["members", "loan_circulated_total"], ["location", "group"]),
+    (["six_month_submissions", "annual_submissions", "members"], ["facilitator", "month"]),
+    (["household_size_total", "savings_avg", "monthly_income_avg"], []),
+]
+
+
+def _normalize(row):
+    return {
+        name: round(float(value), 6) if isinstance(value, (int, float, Decimal)) else value
+        for name, value in row.items()
+    }
+
+
+class Command(BaseCommand):
+    help = ("Run metric queries with the columnar snapshot (ANALYTICS_SNAPSHOT_ENABLED) and "
+            "without it and report every row where they differ, in values or in key types.")
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for metrics, dimensions in CHECK_QUERIES:
+            with override_settings(ANALYTICS_SNAPSHOT_ENABLED=False):
+                sql_rows = run_metric_query(metrics, dimensions)
+            with override_settings(ANALYTICS_SNAPSHOT_ENABLED=True):
+                snapshot_rows = run_metric_query(metrics, dimensions)
+
+            # Keys keep their types, so str vs UUID ids show up as separate rows
+            def by_key(rows):
+                return {tuple((row[name], type(row[name])) for name in dimensions): _normalize(row) for row in rows}
+
+            sql_rows, snapshot_rows = by_key(sql_rows), by_key(snapshot_rows)
+            differing = [key for key in sql_rows.keys() | snapshot_rows.keys() if sql_rows.get(key) != snapshot_rows.get(key)]
+            label = f"{', '.join(metrics)} by {', '.join(dimensions) or '-'}"
+            if differing:
+                mismatches += len(differing)
+                self.stdout.write(self.style.ERROR(f"{label}: {len(differing)} of {len(sql_rows)} rows differ"))
+                for key in differing[:5]:
+                    self.stdout.write(f"  sql {sql_rows.get(key)}\n  snapshot {snapshot_rows.get(key)}")
+            else:
+                self.stdout.write(f"{label}: {len(sql_rows)} rows match")
+
+        if mismatches:
+            raise CommandError(f"{mismatches} rows differ between the snapshot and SQL.")
+        self.stdout.write(self.style.SUCCESS("Snapshot and SQL results match."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from analytics.utils.report_cache import invalidate_all_reports
+from analytics.utils.rollup_util import rebuild_group_rollups, rebuild_member_growth
+
+
+class Command(BaseCommand):
+    help = "Rebuild the GroupRollup and GroupMemberGrowth tables from scratch out of the member and survey data."
+
+    def handle(self, *args, **options):
+        total = rebuild_group_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} group rollup rows."))
+        total = rebuild_member_growth()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} member growth rows."))
+        # Reports cached from the old rollups would otherwise be served until their next write
+        invalidate_all_reports()
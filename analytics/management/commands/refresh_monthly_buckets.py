@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from analytics.utils.bucket_util import refresh_monthly_buckets
+
+
+class Command(BaseCommand):
+    help = ("Recompute the GroupMonthlyBucket rows of the months whose survey data changed since the last run. "
+            "Meant to be scheduled (e.g. hourly cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Rebuild every bucket instead of only the changed months.")
+
+    def handle(self, *args, **options):
+        total = refresh_monthly_buckets(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {total} monthly bucket rows."))
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from analytics.utils.report_jobs import claim_next_job, run_job, requeue_stale_jobs, delete_expired_jobs
+
+
+# Seconds between sweeps of expired jobs while the worker is idle
+SWEEP_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = ("Process queued report jobs (PDF and data dump exports) outside the web workers. "
+            "Several workers can run side by side. While idle, jobs finished more than "
+            "REPORT_JOB_RETENTION_DAYS ago are deleted with their files.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument(
+            "--requeue-stale", type=int, metavar="MINUTES",
+            help="On start, requeue jobs that have been running for longer than this (crashed workers).",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_stale"]:
+            requeued = requeue_stale_jobs(timedelta(minutes=options["requeue_stale"]))
+            self.stdout.write(f"Requeued {requeued} stale report jobs.")
+
+        self.stdout.write("Report worker started.")
+        last_sweep = None
+        try:
+            while True:
+                close_old_connections()
+                job = claim_next_job()
+                if job is None:
+                    if last_sweep is None or time.monotonic() - last_sweep > SWEEP_INTERVAL:
+                        deleted = delete_expired_jobs()
+                        last_sweep = time.monotonic()
+                        if deleted:
+                            self.stdout.write(f"Deleted {deleted} expired report jobs.")
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                self.stdout.write(f"Running {job.report_type} job {job.id}...")
+                job = run_job(job)
+                if job.status == job.STATUS_COMPLETED:
+                    self.stdout.write(self.style.SUCCESS(f"Job {job.id} completed: {job.artifact.name}"))
+                else:
+                    self.stdout.write(self.style.ERROR(f"Job {job.id} failed: {job.error}"))
+        except KeyboardInterrupt:
+            self.stdout.write("Report worker stopped.")
@@ -1,3 +1,168 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from cluster_management.models import SelfHelpGroup
+from WEEMA.models import BaseModel
 
-# Create your models here.
+
+# Pre-aggregated survey totals, one row per group and data-collection period
+class GroupRollup(BaseModel):
+    group = models.ForeignKey(SelfHelpGroup, on_delete=models.CASCADE, related_name="rollups")
+    # First day of the half-year (Jan 1 or Jul 1) the source rows were created in
+    period_start = models.DateField()
+
+    # Member
+    member_count = models.IntegerField(default=0)
+    hh_size_total = models.IntegerField(default=0)
+
+    # AnnualData
+    annual_data_count = models.IntegerField(default=0)
+    savings_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # SixMonthData
+    six_month_data_count = models.IntegerField(default=0)
+    iga_capital_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    iga_capital_count = models.IntegerField(default=0)
+    loan_circulated_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    other_source_loan_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    # AnnualSelfHelpGroupData
+    group_data_count = models.IntegerField(default=0)
+    shg_capital_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    social_expenditure_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "period_start"], name="unique_group_rollup_period"),
+        ]
+
+    def __str__(self):
+        return f"{self.group} ({self.period_start})"
+
+
+# Members joined per group and calendar month, the dashboard's growth series.
+# Maintained by the same signal deltas as GroupRollup.
+class GroupMemberGrowth(BaseModel):
+    group = models.ForeignKey(SelfHelpGroup, on_delete=models.CASCADE, related_name="member_growth")
+    # First day of the month (in settings.TIME_ZONE) the members were created in
+    period_start = models.DateField()
+    members_joined = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "period_start"], name="unique_group_member_growth_period"),
+        ]
+
+    def __str__(self):
+        return f"{self.group} ({self.period_start:%Y-%m})"
+
+
+# Pre-aggregated survey figures, one row per group and calendar month. Unlike
+# GroupRollup these are refreshed in batches by the refresh_monthly_buckets
+# command; is_stale flags months whose source rows were deleted or moved.
+class GroupMonthlyBucket(BaseModel):
+    group = models.ForeignKey(SelfHelpGroup, on_delete=models.CASCADE, related_name="monthly_buckets")
+    # First day of the month (in settings.TIME_ZONE) the source rows were created in
+    month = models.DateField()
+    is_stale = models.BooleanField(default=False)
+
+    # SixMonthData
+    six_month_data_count = models.IntegerField(default=0)
+    iga_capital_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    iga_capital_count = models.IntegerField(default=0)
+    iga_capital_min = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    iga_capital_max = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    loan_circulated_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    loan_circulated_count = models.IntegerField(default=0)
+    loan_circulated_max = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    other_source_loan_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    other_source_loan_count = models.IntegerField(default=0)
+    child_diarrhea_days_total = models.IntegerField(default=0)
+    child_other_illness_days_total = models.IntegerField(default=0)
+
+    # AnnualData
+    annual_data_count = models.IntegerField(default=0)
+    savings_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    savings_min = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    savings_max = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    child_mortality_total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["group", "month"], name="unique_group_monthly_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.group} ({self.month:%Y-%m})"
+
+
+# Point in time up to which an incrementally refreshed table is current
+class RefreshWatermark(BaseModel):
+    name = models.CharField(max_length=100, unique=True)
+    watermark = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
+
+# A deleted row of a delta-exported model, passed on to incremental exports as a tombstone
+class DeletedRecord(BaseModel):
+    model_name = models.CharField(max_length=100)
+    object_id = models.UUIDField()
+
+    class Meta:
+        indexes = [
+            # Delta exports read the tombstones of a deleted-at (created_at) window
+            models.Index(fields=["created_at"], name="deletedrecord_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id}"
+
+
+def report_artifact_storage():
+    return FileSystemStorage(location=settings.REPORT_ARTIFACT_ROOT)
+
+
+# A heavy report rendered by the run_report_worker command instead of inside the request
+class ReportJob(BaseModel):
+    REPORT_TYPE_CHOICES = [
+        ("pdf_table", "Location Level Table PDF"),
+        ("pdf_graph", "Location Level Graphs PDF"),
+        ("dump_all_data", "All Data CSV Dump"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    report_type = models.CharField(max_length=50, choices=REPORT_TYPE_CHOICES)
+    # Query parameters the report view is rendered with (start_date, cluster, ...)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)  # Percent
+    error = models.TextField(blank=True, null=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="report_jobs"
+    )
+    artifact = models.FileField(storage=report_artifact_storage, upload_to="reports/%Y/%m/", null=True, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "oldest pending job" lookup
+            models.Index(fields=["status", "created_at"], name="reportjob_status_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} ({self.status})"
@@ -0,0 +1,31 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from .models import ReportJob
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'params', 'status', 'progress', 'error',
+            'created_at', 'started_at', 'finished_at', 'download_url',
+        ]
+        read_only_fields = ['status', 'progress', 'error', 'started_at', 'finished_at']
+
+    def get_download_url(self, job):
+        if job.status != ReportJob.STATUS_COMPLETED:
+            return None
+        url = reverse('report_job_download', kwargs={'job_id': job.id})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def validate_params(self, params):
+        # Rendered as query parameters of the report view
+        if not isinstance(params, dict) or not all(
+            isinstance(value, (str, int, float)) for value in params.values()
+        ):
+            raise serializers.ValidationError("params must be an object of query parameter values.")
+        return params
@@ -0,0 +1,142 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+
+from cluster_management.models import SelfHelpGroup, Member
+from analytics.models import GroupMemberGrowth, DeletedRecord
+from .utils.rollup_util import ROLLUP_SOURCES, MEMBER_GROWTH_SOURCE, apply_rollup_changes, move_member_survey_rollups
+from .utils.report_cache import get_instance_tokens, bump_report_versions
+from .utils.analytics_util import DELTA_EXPORT_MODELS
+from .utils.bucket_util import BUCKET_SOURCES, get_month, mark_buckets_stale, mark_member_buckets_stale
+
+
+# The previous contribution is read before the write so post_save/post_delete
+# can apply the exact delta.
+
+def capture_previous_rollup(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._rollup_previous = None
+    else:
+        instance._rollup_previous = ROLLUP_SOURCES[sender].read(instance.pk)
+
+
+def update_rollup_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    current = ROLLUP_SOURCES[sender].read(instance.pk)
+    apply_rollup_changes(previous=previous, current=current)
+
+    # A member that changed group takes its survey totals along
+    if sender is Member and previous and current and previous[0] != current[0]:
+        move_member_survey_rollups(instance.pk, previous[0], current[0])
+        mark_member_buckets_stale(instance.pk, [previous[0], current[0]])
+
+
+def update_rollup_on_delete(sender, instance, **kwargs):
+    apply_rollup_changes(previous=getattr(instance, '_rollup_previous', None))
+
+
+def connect_rollup_signals():
+    for model in ROLLUP_SOURCES:
+        uid = f"group_rollup_{model.__name__}"
+        pre_save.connect(capture_previous_rollup, sender=model, dispatch_uid=uid)
+        post_save.connect(update_rollup_on_save, sender=model, dispatch_uid=uid)
+        pre_delete.connect(capture_previous_rollup, sender=model, dispatch_uid=uid)
+        post_delete.connect(update_rollup_on_delete, sender=model, dispatch_uid=uid)
+
+
+# Member growth: a new member counts towards the month it was created in, a
+# member moving group takes its month along.
+
+def capture_previous_member_growth(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._growth_previous = None
+    else:
+        instance._growth_previous = MEMBER_GROWTH_SOURCE.read(instance.pk)
+
+
+def update_member_growth_on_save(sender, instance, **kwargs):
+    apply_rollup_changes(
+        previous=getattr(instance, '_growth_previous', None),
+        current=MEMBER_GROWTH_SOURCE.read(instance.pk),
+        rollup_model=GroupMemberGrowth,
+    )
+
+
+def update_member_growth_on_delete(sender, instance, **kwargs):
+    apply_rollup_changes(previous=getattr(instance, '_growth_previous', None), rollup_model=GroupMemberGrowth)
+
+
+def connect_member_growth_signals():
+    uid = "group_member_growth"
+    pre_save.connect(capture_previous_member_growth, sender=Member, dispatch_uid=uid)
+    post_save.connect(update_member_growth_on_save, sender=Member, dispatch_uid=uid)
+    pre_delete.connect(capture_previous_member_growth, sender=Member, dispatch_uid=uid)
+    post_delete.connect(update_member_growth_on_delete, sender=Member, dispatch_uid=uid)
+
+
+# Monthly buckets pick up created/updated rows through updated_at; deleted rows
+# leave no trace there, and neither does the bucket a row moves out of, so
+# that month is flagged stale instead.
+
+def mark_bucket_stale_on_move(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('member_id', 'member__group_id', 'created_at').first()
+    if previous is None:
+        return
+    member_id, group_id, created_at = previous
+    if (member_id != instance.member_id or instance.created_at is None
+            or get_month(created_at) != get_month(instance.created_at)):
+        mark_buckets_stale([group_id], [get_month(created_at)], create=False)
+
+
+def mark_bucket_stale_on_delete(sender, instance, **kwargs):
+    group_id = Member.objects.filter(pk=instance.member_id).values_list('group_id', flat=True).first()
+    mark_buckets_stale([group_id], [get_month(instance.created_at)], create=False)
+
+
+def connect_bucket_signals():
+    for model in BUCKET_SOURCES:
+        uid = f"monthly_bucket_{model.__name__}"
+        pre_save.connect(mark_bucket_stale_on_move, sender=model, dispatch_uid=uid)
+        pre_delete.connect(mark_bucket_stale_on_delete, sender=model, dispatch_uid=uid)
+
+
+# Report cache invalidation: any cluster_management/data_collection write bumps
+# the versions of the scopes it belongs to. Members and groups can move, so
+# the scopes they leave are bumped as well.
+
+def capture_previous_report_tokens(sender, instance, **kwargs):
+    previous = None
+    if not instance._state.adding:
+        previous = sender.objects.filter(pk=instance.pk).first()
+    instance._report_tokens = get_instance_tokens(previous) if previous else set()
+
+
+def invalidate_cached_reports(sender, instance, **kwargs):
+    # Bumped once the write is committed; a bump before that would let a
+    # concurrent reader cache pre-commit data under the new version
+    tokens = get_instance_tokens(instance) | getattr(instance, '_report_tokens', set())
+    transaction.on_commit(lambda: bump_report_versions(tokens))
+
+
+def connect_report_cache_signals():
+    for app_label in ('cluster_management', 'data_collection'):
+        for model in apps.get_app_config(app_label).get_models():
+            uid = f"report_cache_{model.__name__}"
+            if model in (SelfHelpGroup, Member):
+                pre_save.connect(capture_previous_report_tokens, sender=model, dispatch_uid=uid)
+            post_save.connect(invalidate_cached_reports, sender=model, dispatch_uid=uid)
+            post_delete.connect(invalidate_cached_reports, sender=model, dispatch_uid=uid)
+
+
+# Delta exports pick up created/updated rows through updated_at; deleted rows
+# leave a tombstone instead (cascaded deletes included).
+
+def record_deletion(sender, instance, **kwargs):
+    DeletedRecord.objects.create(model_name=sender.__name__, object_id=instance.pk)
+
+
+def connect_deletion_signals():
+    for model in DELTA_EXPORT_MODELS.values():
+        post_delete.connect(record_deletion, sender=model, dispatch_uid=f"deleted_record_{model.__name__}")
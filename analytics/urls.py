@@ -4,12 +4,16 @@ from .views import (
     ClusterLevelReportView,
     SelfHelpGroupLevelReportView,
     DashboardMetricsView,
+    GrowthSeriesView,
+    MetricQueryView,
+    DistributionView,
     LoanSavingReportView,
     MemberDataReportView,
     FacilitatorAnalyticsView,
     LocationLevelAnalyticsPDFView
 )
 from .graph_views import LocationAnalyticsGraphsPDFView, GroupLevelFinancialMetricsAPIView, DumpAllDataView
+from .job_views import ReportJobCreateView, ReportJobDetailView, ReportJobDownloadView
 
 urlpatterns = [
     path('reports/system/', SystemLevelReportView.as_view(), name='system-level-report'),
@@ -17,6 +21,9 @@ urlpatterns = [
     path('reports/facilitator/<uuid:facilitator_id>/', FacilitatorAnalyticsView.as_view(), name='cluster-level-report'),
     path('reports/group/<uuid:group_id>/', SelfHelpGroupLevelReportView.as_view(), name='group-level-report'),
     path('reports/dashboard/', DashboardMetricsView.as_view(), name='dashboard-report'),
+    path('reports/growth/<str:series>/', GrowthSeriesView.as_view(), name='growth-series'),
+    path('reports/query/', MetricQueryView.as_view(), name='metric-query'),
+    path('reports/distribution/<str:field>/', DistributionView.as_view(), name='distribution'),
     path('reports/loan-saving/<str:entity_type>/<uuid:entity_id>/', LoanSavingReportView.as_view(), name='loan_saving_report'),
     path('reports/member-data/group/<uuid:group_id>/', MemberDataReportView.as_view(), name="group_member_report"),
     path('reports/member-data/cluster/<uuid:cluster_id>/', MemberDataReportView.as_view(), name="cluster_member_report"),
@@ -25,4 +32,7 @@ urlpatterns = [
     path('reports/pdf/graph/highlevel', LocationAnalyticsGraphsPDFView.as_view(), name="pdf_graph_heigh_level_report"),
     path('reports/pdf/graph/quality-control', GroupLevelFinancialMetricsAPIView.as_view(), name="pdf_graph_quality_control_report"),
     path('reports/dump-all-data', DumpAllDataView.as_view(), name="dump_all_data"),
+    path('reports/jobs/', ReportJobCreateView.as_view(), name="report_job_create"),
+    path('reports/jobs/<uuid:job_id>/', ReportJobDetailView.as_view(), name="report_job_detail"),
+    path('reports/jobs/<uuid:job_id>/download/', ReportJobDownloadView.as_view(), name="report_job_download"),
 ]
@@ -1,69 +1,232 @@
-from django.db.models import Sum, Avg, Count, Max, Min, F, Q, DecimalField
+from django.db.models import Sum, Avg, Count, Max, Min, F, Q, DecimalField, IntegerField, Case, When, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from datetime import timedelta
+from analytics.models import DeletedRecord
 from cluster_management.models import SelfHelpGroup, Member
 from data_collection.models import AnnualData, SixMonthData, AnnualChildrenStatus, AnnualSelfHelpGroupData
-import csv
-from datetime import datetime
+from .scope import AnalyticsScope
+from .rollup_util import get_rollup_totals
+from .report_cache import get_cached_report
+from .bucket_util import get_bucketed_survey_totals
+
+
+def _get_report_locations():
+    # Distinct, non-empty location values from SelfHelpGroup
+    return (SelfHelpGroup.objects
+                .exclude(location__isnull=True)
+                .exclude(location__exact="")
+                .order_by('location')
+                .values_list('location', flat=True)
+                .distinct())
+
+
+def aggregate_by(queryset, lookup, **aggregates):
+    """
+    Run a single GROUP BY query on `lookup` and return {key: {alias: value}}.
+    """
+    rows = queryset.order_by().values(lookup).annotate(**aggregates)
+    return {row.pop(lookup): row for row in rows}
+
+
+def latest_by_member(queryset, members, *fields, **expressions):
+    """
+    Newest row of a survey queryset for each member in `members` (a queryset
+    or list), fetched with one DISTINCT ON (member_id) query. Returns
+    {member_id: {field: value}}; members without rows are missing.
+    """
+    rows = (queryset.filter(member__in=members)
+            .order_by('member_id', '-created_at')
+            .distinct('member_id')
+            .values('member_id', *fields, **expressions))
+    return {row.pop('member_id'): row for row in rows}
+
+
+def get_latest_member_snapshots(members):
+    """
+    Latest SixMonthData, AnnualData and AnnualChildrenStatus figures of every
+    member in `members`, three queries in total regardless of member count.
+    """
+    six_month = latest_by_member(
+        SixMonthData.objects.all(), members,
+        meals_per_day=F('meals_per_day_for_children') + F('meals_per_day_for_adults'),
+        child_morbidity=F('days_diarrhea_children') + F('days_other_illness_children'),
+    )
+    annual = latest_by_member(AnnualData.objects.all(), members, 'household_size', 'mortality_children_under_5')
+    children_status = latest_by_member(AnnualChildrenStatus.objects.all(), members, **school_enrollment_expressions())
+    return {
+        "six_month": six_month,
+        "annual": annual,
+        "children_status": children_status,
+    }
+
+
+def get_loan_saving_pivot(six_month_data, group_by=None):
+    """
+    Min/max IGA capital, max loan, other-source total and one loan sum (plus
+    row count) per PURPOSE_CHOICES entry, computed with conditional
+    aggregation in a single query. Returns one dict, or {key: dict} when
+    group_by is given.
+    """
+    aggregates = {
+        'max_loan': Max('loan_amount_received_shg', output_field=DecimalField()),
+        'min_iga': Min('iga_capital', output_field=DecimalField()),
+        'max_iga': Max('iga_capital', output_field=DecimalField()),
+        'total_loan_other_sources': Sum('loan_amount_from_other_sources', output_field=DecimalField()),
+    }
+    for purpose, _ in SixMonthData.PURPOSE_CHOICES:
+        purpose_filter = Q(purpose_of_loan=purpose)
+        aggregates[f'loan_{purpose}'] = Sum('loan_amount_received_shg', filter=purpose_filter, output_field=DecimalField())
+        aggregates[f'loan_{purpose}_count'] = Count('id', filter=purpose_filter)
+
+    if group_by is None:
+        return six_month_data.order_by().aggregate(**aggregates)
+    return aggregate_by(six_month_data, group_by, **aggregates)
+
+
+def format_loan_by_purpose(pivot_row):
+    # "purpose: total" for every purpose that has at least one record
+    return ', '.join(
+        f"{purpose}: {pivot_row.get(f'loan_{purpose}')}"
+        for purpose, _ in SixMonthData.PURPOSE_CHOICES
+        if pivot_row.get(f'loan_{purpose}_count')
+    )
 
- 
 
-def get_location_level_group_report(start_date = None, end_date = None, cluster = None):
-    # Parse optional date range parameters
-    date_filter = Q()
-    if start_date and end_date:
-        try:
-            start_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
-            date_filter = Q(created_at__range=[start_date, end_date])
-        except Exception as e:
-            return {"error": str(e)}
-
-    # Get distinct, non-empty location values from SelfHelpGroup
-    locations = (SelfHelpGroup.objects
-                    .exclude(location__isnull=True)
-                    .exclude(location__exact="")
-                    .values_list('location', flat=True)
-                    .distinct())
-
-    report_data = [["Location", "Total Groups", "Total Members", "Total hh size", "Total Savings", "Total Capital", "Total Loan Circulated","Avg Iga Capital"]]
+def school_enrollment_expressions():
+    """
+    Per-row counts of children with a school status and of enrolled children,
+    unpivoted from the five AnnualChildrenStatus.child_N_school_status columns.
+    """
+    school_age_children = Value(0)
+    enrolled_children = Value(0)
+    for i in range(1, 6):
+        status_field = f"child_{i}_school_status"
+        has_status = Q(**{f"{status_field}__isnull": False}) & ~Q(**{status_field: ""})
+        school_age_children = school_age_children + Case(
+            When(has_status, then=Value(1)), default=Value(0), output_field=IntegerField()
+        )
+        enrolled_children = enrolled_children + Case(
+            When(**{status_field: "enrolled"}, then=Value(1)), default=Value(0), output_field=IntegerField()
+        )
+    return {
+        "school_age_children": school_age_children,
+        "enrolled_children": enrolled_children,
+    }
+
+
+def get_school_enrollment(children_status, group_by=None):
+    """
+    Sum school-age and enrolled children in the database. Returns one dict, or
+    {key: dict} when group_by is given (e.g. 'member__group__location',
+    'member__group', 'member__group__cluster' or 'member').
+    """
+    aggregates = {alias: Sum(expression) for alias, expression in school_enrollment_expressions().items()}
+    if group_by is None:
+        return children_status.order_by().aggregate(**aggregates)
+    return aggregate_by(children_status, group_by, **aggregates)
+
+
+def get_school_enrollment_percentage(enrollment):
+    school_age_children = enrollment.get("school_age_children") or 0
+    enrolled_children = enrollment.get("enrolled_children") or 0
+    return (enrolled_children / school_age_children) * 100 if school_age_children > 0 else None
+
+
+def get_scope_totals(scope):
+    """
+    Member, household and financial totals for an AnalyticsScope. Undated
+    scopes are answered from GroupRollup, dated ones from GroupMonthlyBucket
+    when it is current; otherwise one aggregate query per source table is run.
+    """
+    if scope.can_use_rollups:
+        return get_rollup_totals(scope)
+
+    member_totals = scope.filter(Member.objects.all()).aggregate(
+        total_members=Count('id'),
+        total_household_size=Sum('hh_size'),
+    )
 
-    # For each unique location, aggregate analytics across groups and members
-    for loc in locations:
-        # Groups at this location
-        if cluster:
-            groups = SelfHelpGroup.objects.filter(location=loc, cluster = cluster)
-        else:
-            groups = SelfHelpGroup.objects.filter(location=loc)
-        total_groups = groups.count()
+    buckets = get_bucketed_survey_totals(scope)
+    if buckets is not None:
+        return {
+            **member_totals,
+            'total_savings': buckets['savings_total'] if buckets['annual_data_count'] else None,
+            'total_capital': buckets['iga_capital_total'] if buckets['iga_capital_count'] else None,
+            'total_loan_circulated': buckets['loan_circulated_total'] if buckets['loan_circulated_count'] else None,
+            'average_iga_capital': (buckets['iga_capital_total'] / buckets['iga_capital_count']
+                                    if buckets['iga_capital_count'] else None),
+        }
+
+    annual_totals = scope.filter(AnnualData.objects.all()).aggregate(
+        total_savings=Sum('total_savings'),
+    )
+    six_month_totals = scope.filter(SixMonthData.objects.all()).aggregate(
+        total_capital=Sum('iga_capital'),
+        total_loan_circulated=Sum('loan_amount_received_shg'),
+        average_iga_capital=Avg('iga_capital'),
+    )
+    return {**member_totals, **annual_totals, **six_month_totals}
 
-        # Members in these groups
-        members = Member.objects.filter(group__in=groups)
-        total_members = members.count()
 
-        # Total household size from members (using Member.hh_size)
-        total_household_size = members.aggregate(total=Sum('hh_size'))['total'] or 0
+def get_scope_report(scope):
+    """
+    Group count plus get_scope_totals() for a scope, served from the report
+    cache until a write inside the scope invalidates it.
+    """
+    return get_cached_report("scope_totals", scope, lambda: {
+        'total_shgs': scope.filter(SelfHelpGroup.objects.all()).count(),
+        **get_scope_totals(scope),
+    })
 
-        # Aggregate financial metrics using related data (filtered by date range if provided)
-        total_savings = (AnnualData.objects.filter(member__in=members).filter(date_filter)
-                            .aggregate(total=Sum('total_savings', output_field=DecimalField()))['total'] or 0)
 
-        total_capital = (SixMonthData.objects.filter(member__in=members).filter(date_filter)
-                            .aggregate(total=Sum('iga_capital', output_field=DecimalField()))['total'] or 0)
+def get_location_level_group_report(start_date = None, end_date = None, cluster = None):
+    # Parse optional date range parameters
+    try:
+        scope = AnalyticsScope(start_date=start_date, end_date=end_date, cluster=cluster)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    groups = scope.filter(SelfHelpGroup.objects.all())
+    members = scope.filter(Member.objects.all())
+    annual_data = scope.filter(AnnualData.objects.all())
+    six_month_data = scope.filter(SixMonthData.objects.all())
+
+    # One grouped query per source table, merged per location below
+    group_totals = aggregate_by(groups, 'location', total_groups=Count('id'))
+    member_totals = aggregate_by(
+        members, 'group__location',
+        total_members=Count('id'),
+        total_household_size=Sum('hh_size'),
+    )
+    annual_totals = aggregate_by(
+        annual_data, 'member__group__location',
+        total_savings=Sum('total_savings', output_field=DecimalField()),
+    )
+    six_month_totals = aggregate_by(
+        six_month_data, 'member__group__location',
+        total_capital=Sum('iga_capital', output_field=DecimalField()),
+        total_loan_circulated=Sum('loan_amount_received_shg', output_field=DecimalField()),
+        average_iga_capital=Avg('iga_capital', output_field=DecimalField()),
+    )
 
-        total_loan_circulated = (SixMonthData.objects.filter(member__in=members).filter(date_filter)
-                                    .aggregate(total=Sum('loan_amount_received_shg', output_field=DecimalField()))['total'] or 0)
+    report_data = [["Location", "Total Groups", "Total Members", "Total hh size", "Total Savings", "Total Capital", "Total Loan Circulated","Avg Iga Capital"]]
 
-        average_iga_capital = (SixMonthData.objects.filter(member__in=members).filter(date_filter)
-                                .aggregate(avg=Avg('iga_capital', output_field=DecimalField()))['avg'] or 0)
+    for loc in _get_report_locations():
+        group_row = group_totals.get(loc, {})
+        member_row = member_totals.get(loc, {})
+        annual_row = annual_totals.get(loc, {})
+        six_month_row = six_month_totals.get(loc, {})
 
         report_data.append([
             loc,
-            total_groups,
-            total_members,
-            total_household_size,
-            total_savings,
-            total_capital,
-            total_loan_circulated,
-            average_iga_capital,
+            group_row.get('total_groups', 0),
+            member_row.get('total_members', 0),
+            member_row.get('total_household_size') or 0,
+            annual_row.get('total_savings') or 0,
+            six_month_row.get('total_capital') or 0,
+            six_month_row.get('total_loan_circulated') or 0,
+            six_month_row.get('average_iga_capital') or 0,
         ])
 
     return report_data
@@ -71,22 +234,21 @@ def get_location_level_group_report(start_date = None, end_date = None, cluster
 
 def get_location_level_loan_saving_report(start_date = None, end_date = None, cluster = None):
     
-    date_filter = Q()
-    if start_date and end_date:
-        try:
-            start_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
-            date_filter = Q(created_at__range=[start_date, end_date])
-        except Exception as e:
-            return {"error": str(e)}
-        
-    # Get distinct, non-empty location values from SelfHelpGroup
-    locations = (
-        SelfHelpGroup.objects
-        .exclude(location__isnull=True)
-        .exclude(location__exact="")
-        .values_list('location', flat=True)
-        .distinct()
+    try:
+        scope = AnalyticsScope(start_date=start_date, end_date=end_date, cluster=cluster)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    members = scope.filter(Member.objects.all())
+    annual_data = scope.filter(AnnualData.objects.all())
+    six_month_data = scope.filter(SixMonthData.objects.all())
+
+    member_totals = aggregate_by(members, 'group__location', total_members=Count('id'))
+    loan_pivot = get_loan_saving_pivot(six_month_data, group_by='member__group__location')
+    savings_ranges = aggregate_by(
+        annual_data, 'member__group__location',
+        min_savings=Min('total_savings', output_field=DecimalField()),
+        max_savings=Max('total_savings', output_field=DecimalField()),
     )
     
     # Prepare CSV header
@@ -102,55 +264,23 @@ def get_location_level_loan_saving_report(start_date = None, end_date = None, cl
         ]
     ]
     
-    # Iterate over each location and aggregate data
-    for loc in locations:
-        
-        if cluster:
-            groups = SelfHelpGroup.objects.filter(location=loc, cluster = cluster)
-        else:
-            groups = SelfHelpGroup.objects.filter(location=loc)
-            
-        members = Member.objects.filter(group__in=groups)
-        total_members = members.count()
-        
-        # Aggregations from SixMonthData for these members
-        max_loan_round = SixMonthData.objects.filter(member__in=members).filter(date_filter).aggregate(
-            max_loan=Max('loan_amount_received_shg', output_field=DecimalField())
-        )['max_loan']
-        
-        iga_capital_range = SixMonthData.objects.filter(member__in=members).filter(date_filter).aggregate(
-            min_iga=Min('iga_capital', output_field=DecimalField()),
-            max_iga=Max('iga_capital', output_field=DecimalField())
-        )
-        
-        total_loan_other_sources = SixMonthData.objects.filter(member__in=members).filter(date_filter).aggregate(
-            total_loan_other_sources=Sum('loan_amount_from_other_sources', output_field=DecimalField())
-        )['total_loan_other_sources']
-        
-        loan_by_purpose_qs = SixMonthData.objects.filter(member__in=members).filter(date_filter).values('purpose_of_loan').annotate(
-            total_loan=Sum('loan_amount_received_shg', output_field=DecimalField())
-        )
-        loan_by_purpose = ', '.join([f"{item['purpose_of_loan']}: {item['total_loan']}" for item in loan_by_purpose_qs])
-        
-        # Aggregations from AnnualData for these members
-        savings_range = AnnualData.objects.filter(member__in=members).filter(date_filter).aggregate(
-            min_savings=Min('total_savings', output_field=DecimalField()),
-            max_savings=Max('total_savings', output_field=DecimalField())
-        )
-        
-        iga_min =iga_capital_range.get('min_iga') if  iga_capital_range.get('min_iga') else 0
-        iga_max = iga_capital_range.get('max_iga') if  iga_capital_range.get('max_iga') else 0
-        saving_min = savings_range.get('min_savings') if  savings_range.get('min_savings') else 0
-        saving_max = savings_range.get('max_savings') if savings_range.get('max_savings') else 0
+    for loc in _get_report_locations():
+        loan_row = loan_pivot.get(loc, {})
+        savings_row = savings_ranges.get(loc, {})
+
+        iga_min = loan_row.get('min_iga') or 0
+        iga_max = loan_row.get('max_iga') or 0
+        saving_min = savings_row.get('min_savings') or 0
+        saving_max = savings_row.get('max_savings') or 0
         
         # Append row of aggregated data for the current location
         row = [
             loc,
-            total_members,
-            max_loan_round,
+            member_totals.get(loc, {}).get('total_members', 0),
+            loan_row.get('max_loan'),
             str(iga_min) + " - "+ str(iga_max),
-            total_loan_other_sources,
-            loan_by_purpose,
+            loan_row.get('total_loan_other_sources'),
+            format_loan_by_purpose(loan_row),
             str(saving_min) + " - " + str(saving_max),
             
         ]
@@ -165,24 +295,29 @@ def get_location_level_loan_saving_report(start_date = None, end_date = None, cl
 
 def get_location_level_hh_report(start_date = None, end_date = None, cluster = None):
     
-    date_filter = Q()
-    if start_date and end_date:
-        try:
-            start_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
-            date_filter = Q(created_at__range=[start_date, end_date])
-        except Exception as e:
-            return {"error": str(e)}
-        
-        
-    # Get all locations
-    locations = (
-        SelfHelpGroup.objects
-        .exclude(location__isnull=True)
-        .exclude(location__exact="")
-        .values_list('location', flat=True)
-        .distinct()
+    try:
+        scope = AnalyticsScope(start_date=start_date, end_date=end_date, cluster=cluster)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    members = scope.filter(Member.objects.all())
+    annual_data = scope.filter(AnnualData.objects.all())
+    six_month_data = scope.filter(SixMonthData.objects.all())
+    # Enrollment covers every children status, regardless of the date range
+    children_status = scope.filter(AnnualChildrenStatus.objects.all(), dated=False)
+
+    member_totals = aggregate_by(members, 'group__location', total_members=Count('id'))
+    annual_totals = aggregate_by(
+        annual_data, 'member__group__location',
+        total_household_size=Sum("household_size", output_field=DecimalField()),
+        total_child_mortality=Sum("mortality_children_under_5", output_field=DecimalField()),
+    )
+    six_month_totals = aggregate_by(
+        six_month_data, 'member__group__location',
+        avg_meals=Avg(F("meals_per_day_for_children") + F("meals_per_day_for_adults"), output_field=DecimalField()),
+        morbidity=Sum(F("days_diarrhea_children") + F("days_other_illness_children"), output_field=DecimalField()),
     )
+    enrollment = get_school_enrollment(children_status, group_by='member__group__location')
     
     # Prepare CSV data
     csv_data = [
@@ -197,186 +332,140 @@ def get_location_level_hh_report(start_date = None, end_date = None, cluster = N
         ]
     ]
 
-    # Process each location
-    for loc in locations:
-        # Get groups in this location
-        if cluster:
-            groups = SelfHelpGroup.objects.filter(location=loc, cluster = cluster)
-        else:
-            groups = SelfHelpGroup.objects.filter(location=loc)
-        
-        # Get all members in those groups
-        members = Member.objects.filter(group__in=groups)
-
-        if not members.exists():
+    for loc in _get_report_locations():
+        total_members = member_totals.get(loc, {}).get('total_members', 0)
+        if not total_members:
             continue  # Skip locations with no members
 
-        # Aggregate data
-        total_members = members.count()
-
-        total_household_size = (
-            AnnualData.objects.filter(member__in=members).filter(date_filter).aggregate(total=Sum("household_size", output_field=DecimalField()))["total"] or 0
-        )
-
-        avg_meals_per_day = (
-            SixMonthData.objects.filter(member__in=members).filter(date_filter)
-            .aggregate(
-                avg_meals=Avg(F("meals_per_day_for_children") + F("meals_per_day_for_adults"), output_field=DecimalField())
-            )["avg_meals"]
-        )
-
-        total_child_morbidity = (
-            SixMonthData.objects.filter(member__in=members).filter(date_filter)
-            .aggregate(
-                morbidity=Sum(F("days_diarrhea_children") + F("days_other_illness_children"), output_field=DecimalField())
-            )["morbidity"]
-        )
-
-        total_child_mortality = (
-            AnnualData.objects.filter(member__in=members).filter(date_filter).aggregate(total=Sum("mortality_children_under_5", output_field=DecimalField()))["total"]
-        )
-
-        # School Enrollment Calculation
-        school_age_children = 0
-        enrolled_children = 0
-        children_statuses = AnnualChildrenStatus.objects.filter(member__in=members)
-        for status in children_statuses:
-            for i in range(1, 6):  # Assuming up to 5 children per member
-                school_status = getattr(status, f"child_{i}_school_status", None)
-                if school_status:
-                    school_age_children += 1
-                    if school_status == "enrolled":
-                        enrolled_children += 1
-
-        percentage_school_enrollment = (
-            (enrolled_children / school_age_children) * 100 if school_age_children > 0 else None
-        )
+        annual_row = annual_totals.get(loc, {})
+        six_month_row = six_month_totals.get(loc, {})
 
         # Append data to CSV
         csv_data.append([
             loc,
             total_members,
-            total_household_size,
-            avg_meals_per_day,
-            total_child_morbidity,
-            total_child_mortality,
-            percentage_school_enrollment,
+            annual_row.get('total_household_size') or 0,
+            six_month_row.get('avg_meals'),
+            six_month_row.get('morbidity'),
+            annual_row.get('total_child_mortality'),
+            get_school_enrollment_percentage(enrollment.get(loc, {})),
         ])
 
     return csv_data
 
 
-def dump_all_data_report(start_date = None, end_date = None, cluster = None, facilitator = None):
-    
-    date_filter = Q()
-    if start_date and end_date:
-        try:
-            start_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
-            date_filter = Q(created_at__range=[start_date, end_date])
-        except Exception as e:
-            return {"error": str(e)}
-        
-    groups = SelfHelpGroup.objects.filter(cluster=cluster)
-    
-    if cluster:
-        groups = SelfHelpGroup.objects.filter(cluster=cluster)
-    elif facilitator:
-        groups = SelfHelpGroup.objects.filter(facilitator=facilitator)
-    else:
-        groups = SelfHelpGroup.objects.all()
-    
-    members = Member.objects.filter(group__in=groups)
-   
-    
-    
-    annual_member_data = AnnualData.objects.filter(member__in=members).filter(date_filter)
-    member_sixmonth_data = SixMonthData.objects.filter(member__in=members).filter(date_filter)
-    annual_childeren_status = AnnualChildrenStatus.objects.filter(member__in=members).filter(date_filter)
-    annual_group_status =AnnualSelfHelpGroupData.objects.filter(group__in=groups)
-    
-    print("Members count:", members.count())
-    print("Number of groups:", groups.count())
-    print("Number of annual member data entries:", annual_member_data.count())
-    print("Number of six month data entries:", member_sixmonth_data.count())
-    print("Number of annual children status entries:", annual_childeren_status.count())
-    print("Number of annual group status entries:", annual_group_status.count())
-    
-    # Prepare lists for each section
-    annual_data_list = [
-        ["member", "age", "gender", "education_level", "marital_status", "family_size", "household_size", 
-         "total_savings", "loan_rounds_taken", "estimated_value_of_household_assets", "household_decision_making",
-         "community_decision_making", "mortality_children_under_5", "mortality_other_household_members", 
-         "housing", "have_latrine", "electricity", "drinking_water"]
-    ]
+DUMP_CHUNK_SIZE = 2000
 
-    for data in annual_member_data:
-        annual_data_list.append([data.member.first_name + " " + data.member.last_name, data.age, data.gender, data.education_level, 
-                                 data.marital_status, data.family_size, data.household_size, 
-                                 data.total_savings, data.loan_rounds_taken, 
-                                 data.estimated_value_of_household_assets, data.household_decision_making, 
-                                 data.community_decision_making, data.mortality_children_under_5, 
-                                 data.mortality_other_household_members, data.housing, 
-                                 data.have_latrine, data.electricity, data.drinking_water])
-
-    six_month_data_list = [
-        ["member", "active_iga", "iga_activity_code", "iga_capital", "loan_amount_received_shg", 
-         "loan_source_code", "loan_amount_from_other_sources", "purpose_of_loan", "approx_monthly_personal_income",
-         "approx_monthly_household_income", "meals_per_day_for_children", "meals_per_day_for_adults", 
-         "days_diarrhea_children", "days_other_illness_children", "days_diarrhea_others", "days_other_illness_others"]
-    ]
+ANNUAL_DATA_DUMP_FIELDS = [
+    "age", "gender", "education_level", "marital_status", "family_size", "household_size",
+    "total_savings", "loan_rounds_taken", "estimated_value_of_household_assets", "household_decision_making",
+    "community_decision_making", "mortality_children_under_5", "mortality_other_household_members",
+    "housing", "have_latrine", "electricity", "drinking_water",
+]
 
-    for data in member_sixmonth_data:
-        six_month_data_list.append([data.member.first_name + " " + data.member.last_name, data.active_iga, data.iga_activity_code, data.iga_capital, 
-                                    data.loan_amount_received_shg, data.loan_source_code, 
-                                    data.loan_amount_from_other_sources, data.purpose_of_loan, 
-                                    data.approx_monthly_personal_income, data.approx_monthly_household_income, 
-                                    data.meals_per_day_for_children, data.meals_per_day_for_adults, 
-                                    data.days_diarrhea_children, data.days_other_illness_children, 
-                                    data.days_diarrhea_others, data.days_other_illness_others])
-
-    children_status_list = [
-        ["member", "number_of_children", "child_1_name", "child_1_gender", "child_1_age", "child_1_school_status",
-         "child_2_name", "child_2_gender", "child_2_age", "child_2_school_status", "child_3_name", 
-         "child_3_gender", "child_3_age", "child_3_school_status", "child_4_name", "child_4_gender", 
-         "child_4_age", "child_4_school_status", "child_5_name", "child_5_gender", "child_5_age", "child_5_school_status"]
-    ]
+SIX_MONTH_DATA_DUMP_FIELDS = [
+    "active_iga", "iga_activity_code", "iga_capital", "loan_amount_received_shg",
+    "loan_source_code", "loan_amount_from_other_sources", "purpose_of_loan", "approx_monthly_personal_income",
+    "approx_monthly_household_income", "meals_per_day_for_children", "meals_per_day_for_adults",
+    "days_diarrhea_children", "days_other_illness_children", "days_diarrhea_others", "days_other_illness_others",
+]
 
-    for status in annual_childeren_status:
-        children_status_list.append([data.member.first_name + " " + data.member.last_name, status.number_of_children, status.child_1_name, 
-                                     status.child_1_gender, status.child_1_age, status.child_1_school_status,
-                                     status.child_2_name, status.child_2_gender, status.child_2_age, 
-                                     status.child_2_school_status, status.child_3_name, status.child_3_gender, 
-                                     status.child_3_age, status.child_3_school_status, status.child_4_name, 
-                                     status.child_4_gender, status.child_4_age, status.child_4_school_status, 
-                                     status.child_5_name, status.child_5_gender, status.child_5_age, 
-                                     status.child_5_school_status])
-
-    group_status_list = [
-        ["group", "amount_regular_saving", "shg_capital", "num_members_taken_loan", "smallest_loan_given", 
-         "largest_loan_given", "amount_loans_written_off", "amount_invested_in_group_iga", "group_iga_code1", 
-         "description", "income_social_savings", "expenditure_social_savings", "num_shg_members_social_support", 
-         "num_people_outside_shg_social_support", "num_other_supporting_institutions", "min_monthly_personal", 
-         "training_received_per_year", "shg_member_health_care_support_amount", "other_member_health_care_support_amount", 
-         "other_insurance_need_amount", "other_social_need_amount", "others"]
-    ]
+CHILDREN_STATUS_DUMP_FIELDS = ["number_of_children"] + [
+    f"child_{i}_{field}" for i in range(1, 6) for field in ("name", "gender", "age", "school_status")
+]
+
+GROUP_STATUS_DUMP_FIELDS = [
+    "amount_regular_saving", "shg_capital", "num_members_taken_loan", "smallest_loan_given",
+    "largest_loan_given", "amount_loans_written_off", "amount_invested_in_group_iga", "group_iga_code1",
+    "description", "income_social_savings", "expenditure_social_savings", "num_shg_members_social_support",
+    "num_people_outside_shg_social_support", "num_other_supporting_institutions", "min_monthly_personal",
+    "training_received_per_year", "shg_member_health_care_support_amount", "other_member_health_care_support_amount",
+    "other_insurance_need_amount", "other_social_need_amount", "others",
+]
+
+
+def _iter_dump_rows(header, queryset):
+    """
+    Yield the header row, then value rows read through a server-side cursor
+    in chunks of DUMP_CHUNK_SIZE.
+    """
+    yield header
+    yield from queryset.iterator(chunk_size=DUMP_CHUNK_SIZE)
+
+
+def dump_all_data_report(start_date = None, end_date = None, cluster = None, facilitator = None):
+    """
+    Return {section: rows} where every rows value is a lazy iterator (header
+    first). Nothing is queried until a section is iterated.
+    """
+    try:
+        scope = AnalyticsScope(start_date=start_date, end_date=end_date, cluster=cluster,
+                               facilitator=None if cluster else facilitator)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    member_name = Concat('member__first_name', Value(' '), 'member__last_name')
+
+    annual_member_data = (scope.filter(AnnualData.objects.all())
+                            .annotate(member_name=member_name)
+                            .values_list("member_name", *ANNUAL_DATA_DUMP_FIELDS))
+    member_sixmonth_data = (scope.filter(SixMonthData.objects.all())
+                                .annotate(member_name=member_name)
+                                .values_list("member_name", *SIX_MONTH_DATA_DUMP_FIELDS))
+    annual_childeren_status = (scope.filter(AnnualChildrenStatus.objects.all())
+                                .annotate(member_name=member_name)
+                                .values_list("member_name", *CHILDREN_STATUS_DUMP_FIELDS))
+    annual_group_status = (scope.filter(AnnualSelfHelpGroupData.objects.all(), dated=False)
+                            .values_list("group__group_name", *GROUP_STATUS_DUMP_FIELDS))
 
-    for status in annual_group_status:
-        group_status_list.append([status.group.group_name, status.amount_regular_saving, status.shg_capital, 
-                                  status.num_members_taken_loan, status.smallest_loan_given, 
-                                  status.largest_loan_given, status.amount_loans_written_off, 
-                                  status.amount_invested_in_group_iga, status.group_iga_code1, 
-                                  status.description, status.income_social_savings, status.expenditure_social_savings, 
-                                  status.num_shg_members_social_support, status.num_people_outside_shg_social_support, 
-                                  status.num_other_supporting_institutions, status.min_monthly_personal, 
-                                  status.training_received_per_year, status.shg_member_health_care_support_amount, 
-                                  status.other_member_health_care_support_amount, status.other_insurance_need_amount, 
-                                  status.other_social_need_amount, status.others])
-
-    # Return the data as a dictionary with corresponding lists
     return {
-        "annual_data": annual_data_list,
-        "six_month_data": six_month_data_list,
-        "children_status": children_status_list,
-        "group_status": group_status_list
-    } 
\ No newline at end of file
+        "annual_data": _iter_dump_rows(["member"] + ANNUAL_DATA_DUMP_FIELDS, annual_member_data),
+        "six_month_data": _iter_dump_rows(["member"] + SIX_MONTH_DATA_DUMP_FIELDS, member_sixmonth_data),
+        "children_status": _iter_dump_rows(["member"] + CHILDREN_STATUS_DUMP_FIELDS, annual_childeren_status),
+        "group_status": _iter_dump_rows(["group"] + GROUP_STATUS_DUMP_FIELDS, annual_group_status),
+    }
+
+
+# Delta export sections -> model. Rows carry every column (foreign keys as ids)
+# so the warehouse can merge them by id.
+DELTA_EXPORT_MODELS = {
+    "annual_data": AnnualData,
+    "six_month_data": SixMonthData,
+    "children_status": AnnualChildrenStatus,
+    "group_status": AnnualSelfHelpGroupData,
+    "members": Member,
+    "groups": SelfHelpGroup,
+}
+
+# The export window closes this long before the request, so a row whose
+# updated_at was set by a transaction still in flight lands in the next window
+DELTA_EXPORT_LAG = timedelta(minutes=5)
+
+
+def delta_export_report(since=None):
+    """
+    Rows of DELTA_EXPORT_MODELS with updated_at in [since, watermark), plus
+    a "deleted" section with the DeletedRecord tombstones of that window.
+    Without since everything up to the watermark is exported (initial load).
+
+    Returns (watermark, {section: rows}) with lazy row iterators as in
+    dump_all_data_report; the watermark is the since of the next export.
+    """
+    watermark = timezone.now() - DELTA_EXPORT_LAG
+    window = {"lt": watermark}
+    if since:
+        window["gte"] = since
+
+    sections = {}
+    for section, model in DELTA_EXPORT_MODELS.items():
+        columns = [field.attname for field in model._meta.concrete_fields]
+        rows = (model.objects.filter(**{f"updated_at__{op}": value for op, value in window.items()})
+                    .order_by('updated_at')
+                    .values_list(*columns))
+        sections[section] = _iter_dump_rows(columns, rows)
+
+    tombstones = (DeletedRecord.objects.filter(**{f"created_at__{op}": value for op, value in window.items()})
+                    .order_by('created_at')
+                    .values_list('model_name', 'object_id', 'created_at'))
+    sections["deleted"] = _iter_dump_rows(["model", "id", "deleted_at"], tombstones)
+    return watermark, sections
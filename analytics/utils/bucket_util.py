@@ -0,0 +1,280 @@
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Sum, Count, Min, Max, Q, DateField
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from analytics.models import GroupMonthlyBucket, RefreshWatermark
+from data_collection.models import AnnualData, SixMonthData
+from .rollup_util import RollupSource, get_month
+from .scope import GROUP_PATHS
+
+
+# RefreshWatermark.name of the GroupMonthlyBucket table
+BUCKET_WATERMARK = "group_monthly_buckets"
+
+# How far the stored watermark trails the start of a refresh, so rows stamped
+# before the refresh began but committed after its scan are read next time
+BUCKET_REFRESH_LAG = timedelta(minutes=5)
+
+BUCKET_SOURCES = {
+    SixMonthData: RollupSource(SixMonthData, 'member__group_id', {
+        'six_month_data_count': ('count', 'id'),
+        'iga_capital_total': ('sum', 'iga_capital'),
+        'iga_capital_count': ('count_value', 'iga_capital'),
+        'iga_capital_min': ('min', 'iga_capital'),
+        'iga_capital_max': ('max', 'iga_capital'),
+        'loan_circulated_total': ('sum', 'loan_amount_received_shg'),
+        'loan_circulated_count': ('count_value', 'loan_amount_received_shg'),
+        'loan_circulated_max': ('max', 'loan_amount_received_shg'),
+        'other_source_loan_total': ('sum', 'loan_amount_from_other_sources'),
+        'other_source_loan_count': ('count_value', 'loan_amount_from_other_sources'),
+        'child_diarrhea_days_total': ('sum', 'days_diarrhea_children'),
+        'child_other_illness_days_total': ('sum', 'days_other_illness_children'),
+    }),
+    AnnualData: RollupSource(AnnualData, 'member__group_id', {
+        'annual_data_count': ('count', 'id'),
+        'savings_total': ('sum', 'total_savings'),
+        'savings_min': ('min', 'total_savings'),
+        'savings_max': ('max', 'total_savings'),
+        'child_mortality_total': ('sum', 'mortality_children_under_5'),
+    }),
+}
+
+# Every bucket field -> its kind, across all sources
+BUCKET_FIELD_KINDS = {
+    field: kind for source in BUCKET_SOURCES.values() for field, (kind, _) in source.fields.items()
+}
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _month_start(month):
+    return timezone.make_aware(datetime(month.year, month.month, 1))
+
+
+def get_watermark(name=BUCKET_WATERMARK):
+    return RefreshWatermark.objects.filter(name=name).values_list('watermark', flat=True).first()
+
+
+def _annotate_month(queryset):
+    return queryset.annotate(bucket_month=TruncMonth('created_at', output_field=DateField()))
+
+
+def _aggregate_by_month(source, queryset, months=None):
+    queryset = _annotate_month(queryset.order_by())
+    if months is not None:
+        queryset = queryset.filter(bucket_month__in=months)
+    rows = queryset.values(source.group_lookup, 'bucket_month').annotate(**source.aggregates())
+    for row in rows:
+        group_id = row.pop(source.group_lookup)
+        month = row.pop('bucket_month')
+        yield group_id, month, {
+            field: value if BUCKET_FIELD_KINDS[field] in ('min', 'max') else value or 0
+            for field, value in row.items()
+        }
+
+
+def _compute_buckets(querysets, months=None):
+    """{(group_id, month): fields} for a queryset per source model, optionally limited to some months."""
+    buckets = {}
+    for model, queryset in querysets.items():
+        for group_id, month, fields in _aggregate_by_month(BUCKET_SOURCES[model], queryset, months):
+            if group_id is not None:
+                buckets.setdefault((group_id, month), {}).update(fields)
+    return buckets
+
+
+def mark_buckets_stale(group_ids, months, create=True):
+    """
+    Flag the buckets of the given groups and months for recomputation on the
+    next refresh. Used for writes updated_at cannot reveal: deleted survey
+    rows and members moving group. create=False only flags existing buckets,
+    which is all a delete needs (and safe while the group itself is being
+    deleted).
+    """
+    group_ids = [group_id for group_id in group_ids if group_id]
+    now = timezone.now()
+    if not create:
+        GroupMonthlyBucket.objects.filter(group_id__in=group_ids, month__in=months).update(is_stale=True, updated_at=now)
+        return
+    GroupMonthlyBucket.objects.bulk_create(
+        [GroupMonthlyBucket(group_id=group_id, month=month, is_stale=True, updated_at=now)
+         for group_id in group_ids for month in months],
+        update_conflicts=True,
+        unique_fields=['group', 'month'],
+        update_fields=['is_stale', 'updated_at'],
+    )
+
+
+def mark_member_buckets_stale(member_id, group_ids):
+    """Flag every month a member has survey rows in, for each of the given groups."""
+    months = set()
+    for model in BUCKET_SOURCES:
+        months.update(
+            _annotate_month(model.objects.filter(member_id=member_id).order_by())
+            .values_list('bucket_month', flat=True).distinct()
+        )
+    if months:
+        mark_buckets_stale(group_ids, months)
+
+
+def refresh_monthly_buckets(full=False):
+    """
+    Bring GroupMonthlyBucket up to date. Only the (group, month) pairs with
+    source rows updated since the last refresh, or flagged stale, are
+    recomputed; full=True (or the first run) rebuilds the whole table.
+    The new watermark trails the refresh by BUCKET_REFRESH_LAG, so rows
+    changed around the scan are recomputed again next time.
+    Returns the number of buckets written.
+    """
+    started = timezone.now()
+    next_watermark = started - BUCKET_REFRESH_LAG
+    watermark = get_watermark()
+
+    if full or watermark is None:
+        buckets = _compute_buckets({model: model.objects.all() for model in BUCKET_SOURCES})
+        with transaction.atomic():
+            GroupMonthlyBucket.objects.all().delete()
+            GroupMonthlyBucket.objects.bulk_create(
+                [GroupMonthlyBucket(group_id=group_id, month=month, updated_at=started, **fields)
+                 for (group_id, month), fields in buckets.items()],
+                batch_size=1000,
+            )
+            RefreshWatermark.objects.update_or_create(name=BUCKET_WATERMARK, defaults={'watermark': next_watermark})
+        return len(buckets)
+
+    touched = set(GroupMonthlyBucket.objects.filter(is_stale=True).values_list('group_id', 'month'))
+    for model, source in BUCKET_SOURCES.items():
+        touched.update(
+            _annotate_month(model.objects.filter(updated_at__gte=watermark).order_by())
+            .values_list(source.group_lookup, 'bucket_month').distinct()
+        )
+    touched = {(group_id, month) for group_id, month in touched if group_id is not None}
+
+    group_ids = {group_id for group_id, _ in touched}
+    months = {month for _, month in touched}
+    buckets = {}
+    if touched:
+        # Recomputing every touched group over every touched month may cover a
+        # few untouched pairs as well; their values are just as correct
+        buckets = _compute_buckets({
+            model: model.objects.filter(**{f"{source.group_lookup}__in": group_ids})
+            for model, source in BUCKET_SOURCES.items()
+        }, months=months)
+
+    with transaction.atomic():
+        GroupMonthlyBucket.objects.bulk_create(
+            [GroupMonthlyBucket(group_id=group_id, month=month, is_stale=False, updated_at=started, **fields)
+             for (group_id, month), fields in buckets.items()],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['group', 'month'],
+            update_fields=['is_stale', 'updated_at', *BUCKET_FIELD_KINDS],
+        )
+        # Touched buckets whose rows are all gone
+        emptied = [
+            pk for pk, group_id, month in GroupMonthlyBucket.objects
+            .filter(group_id__in=group_ids, month__in=months)
+            .values_list('id', 'group_id', 'month')
+            if (group_id, month) in touched and (group_id, month) not in buckets
+        ]
+        GroupMonthlyBucket.objects.filter(id__in=emptied).delete()
+        RefreshWatermark.objects.update_or_create(name=BUCKET_WATERMARK, defaults={'watermark': next_watermark})
+    return len(buckets)
+
+
+def _full_month_span(start_date, end_date):
+    """(first, last) months such that [first, last) lies inside the range, or None."""
+    first = get_month(start_date)
+    if _month_start(first) < start_date:
+        first = _next_month(first)
+    last = get_month(end_date)
+    return (first, last) if first < last else None
+
+
+def _bucket_aggregates():
+    aggregates = {}
+    for field, kind in BUCKET_FIELD_KINDS.items():
+        if kind == 'min':
+            aggregates[field] = Min(field)
+        elif kind == 'max':
+            aggregates[field] = Max(field)
+        else:
+            aggregates[field] = Sum(field)
+    return aggregates
+
+
+def _run_aggregates(queryset, aggregates, group_by):
+    if group_by is None:
+        return {None: queryset.aggregate(**aggregates)}
+    rows = queryset.order_by().values(group_by).annotate(**aggregates)
+    return {row.pop(group_by): row for row in rows}
+
+
+def _merge(totals, row):
+    for field, value in row.items():
+        current = totals.get(field)
+        kind = BUCKET_FIELD_KINDS[field]
+        if kind == 'min':
+            totals[field] = value if current is None else current if value is None else min(current, value)
+        elif kind == 'max':
+            totals[field] = value if current is None else current if value is None else max(current, value)
+        else:
+            totals[field] = (current or 0) + (value or 0)
+
+
+def get_bucketed_survey_totals(scope, group_by=None):
+    """
+    Survey totals (the GroupMonthlyBucket fields) of a dated AnalyticsScope,
+    summed from the buckets of every whole month in the range plus the raw
+    rows of the partial months at either edge. group_by is a SelfHelpGroup
+    field such as "location"; the result is then {value: totals}.
+
+    Returns None when the buckets cannot answer exactly - no whole month in
+    the range, a stale bucket, or source rows changed since the last
+    refresh - and the caller should aggregate the raw rows instead.
+    """
+    if not scope.is_dated or scope.member is not None:
+        return None
+    span = _full_month_span(scope.start_date, scope.end_date)
+    watermark = get_watermark()
+    if span is None or watermark is None:
+        return None
+    first, last = span
+    range_start, range_end = _month_start(first), _month_start(last)
+
+    for model in BUCKET_SOURCES:
+        changed = model.objects.filter(created_at__gte=range_start, created_at__lt=range_end, updated_at__gte=watermark)
+        if scope.filter(changed, dated=False).exists():
+            return None
+
+    bucket_rows = _run_aggregates(
+        scope.filter(GroupMonthlyBucket.objects.filter(month__gte=first, month__lt=last)),
+        {**_bucket_aggregates(), 'stale_buckets': Count('id', filter=Q(is_stale=True))},
+        f"{GROUP_PATHS[GroupMonthlyBucket]}{group_by}" if group_by else None,
+    )
+    if any(row.pop('stale_buckets') for row in bucket_rows.values()):
+        return None
+
+    results = {}
+    for key, row in bucket_rows.items():
+        _merge(results.setdefault(key, {}), row)
+
+    edges = Q(created_at__gte=scope.start_date, created_at__lt=range_start) | \
+        Q(created_at__gte=range_end, created_at__lte=scope.end_date)
+    for model, source in BUCKET_SOURCES.items():
+        edge_rows = _run_aggregates(
+            scope.filter(model.objects.filter(edges), dated=False),
+            source.aggregates(),
+            f"{GROUP_PATHS[model]}{group_by}" if group_by else None,
+        )
+        for key, row in edge_rows.items():
+            _merge(results.setdefault(key, {}), row)
+
+    if group_by is None:
+        return results[None]
+    return results
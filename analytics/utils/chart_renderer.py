@@ -0,0 +1,56 @@
+# Chart drawing for the graph reports. This is the only module importing
+# matplotlib and NumPy; chart_util imports it in the processes that draw.
+from io import BytesIO
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+FIGURE_SIZE = (8, 6)
+
+
+def _draw_stacked_bar(ax, x, series):
+    bottom = np.zeros(len(x))
+    for item in series:
+        ax.bar(x, item["values"], bottom=bottom, label=item["label"], color=item["color"])
+        bottom += item["values"]
+
+
+def _draw_grouped_bar(ax, x, series):
+    width = 0.25  # width of the bars
+    offset = (len(series) - 1) / 2
+    for i, item in enumerate(series):
+        ax.bar(x + (i - offset) * width, item["values"], width, label=item["label"], color=item["color"])
+
+
+def _draw_line(ax, x, series):
+    for item in series:
+        ax.plot(x, item["values"], marker="o", linestyle="-", label=item["label"], color=item["color"])
+
+
+CHART_KINDS = {
+    "stacked_bar": _draw_stacked_bar,
+    "grouped_bar": _draw_grouped_bar,
+    "line": _draw_line,
+}
+
+
+def render_chart(spec):
+    """Render one chart spec to the bytes of a single-page PDF."""
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    try:
+        x = np.arange(len(spec["labels"]))
+        CHART_KINDS[spec["kind"]](ax, x, spec["series"])
+        ax.set_title(spec["title"])
+        ax.set_xticks(x)
+        ax.set_xticklabels(spec["labels"], rotation=45, ha="right")
+        ax.set_ylabel(spec["ylabel"])
+        ax.legend()
+        fig.tight_layout()
+        buffer = BytesIO()
+        fig.savefig(buffer, format="pdf")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+
+
+# Part of every chart's cache key; bump it when chart_renderer changes so
+# pages rendered by the old code are no longer served
+CHART_STYLE_VERSION = 1
+
+_pool = None
+
+
+def chart_spec(kind, title, ylabel, labels, series):
+    """
+    A chart as plain data: kind is "stacked_bar", "grouped_bar" or "line",
+    series a list of (label, values, color). Specs are what gets hashed for
+    the page cache and pickled to the render processes.
+    """
+    return {
+        "kind": kind,
+        "title": title,
+        "ylabel": ylabel,
+        "labels": [str(label) for label in labels],
+        "series": [
+            {"label": label, "values": [float(value or 0) for value in values], "color": color}
+            for label, values, color in series
+        ],
+    }
+
+
+def get_chart_key(spec):
+    payload = json.dumps({"version": CHART_STYLE_VERSION, "spec": spec}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(settings.CHART_CACHE_DIR, f"{key}.pdf")
+
+
+def _read_cached_page(key):
+    try:
+        with open(_cache_path(key), "rb") as page:
+            content = page.read()
+        # A hit counts as recent use, so pruning drops the least recently used pages
+        os.utime(_cache_path(key))
+        return content
+    except FileNotFoundError:
+        return None
+
+
+def _write_cached_page(key, page):
+    # Written to a temporary file and renamed, so concurrent requests never
+    # read a half-written page
+    os.makedirs(settings.CHART_CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=settings.CHART_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as temp_file:
+        temp_file.write(page)
+    os.replace(temp_path, _cache_path(key))
+
+
+def _prune_cache():
+    """Delete the least recently used pages beyond settings.CHART_CACHE_MAX_PAGES."""
+    try:
+        entries = [entry for entry in os.scandir(settings.CHART_CACHE_DIR) if entry.name.endswith(".pdf")]
+    except FileNotFoundError:
+        return
+    excess = len(entries) - settings.CHART_CACHE_MAX_PAGES
+    if excess <= 0:
+        return
+    stamped = []
+    for entry in entries:
+        try:
+            stamped.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            pass
+    for _, path in sorted(stamped)[:excess]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already pruned by a concurrent request
+            pass
+
+
+def get_chart_pool():
+    """
+    The process pool charts are rendered in, started on first use. Workers
+    are spawned rather than forked so they never inherit the server's
+    threads or database connections.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.CHART_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _render_all(specs):
+    # matplotlib and NumPy are only loaded by processes that draw charts
+    from .chart_renderer import render_chart
+
+    if len(specs) < 2 or settings.CHART_RENDER_WORKERS < 2:
+        return [render_chart(spec) for spec in specs]
+    global _pool
+    try:
+        return list(get_chart_pool().map(render_chart, specs))
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and render here
+        _pool = None
+        return [render_chart(spec) for spec in specs]
+
+
+def render_charts_pdf(specs):
+    """
+    One PDF with a page per chart spec. Pages are cached on disk by the hash
+    of their spec, so only charts whose data changed are drawn; those are
+    rendered in parallel and the pages merged. The cache keeps at most
+    settings.CHART_CACHE_MAX_PAGES pages, dropping the least recently used.
+    """
+    from pypdf import PdfWriter
+
+    keys = [get_chart_key(spec) for spec in specs]
+    pages = {key: _read_cached_page(key) for key in keys}
+
+    missing = {key: spec for key, spec in zip(keys, specs) if pages[key] is None}
+    for key, page in zip(missing, _render_all(list(missing.values()))):
+        _write_cached_page(key, page)
+        pages[key] = page
+    if missing:
+        _prune_cache()
+
+    writer = PdfWriter()
+    for key in keys:
+        writer.append(BytesIO(pages[key]))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,278 @@
+# In-process columnar copy of the survey tables for interactive analytics.
+# Imports NumPy, so it is only imported where a snapshot is actually used
+# (settings.ANALYTICS_SNAPSHOT_ENABLED).
+import threading
+import time
+import uuid
+from datetime import date, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from analytics.models import DeletedRecord
+from data_collection.models import AnnualData, SixMonthData
+
+
+SNAPSHOT_MODELS = (SixMonthData, AnnualData)
+
+# Integer-coded key columns -> lookup from a survey row. "month" (year * 12 +
+# month - 1 of created_at) is coded arithmetically and has no lookup.
+KEY_LOOKUPS = {
+    "member": "member_id",
+    "group": "member__group_id",
+    "cluster": "member__group__cluster_id",
+    "facilitator": "member__group__facilitator_id",
+    "location": "member__group__location",
+}
+ID_KEYS = ("member", "group", "cluster", "facilitator")
+
+# How far the watermark trails the start of a refresh, so rows (and
+# tombstones) stamped before it began but committed after its scan are
+# read again next time
+SNAPSHOT_REFRESH_LAG = timedelta(minutes=5)
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def get_month_code(created_at):
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return created_at.year * 12 + created_at.month - 1
+
+
+def decode_month(code):
+    return date(code // 12, code % 12 + 1, 1)
+
+
+def _to_datetime64(value):
+    if timezone.is_aware(value):
+        value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, 'us')
+
+
+class KeyCodes:
+    """
+    The distinct values of one key column, numbered in order of appearance.
+    Values are kept as the database returns them (ids as uuid.UUID), so
+    snapshot results merge with SQL results by the same keys.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ColumnarSnapshot:
+    """
+    The numeric fields of one survey model as float64 arrays (NaN for NULL),
+    aligned with int32 key columns and a created_at array.
+
+    refresh() only re-reads rows whose own, member's or group's updated_at
+    passed the watermark, and drops the rows whose DeletedRecord tombstones
+    did. Deletes that left no tombstone are noticed by the row count and
+    trigger a full reload. Arrays are replaced, never modified in place, so
+    readers holding `data` stay consistent.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = [
+            field.name for field in model._meta.concrete_fields
+            if isinstance(field, (models.DecimalField, models.IntegerField, models.FloatField)) and not field.is_relation
+        ]
+        self.key_codes = {key: KeyCodes() for key in KEY_LOOKUPS}
+        self.row_index = {}
+        self.data = self._empty_data()
+        self.watermark = None
+        self.refreshed_at = None
+
+    def _empty_data(self):
+        return {
+            "created_at": np.empty(0, dtype='datetime64[us]'),
+            "month": np.empty(0, dtype=np.int32),
+            **{key: np.empty(0, dtype=np.int32) for key in KEY_LOOKUPS},
+            **{field: np.empty(0, dtype=np.float64) for field in self.fields},
+        }
+
+    def __len__(self):
+        return len(self.row_index)
+
+    def refresh(self, full=False):
+        started = timezone.now()
+        queryset = self.model.objects.all()
+        if full or self.watermark is None:
+            full = True
+            self.row_index = {}
+            self.data = self._empty_data()
+        else:
+            watermark = self.watermark
+            queryset = queryset.filter(
+                Q(updated_at__gte=watermark) |
+                Q(member__updated_at__gte=watermark) |
+                Q(member__group__updated_at__gte=watermark)
+            )
+            self._remove(DeletedRecord.objects.filter(
+                model_name=self.model.__name__, created_at__gte=watermark
+            ).values_list('object_id', flat=True))
+        self._apply(queryset.values_list('pk', 'created_at', *KEY_LOOKUPS.values(), *self.fields))
+        self.watermark = started - SNAPSHOT_REFRESH_LAG
+        self.refreshed_at = time.monotonic()
+
+        if not full and len(self) != self.model.objects.count():
+            self.refresh(full=True)
+
+    def _remove(self, pks):
+        positions = [self.row_index.pop(pk) for pk in set(pks) if pk in self.row_index]
+        if not positions:
+            return
+        keep = np.ones(len(self.data["month"]), dtype=bool)
+        keep[positions] = False
+        new_positions = np.cumsum(keep) - 1
+        self.row_index = {pk: int(new_positions[position]) for pk, position in self.row_index.items()}
+        self.data = {name: column[keep] for name, column in self.data.items()}
+
+    def _apply(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        size = len(self.row_index)
+        positions = np.empty(len(rows), dtype=np.int64)
+        for i, row in enumerate(rows):
+            position = self.row_index.get(row[0])
+            if position is None:
+                position = self.row_index[row[0]] = size
+                size += 1
+            positions[i] = position
+
+        key_offset = 2
+        field_offset = key_offset + len(KEY_LOOKUPS)
+        new_values = {
+            "created_at": np.array([_to_datetime64(row[1]) for row in rows], dtype='datetime64[us]'),
+            "month": np.array([get_month_code(row[1]) for row in rows], dtype=np.int32),
+        }
+        for i, key in enumerate(KEY_LOOKUPS):
+            codes = self.key_codes[key]
+            new_values[key] = np.array(
+                [codes.encode(row[key_offset + i]) for row in rows], dtype=np.int32
+            )
+        for i, field in enumerate(self.fields):
+            new_values[field] = np.array(
+                [np.nan if row[field_offset + i] is None else float(row[field_offset + i]) for row in rows],
+                dtype=np.float64,
+            )
+
+        data = {}
+        for name, column in self.data.items():
+            grown = np.empty(size, dtype=column.dtype)
+            grown[:len(column)] = column
+            grown[positions] = new_values[name]
+            data[name] = grown
+        self.data = data
+
+    def mask(self, start_date=None, end_date=None, **filters):
+        """Rows created in [start_date, end_date] whose key columns equal the filters."""
+        data = self.data
+        mask = np.ones(len(data["month"]), dtype=bool)
+        if start_date and end_date:
+            created_at = data["created_at"]
+            mask &= (created_at >= _to_datetime64(start_date)) & (created_at <= _to_datetime64(end_date))
+        for key, value in filters.items():
+            if key in ID_KEYS:
+                try:
+                    value = uuid.UUID(str(value))
+                except ValueError:
+                    return np.zeros_like(mask)
+            code = self.key_codes[key].codes.get(value)
+            if code is None:
+                return np.zeros_like(mask)
+            mask &= data[key] == code
+        return mask
+
+    def group_reduce(self, keys, reductions, mask=None):
+        """
+        Grouped reductions over the masked rows. keys are key column names
+        (including "month"); reductions map a result name to (how, field),
+        how being sum, avg, min, max or count (field None counts rows).
+        NULL handling follows SQL: sum/avg/min/max of no values is None.
+
+        Returns {key value tuple: {name: value}}; without keys, one entry
+        under () even when no row matches.
+        """
+        data = self.data
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(data["month"]))
+
+        composite = np.zeros(len(rows), dtype=np.int64)
+        sizes = []
+        for key in keys:
+            codes = data[key][rows].astype(np.int64)
+            size = int(codes.max()) + 1 if len(codes) else 1
+            composite = composite * size + codes
+            sizes.append(size)
+        groups, inverse = np.unique(composite, return_inverse=True)
+        if not keys and not len(groups):
+            groups, inverse = np.zeros(1, dtype=np.int64), inverse
+        count = len(groups)
+
+        order = np.argsort(inverse, kind='stable')
+        starts = np.searchsorted(inverse[order], np.arange(count))
+        row_counts = np.bincount(inverse, minlength=count)
+
+        results = {}
+        for name, (how, field) in reductions.items():
+            if how == 'count' and field is None:
+                results[name] = row_counts.tolist()
+                continue
+            values = data[field][rows]
+            present = ~np.isnan(values)
+            value_counts = np.bincount(inverse, weights=present, minlength=count)
+            if how == 'count':
+                reduced = value_counts
+            elif how in ('sum', 'avg'):
+                reduced = np.bincount(inverse, weights=np.where(present, values, 0), minlength=count)
+                if how == 'avg':
+                    reduced = reduced / np.maximum(value_counts, 1)
+            else:
+                reduce = np.fmin if how == 'min' else np.fmax
+                reduced = reduce.reduceat(values[order], starts) if len(rows) else np.full(count, np.nan)
+            results[name] = [
+                None if how != 'count' and not value_count else value.item()
+                for value, value_count in zip(reduced, value_counts)
+            ]
+
+        report = {}
+        for group_index, composite_code in enumerate(groups.tolist()):
+            codes = []
+            for size in reversed(sizes):
+                composite_code, code = divmod(composite_code, size)
+                codes.append(code)
+            values = tuple(
+                decode_month(code) if key == "month" else self.key_codes[key].values[code]
+                for key, code in zip(keys, reversed(codes))
+            )
+            report[values] = {name: column[group_index] for name, column in results.items()}
+        return report
+
+
+def get_snapshot(model):
+    """
+    The process-wide snapshot of a SNAPSHOT_MODELS model, refreshed when it
+    is older than settings.ANALYTICS_SNAPSHOT_MAX_AGE seconds.
+    """
+    with _lock:
+        snapshot = _snapshots.get(model)
+        if snapshot is None:
+            snapshot = _snapshots[model] = ColumnarSnapshot(model)
+        if snapshot.refreshed_at is None or time.monotonic() - snapshot.refreshed_at > settings.ANALYTICS_SNAPSHOT_MAX_AGE:
+            snapshot.refresh()
+    return snapshot
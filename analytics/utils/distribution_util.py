@@ -0,0 +1,124 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import Aggregate, Avg, Count, FloatField, Func, IntegerField, Max, Min, StdDev, Value
+from django.db.models.functions import Cast, Least
+
+from data_collection.models import AnnualData, SixMonthData
+from .metric_query import DIMENSIONS
+
+
+# Fields the distribution endpoint describes -> the survey model they live on
+DISTRIBUTION_FIELDS = {
+    "total_savings": AnnualData,
+    "approx_monthly_personal_income": SixMonthData,
+    "approx_monthly_household_income": SixMonthData,
+    "iga_capital": SixMonthData,
+}
+DISTRIBUTION_GROUPINGS = ("location", "cluster", "group")
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+MAX_BINS = 100
+
+
+class PercentileCont(Aggregate):
+    """
+    percentile_cont(ARRAY[...]) WITHIN GROUP (ORDER BY expression): every
+    requested quantile of a group, interpolated, as one float array.
+    """
+    function = 'percentile_cont'
+    template = '%(function)s(ARRAY[%(fractions)s]::double precision[]) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fractions, **extra):
+        # Rendered into the SQL, so only plain floats are accepted
+        fractions = ", ".join(repr(float(fraction)) for fraction in fractions)
+        super().__init__(expression, fractions=fractions, output_field=ArrayField(FloatField()), **extra)
+
+
+class WidthBucket(Func):
+    """width_bucket(value, low, high, count): 1..count for low <= value < high."""
+    function = 'width_bucket'
+    output_field = IntegerField()
+
+
+def get_distribution(queryset, field, group_by=None, quantiles=DEFAULT_QUANTILES, bins=10):
+    """
+    Distribution of a numeric field per value of group_by (a lookup, or None
+    for the whole queryset): count, mean, sample stddev, min, max, the
+    requested quantiles and a histogram of `bins` equal-width bins.
+
+    Everything but the histograms comes from one grouped query using
+    percentile_cont; the histograms from a second one using width_bucket.
+    The bins span the overall min..max, so every group shares the same
+    edges. NULLs are ignored.
+
+    Returns {"edges": [...], "rows": [{"key", "count", "mean", "stddev",
+    "min", "max", "quantiles": {fraction: value}, "histogram": [...]}]}.
+    """
+    queryset = queryset.filter(**{f"{field}__isnull": False}).order_by()
+    value = Cast(field, FloatField())
+    columns = [group_by] if group_by else []
+
+    aggregates = dict(
+        count=Count('pk'),
+        mean=Avg(value),
+        stddev=StdDev(value, sample=True),
+        min=Min(value),
+        max=Max(value),
+        quantiles=PercentileCont(value, quantiles),
+    )
+    stats = queryset.values(*columns).annotate(**aggregates) if columns else [queryset.aggregate(**aggregates)]
+    stats = [row for row in stats if row["count"]]
+    if not stats:
+        return {"edges": [], "rows": []}
+
+    low = min(row["min"] for row in stats)
+    high = max(row["max"] for row in stats)
+    if low == high:
+        # width_bucket needs low < high; every value falls in the one bin
+        edges = [low, high]
+        histograms = {row.get(group_by): [row["count"]] for row in stats}
+    else:
+        edges = [low + (high - low) * i / bins for i in range(bins + 1)]
+        histograms = {row.get(group_by): [0] * bins for row in stats}
+        # high itself lands in bucket bins + 1; fold it into the last bin
+        bucket = Least(WidthBucket(value, Value(low), Value(high), Value(bins)), Value(bins))
+        counts = queryset.annotate(bucket=bucket).values(*columns, 'bucket').annotate(count=Count('pk'))
+        for row in counts:
+            histograms[row.get(group_by)][row["bucket"] - 1] = row["count"]
+
+    rows = []
+    for row in stats:
+        key = row.get(group_by)
+        rows.append({
+            "key": key,
+            "count": row["count"],
+            "mean": row["mean"],
+            "stddev": row["stddev"],
+            "min": row["min"],
+            "max": row["max"],
+            "quantiles": dict(zip((str(fraction) for fraction in quantiles), row["quantiles"])),
+            "histogram": histograms[key],
+        })
+    rows.sort(key=lambda row: (row["key"] is None, str(row["key"])))
+    return {"edges": edges, "rows": rows}
+
+
+def get_field_distribution(scope, field, by=None, quantiles=DEFAULT_QUANTILES, bins=10):
+    """
+    get_distribution() of a DISTRIBUTION_FIELDS field over a scope, per
+    location, cluster or group (DISTRIBUTION_GROUPINGS) or overall. Raises
+    ValueError for unknown fields or groupings and invalid quantiles or bins.
+    """
+    if field not in DISTRIBUTION_FIELDS:
+        raise ValueError(f"field must be one of: {', '.join(DISTRIBUTION_FIELDS)}.")
+    if by and by not in DISTRIBUTION_GROUPINGS:
+        raise ValueError(f"by must be one of: {', '.join(DISTRIBUTION_GROUPINGS)}.")
+    if not quantiles or any(not 0 <= fraction <= 1 for fraction in quantiles):
+        raise ValueError("quantiles must be between 0 and 1.")
+    if not 1 <= bins <= MAX_BINS:
+        raise ValueError(f"bins must be between 1 and {MAX_BINS}.")
+
+    model = DISTRIBUTION_FIELDS[field]
+    return get_distribution(
+        scope.filter(model.objects.all()), field,
+        group_by=DIMENSIONS[by][model] if by else None,
+        quantiles=quantiles, bins=bins,
+    )
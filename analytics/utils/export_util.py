@@ -0,0 +1,112 @@
+import csv
+import io
+import zipfile
+
+from django.http import StreamingHttpResponse
+
+
+# Bytes buffered before a chunk is handed to the response
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Rows read per server-side cursor fetch by streamed exports
+EXPORT_CHUNK_ROWS = 2000
+
+
+class _StreamBuffer:
+    """
+    Write-only, non-seekable file object that ZipFile writes into. The bytes
+    written so far are drained after every chunk, so memory stays bounded.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def stream_csv_zip(csv_files):
+    """
+    Yield a ZIP archive piece by piece. csv_files maps file names to row
+    iterables; each one is written as a CSV entry while it is being consumed.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for filename, rows in csv_files.items():
+            with io.TextIOWrapper(zip_file.open(filename, "w", force_zip64=True), encoding="utf-8", newline="") as entry:
+                writer = csv.writer(entry)
+                for row in rows:
+                    writer.writerow(row)
+                    if buffer.size >= STREAM_CHUNK_BYTES:
+                        yield buffer.drain()
+            yield buffer.drain()
+    # Central directory written on close
+    yield buffer.drain()
+
+
+
+class _Echo:
+    """File object for csv.writer whose write() hands the formatted line back."""
+
+    def write(self, line):
+        return line
+
+
+def stream_csv(rows):
+    """
+    Yield the CSV text of an iterable of rows in pieces of about
+    STREAM_CHUNK_BYTES. The first row (the header) is yielded on its own so
+    the response starts before any data row is computed.
+    """
+    writer = csv.writer(_Echo())
+    rows = iter(rows)
+    for row in rows:
+        yield writer.writerow(row)
+        break
+
+    pending = []
+    size = 0
+    for row in rows:
+        line = writer.writerow(row)
+        pending.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_BYTES:
+            yield "".join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield "".join(pending)
+
+
+def csv_streaming_response(rows, filename):
+    """StreamingHttpResponse downloading an iterable of rows as filename."""
+    response = StreamingHttpResponse(stream_csv(rows), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def iter_chunks(queryset, chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Yield lists of at most chunk_size objects of a queryset, read through one
+    server-side cursor, so only a chunk is held in memory at a time.
+    """
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
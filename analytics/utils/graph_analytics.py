@@ -1,150 +1,117 @@
-from django.db.models import Sum, Max, Avg, DecimalField, F
+from django.db.models import Sum, Max, Avg, Count, DecimalField, F, OuterRef, Subquery
 from django.db.models.functions import Coalesce
 from cluster_management.models import SelfHelpGroup, Member
 from data_collection.models import AnnualData, SixMonthData, AnnualSelfHelpGroupData, AnnualSelfHelpGroupData
-from django.utils.dateparse import parse_datetime
 from django.db.models.functions import Cast
+from .analytics_util import aggregate_by
+from .scope import AnalyticsScope
+from .bucket_util import get_bucketed_survey_totals
 
 def get_location_level_graph_data(start_date=None, end_date=None, cluster=None):
     
-    # Prepare a dictionary for optional date filtering
-    date_filters = {}
-    if start_date and end_date:
-        date_filters['created_at__range'] = [start_date, end_date]
-
-    # If a cluster filter is provided, further restrict the groups.
-    groups_qs = SelfHelpGroup.objects.all()
-    if cluster:
-        groups_qs = groups_qs.filter(cluster=cluster)
-    
-    # Get distinct, non-empty location values from SelfHelpGroup.
-    locations = groups_qs.exclude(location__isnull=True).exclude(location__exact="").values_list('location', flat=True).distinct()
+    scope = AnalyticsScope(start_date=start_date, end_date=end_date, cluster=cluster)
+
+    # Get distinct, non-empty location values from the scoped groups,
+    # with the group count of each location.
+    group_totals = aggregate_by(
+        scope.filter(SelfHelpGroup.objects.all()).exclude(location__isnull=True).exclude(location__exact=""),
+        'location',
+        total_groups=Count('id'),
+    )
+
+    # One grouped query per source table for every location at once
+    member_totals = aggregate_by(scope.filter(Member.objects.all()), 'group__location', total_members=Count('id'))
+
+    # Date ranges are answered from the monthly buckets when they are current
+    buckets = get_bucketed_survey_totals(scope, group_by='location')
+    if buckets is not None:
+        annual_totals = {loc: {"total_savings": row.get("savings_total")} for loc, row in buckets.items()}
+        six_month_totals = {
+            loc: {
+                "total_capital": row.get("iga_capital_total"),
+                "total_loan_circulated": row.get("loan_circulated_total"),
+                "max_loan_taken": row.get("loan_circulated_max"),
+                "total_loan_other_sources": row.get("other_source_loan_total"),
+            }
+            for loc, row in buckets.items()
+        }
+    else:
+        annual_totals = aggregate_by(
+            scope.filter(AnnualData.objects.all()), 'member__group__location',
+            total_savings=Sum('total_savings'),
+        )
+        six_month_totals = aggregate_by(
+            scope.filter(SixMonthData.objects.all()), 'member__group__location',
+            total_capital=Sum('iga_capital'),
+            total_loan_circulated=Sum('loan_amount_received_shg'),
+            max_loan_taken=Max('loan_amount_received_shg'),
+            total_loan_other_sources=Sum('loan_amount_from_other_sources'),
+        )
 
     results = {}
 
-    for loc in locations:
-        # For each location, get all groups at that location
-        groups = groups_qs.filter(location=loc)
-        total_groups = groups.count()
-
-        # Get all members that belong to these groups
-        members = Member.objects.filter(group__in=groups)
-        total_members = members.count()
-
-        # Aggregate savings from AnnualData for these members (with date filtering if provided)
-        total_savings = AnnualData.objects.filter(member__in=members, **date_filters).aggregate(
-            total=Sum('total_savings')
-        )['total']
-        if not total_savings: total_savings = 0
-        # Aggregate capital and loan data from SixMonthData
-        total_capital = SixMonthData.objects.filter(member__in=members, **date_filters).aggregate(
-            total=Sum('iga_capital')
-        )['total']
-        
-        if not total_capital: total_capital = 0
-
-        total_loan_circulated = SixMonthData.objects.filter(member__in=members, **date_filters).aggregate(
-            total=Sum('loan_amount_received_shg')
-        )['total']
-        
-        if not total_loan_circulated: total_loan_circulated = 0
-
-        max_loan_taken = SixMonthData.objects.filter(member__in=members, **date_filters).aggregate(
-            maximum=Max('loan_amount_received_shg')
-        )['maximum']
-        
-        if not max_loan_taken : max_loan_taken = 0
-
-        total_loan_other_sources = SixMonthData.objects.filter(member__in=members, **date_filters).aggregate(
-            total=Sum('loan_amount_from_other_sources')
-        )['total']
-        
-        if not total_loan_other_sources : total_loan_other_sources = 0
+    for loc, group_row in group_totals.items():
+        annual_row = annual_totals.get(loc, {})
+        six_month_row = six_month_totals.get(loc, {})
 
         # Build the dictionary for the current location
         results[loc] = {
-            "total_groups": total_groups,
-            "total_members": total_members,
-            "total_savings": total_savings,
-            "total_capital": total_capital,
-            "total_loan_circulated": total_loan_circulated,
-            "max_loan_taken": max_loan_taken,
-            "total_loan_other_sources": total_loan_other_sources,
+            "total_groups": group_row["total_groups"],
+            "total_members": member_totals.get(loc, {}).get("total_members", 0),
+            "total_savings": annual_row.get("total_savings") or 0,
+            "total_capital": six_month_row.get("total_capital") or 0,
+            "total_loan_circulated": six_month_row.get("total_loan_circulated") or 0,
+            "max_loan_taken": six_month_row.get("max_loan_taken") or 0,
+            "total_loan_other_sources": six_month_row.get("total_loan_other_sources") or 0,
         }
 
     return results
 
 
 
+def _per_group(queryset, group_lookup, aggregate):
+    """
+    Correlated subquery of one aggregate over the queryset's rows of the
+    outer SelfHelpGroup. Each table is aggregated on its own, so joining
+    AnnualData and SixMonthData never multiplies each other's rows.
+    """
+    rows = (queryset.filter(**{group_lookup: OuterRef('pk')})
+            .order_by()
+            .values(group_lookup)
+            .annotate(value=aggregate)
+            .values('value'))
+    return Subquery(rows, output_field=DecimalField())
+
+
 def get_group_level_financial_metrics(start_date=None, end_date=None, cluster=None):
     # Build date filters if provided
-    filters = {}
-    if start_date and end_date:
-        # Expecting start_date and end_date to be strings in "YYYY-MM-DD" format
-        start_date = parse_datetime(start_date)
-        end_date = parse_datetime(end_date)
-        filters['created_at__range'] = [start_date, end_date]
-    
-    # Get the SelfHelpGroup queryset; if a cluster is provided, filter by cluster.
-    groups_qs = SelfHelpGroup.objects.all()
-    if cluster:
-        groups_qs = groups_qs.filter(cluster=cluster)
-    
-    
-    
+    scope = AnalyticsScope(start_date=start_date, end_date=end_date, cluster=cluster)
+
+    # Survey rows within the date range, joined through member -> group
+    annual_data = scope.filter(AnnualData.objects.all())
+    six_month_data = scope.filter(SixMonthData.objects.all())
+    group_data = scope.filter(AnnualSelfHelpGroupData.objects.all())
+
+    # Every metric of every group in one query; groups without rows get NULLs
+    groups = scope.filter(SelfHelpGroup.objects.all()).annotate(
+        # Monthly savings from AnnualData, reported as the weekly saving
+        weekly_saving=_per_group(annual_data, 'member__group', Sum('total_savings')),
+        total_capital=_per_group(six_month_data, 'member__group', Sum('iga_capital')),
+        total_expenditure=_per_group(group_data, 'group', Sum('expenditure_social_savings')),
+        avg_iga_capital=_per_group(six_month_data, 'member__group', Avg('iga_capital')),
+        avg_monthly_income=_per_group(six_month_data, 'member__group', Avg('approx_monthly_personal_income')),
+    ).values(
+        'group_name', 'weekly_saving', 'total_capital', 'total_expenditure', 'avg_iga_capital', 'avg_monthly_income',
+    )
+
     results = {}
-    
-    # Loop over each group in the queryset.
-    for group in groups_qs:
-        print(group.group_name)
-        # Get all members in this group
-        members = Member.objects.filter(group=group)
-        # if not members.exists():
-        #     continue  # Skip groups with no members
-        
-        # Aggregate monthly savings from AnnualData for these members.
-        total_monthly_savings = AnnualData.objects.filter(member__in=members, **filters).aggregate(
-            total=Sum('total_savings')
-        )['total']
-        if not total_monthly_savings: total_monthly_savings = 0
-        # Convert monthly savings to weekly saving
-        weekly_saving = total_monthly_savings 
-        
-        # Total Capital from SixMonthData: sum of iga_capital
-        total_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(
-            total=Sum('iga_capital')
-        )['total']
-        
-        if not total_capital: total_capital = 0
-        
-        # # # Total Expenditure from AnnualData: sum of total_expenditure
-        total_expenditure = AnnualSelfHelpGroupData.objects.filter(group=group, **filters).aggregate(
-            total=Sum('expenditure_social_savings')
-        )['total']
-        
-        if not total_expenditure: total_expenditure = 0
-        
-        # IGA Capital: average of iga_capital
-        avg_iga_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(
-            avg=Avg('iga_capital')
-        )['avg']
-        
-        if not avg_iga_capital: avg_iga_capital = 0
-        
-        # Approximate Monthly Income: average of approx_monthly_personal_income
-        avg_monthly_income = SixMonthData.objects.filter(member__in=members, **filters).aggregate(
-            avg=Avg('approx_monthly_personal_income')
-        )['avg']
-        
-        if not avg_monthly_income: avg_monthly_income = 0
-        
-        # Build the metrics dictionary for this group.
-        results[group.group_name] = {
-            "weekly_saving": round(weekly_saving, 2),
-            "total_capital": round(total_capital, 2),
-            "total_expenditure": round(total_expenditure, 2),
-            "iga_capital": round(avg_iga_capital, 2),
-            "approx_monthly_income": round(avg_monthly_income, 2)
+    for group in groups:
+        results[group['group_name']] = {
+            "weekly_saving": round(group['weekly_saving'] or 0, 2),
+            "total_capital": round(group['total_capital'] or 0, 2),
+            "total_expenditure": round(group['total_expenditure'] or 0, 2),
+            "iga_capital": round(group['avg_iga_capital'] or 0, 2),
+            "approx_monthly_income": round(group['avg_monthly_income'] or 0, 2)
         }
-    
+
     return results
@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.db.models import Sum, Avg, Min, Max, Count, DateField
+from django.db.models.functions import TruncMonth
+
+from cluster_management.models import SelfHelpGroup, Member
+from data_collection.models import AnnualData, SixMonthData, AnnualSelfHelpGroupData
+from .scope import AnalyticsScope, GROUP_PATHS, MEMBER_PATHS
+
+
+class Metric:
+    """An aggregate over one source model; default fills rows the model has no data for."""
+
+    def __init__(self, model, aggregate, default=None):
+        self.model = model
+        self.aggregate = aggregate
+        self.default = default
+
+
+def _stats(prefix, model, field):
+    return {
+        f"{prefix}_total": Metric(model, Sum(field)),
+        f"{prefix}_avg": Metric(model, Avg(field)),
+        f"{prefix}_min": Metric(model, Min(field)),
+        f"{prefix}_max": Metric(model, Max(field)),
+    }
+
+
+METRICS = {
+    "groups": Metric(SelfHelpGroup, Count('id'), default=0),
+    "members": Metric(Member, Count('id'), default=0),
+    "household_size_total": Metric(Member, Sum('hh_size')),
+    "annual_submissions": Metric(AnnualData, Count('id'), default=0),
+    **_stats("savings", AnnualData, 'total_savings'),
+    "six_month_submissions": Metric(SixMonthData, Count('id'), default=0),
+    **_stats("iga_capital", SixMonthData, 'iga_capital'),
+    **_stats("loan_circulated", SixMonthData, 'loan_amount_received_shg'),
+    "loan_other_sources_total": Metric(SixMonthData, Sum('loan_amount_from_other_sources')),
+    "monthly_income_avg": Metric(SixMonthData, Avg('approx_monthly_personal_income')),
+    "group_submissions": Metric(AnnualSelfHelpGroupData, Count('id'), default=0),
+    "shg_capital_total": Metric(AnnualSelfHelpGroupData, Sum('shg_capital')),
+    "social_expenditure_total": Metric(AnnualSelfHelpGroupData, Sum('expenditure_social_savings')),
+}
+
+# Dimension -> {model: lookup} for every model the dimension applies to
+DIMENSIONS = {
+    "location": {model: f"{path}location" for model, path in GROUP_PATHS.items()},
+    "cluster": {model: f"{path}cluster_id" for model, path in GROUP_PATHS.items()},
+    "facilitator": {model: f"{path}facilitator_id" for model, path in GROUP_PATHS.items()},
+    "group": {model: f"{path}id" for model, path in GROUP_PATHS.items()},
+    "gender": {model: f"{path}gender" for model, path in MEMBER_PATHS.items()},
+    "iga_code": {SixMonthData: "iga_activity_code"},
+    # Month the row was created in
+    "month": {model: None for model in GROUP_PATHS},
+}
+
+# Dimensions passed as filters that AnalyticsScope handles itself
+SCOPE_DIMENSIONS = ("location", "cluster", "facilitator", "group")
+
+# Dimensions the columnar snapshot has key columns for
+SNAPSHOT_DIMENSIONS = (*SCOPE_DIMENSIONS, "month")
+
+
+def _dimension_lookup(dimension, model):
+    if model not in DIMENSIONS[dimension]:
+        raise ValueError(f"Dimension '{dimension}' does not apply to {model.__name__} metrics.")
+    return DIMENSIONS[dimension][model]
+
+
+def _snapshot_results(model, names, dimensions, filters, scope):
+    """
+    The grouped results of one model's metrics from the columnar snapshot,
+    or None when the snapshot is off or cannot answer the query (a model,
+    dimension or aggregate it does not cover).
+    """
+    if not settings.ANALYTICS_SNAPSHOT_ENABLED:
+        return None
+    from .columnar_snapshot import SNAPSHOT_MODELS, get_snapshot
+
+    if model not in SNAPSHOT_MODELS or any(name not in SNAPSHOT_DIMENSIONS for name in [*dimensions, *filters]):
+        return None
+    reductions = {}
+    for name in names:
+        aggregate = METRICS[name].aggregate
+        how = type(aggregate).__name__.lower()
+        field = aggregate.source_expressions[0].name
+        if how not in ('sum', 'avg', 'min', 'max', 'count'):
+            return None
+        reductions[name] = (how, None if field == 'id' else field)
+
+    snapshot = get_snapshot(model)
+    if any(field and field not in snapshot.fields for _, field in reductions.values()):
+        return None
+    mask = snapshot.mask(scope.start_date, scope.end_date, **filters)
+    return snapshot.group_reduce(dimensions, reductions, mask)
+
+
+def run_metric_query(metrics, dimensions=(), filters=None, start_date=None, end_date=None):
+    """
+    Compute the named METRICS broken down by DIMENSIONS, with one grouped
+    query per source model, and merge them into a row per dimension value
+    combination.
+
+    filters maps a dimension to the value it must equal; start_date and
+    end_date restrict the survey models to a created_at range. Raises
+    ValueError for unknown or inapplicable metrics, dimensions and filters.
+
+    With settings.ANALYTICS_SNAPSHOT_ENABLED, survey metrics over snapshot
+    dimensions are reduced in memory instead, returning floats for sums and
+    averages.
+    """
+    filters = filters or {}
+    unknown = [name for name in metrics if name not in METRICS]
+    unknown += [name for name in [*dimensions, *filters] if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown metric(s) or dimension(s): {', '.join(unknown)}")
+    if not metrics:
+        raise ValueError("At least one metric is required.")
+    if "month" in filters:
+        raise ValueError("Filter months with start_date and end_date.")
+
+    scope = AnalyticsScope(
+        start_date=start_date, end_date=end_date,
+        **{key: value for key, value in filters.items() if key in SCOPE_DIMENSIONS},
+    )
+    by_model = {}
+    for name in metrics:
+        by_model.setdefault(METRICS[name].model, []).append(name)
+
+    rows = {}
+    for model, names in by_model.items():
+        results = _snapshot_results(model, names, dimensions, filters, scope)
+        if results is not None:
+            for key, values in results.items():
+                rows.setdefault(key, {}).update(values)
+            continue
+
+        queryset = scope.filter(model.objects.all())
+        for dimension, value in filters.items():
+            if dimension not in SCOPE_DIMENSIONS:
+                queryset = queryset.filter(**{_dimension_lookup(dimension, model): value})
+
+        columns = {}
+        for dimension in dimensions:
+            lookup = _dimension_lookup(dimension, model)
+            if lookup is None:
+                queryset = queryset.annotate(metric_month=TruncMonth('created_at', output_field=DateField()))
+                lookup = 'metric_month'
+            columns[dimension] = lookup
+
+        aggregates = {name: METRICS[name].aggregate for name in names}
+        if columns:
+            results = queryset.order_by().values(*columns.values()).annotate(**aggregates)
+        else:
+            results = [queryset.aggregate(**aggregates)]
+
+        for result in results:
+            key = tuple(result.get(lookup) for lookup in columns.values())
+            rows.setdefault(key, {}).update({name: result[name] for name in names})
+
+    report = []
+    for key in sorted(rows, key=lambda values: [(value is None, str(value)) for value in values]):
+        row = {}
+        for dimension, value in zip(dimensions, key):
+            row[dimension] = value.strftime('%Y-%m') if dimension == "month" and value else value
+        for name in metrics:
+            value = rows[key].get(name)
+            row[name] = METRICS[name].default if value is None else value
+        report.append(row)
+    return report
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from cluster_management.models import Cluster, SelfHelpGroup, Member
+
+
+# Alias in settings.CACHES; shared by every process so all of them see the bumps
+REPORT_CACHE_ALIAS = "reports"
+
+# Token every scope depends on; bumped by any write
+SYSTEM_TOKEN = "all"
+
+# Token every cached report depends on, whatever its scope; bumped by bulk
+# rebuilds that change data without saying which scopes it belongs to
+EPOCH_TOKEN = "epoch"
+
+# Scope filters holding ids, canonicalized so they match the tokens of writes
+ID_FILTERS = ("cluster", "facilitator", "group")
+
+
+def get_report_cache():
+    return caches[REPORT_CACHE_ALIAS]
+
+
+def _canonical_id(value):
+    # Writes build their tokens from str(uuid); query parameters may use any form
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return value
+
+
+def get_scope_tokens(scope):
+    """
+    Invalidation tokens a cached report depends on. A scope restricted to a
+    cluster, group, etc. only depends on that entity's token, so writes
+    elsewhere leave it cached.
+    """
+    tokens = [
+        f"{key}:{_canonical_id(value) if key in ID_FILTERS else value}"
+        for key, value in sorted(scope.group_filters.items())
+    ]
+    if scope.member is not None:
+        tokens.append(f"member:{_canonical_id(scope.member)}")
+    return tokens or [SYSTEM_TOKEN]
+
+
+def get_group_tokens(group_ids):
+    """Tokens touched by a write to data belonging to the given groups."""
+    tokens = {SYSTEM_TOKEN}
+    rows = SelfHelpGroup.objects.filter(id__in=[g for g in group_ids if g]).values(
+        "id", "cluster_id", "facilitator_id", "location"
+    )
+    for row in rows:
+        tokens.add(f"group:{row['id']}")
+        if row["cluster_id"]:
+            tokens.add(f"cluster:{row['cluster_id']}")
+        if row["facilitator_id"]:
+            tokens.add(f"facilitator:{row['facilitator_id']}")
+        if row["location"]:
+            tokens.add(f"location:{row['location']}")
+    return tokens
+
+
+def get_instance_tokens(instance):
+    """Tokens touched by writing one cluster_management/data_collection row."""
+    if isinstance(instance, Cluster):
+        return {SYSTEM_TOKEN, f"cluster:{instance.pk}"}
+    if isinstance(instance, SelfHelpGroup):
+        tokens = {SYSTEM_TOKEN, f"group:{instance.pk}"}
+        if instance.cluster_id:
+            tokens.add(f"cluster:{instance.cluster_id}")
+        if instance.facilitator_id:
+            tokens.add(f"facilitator:{instance.facilitator_id}")
+        if instance.location:
+            tokens.add(f"location:{instance.location}")
+        return tokens
+    if isinstance(instance, Member):
+        return get_group_tokens([instance.group_id]) | {f"member:{instance.pk}"}
+    if hasattr(instance, "member_id"):
+        group_id = Member.objects.filter(pk=instance.member_id).values_list("group_id", flat=True).first()
+        return get_group_tokens([group_id]) | {f"member:{instance.member_id}"}
+    if hasattr(instance, "group_id"):
+        return get_group_tokens([instance.group_id])
+    return {SYSTEM_TOKEN}
+
+
+def _version_key(token):
+    # Tokens contain free-text locations; hash them into a backend-safe key
+    return f"report-version:{hashlib.sha1(token.encode()).hexdigest()}"
+
+
+def bump_report_versions(tokens):
+    """
+    Invalidate every cached report depending on one of the tokens. Versions
+    are timestamps rather than counters, so an evicted version can never be
+    recreated with a value an old entry was stored under.
+    """
+    version = time.time_ns()
+    get_report_cache().set_many({_version_key(token): version for token in tokens}, None)
+
+
+def invalidate_all_reports():
+    """Invalidate every cached report, e.g. after rebuilding the rollup tables."""
+    bump_report_versions([EPOCH_TOKEN])
+
+
+def _get_versions(tokens):
+    cache = get_report_cache()
+    keys = [_version_key(token) for token in tokens]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _make_key(name, scope, params, versions):
+    payload = json.dumps({
+        "scope": {
+            "group_filters": {key: str(value) for key, value in scope.group_filters.items()},
+            "member": str(scope.member) if scope.member is not None else None,
+            "start_date": scope.start_date.isoformat() if scope.start_date else None,
+            "end_date": scope.end_date.isoformat() if scope.end_date else None,
+        },
+        "params": params,
+        "versions": versions,
+    }, sort_keys=True, default=str)
+    return f"report:{name}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+def get_cached_report(name, scope, compute, params=None):
+    """
+    Return the result of compute() for a report name, scope and extra params,
+    reusing a cached result until a write in the scope bumps its version.
+    """
+    cache = get_report_cache()
+    key = _make_key(name, scope, params, _get_versions([*get_scope_tokens(scope), EPOCH_TOKEN]))
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, settings.REPORT_CACHE_TIMEOUT)
+    return result
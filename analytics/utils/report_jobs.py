@@ -0,0 +1,149 @@
+import json
+import re
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from analytics.models import ReportJob
+from analytics.views import LocationLevelAnalyticsPDFView
+from analytics.graph_views import LocationAnalyticsGraphsPDFView, DumpAllDataView
+
+
+# Report type -> view rendering it. The worker calls the same views the
+# synchronous endpoints use, so a job's artifact is byte-for-byte what the
+# endpoint would have returned.
+REPORT_VIEWS = {
+    "pdf_table": LocationLevelAnalyticsPDFView,
+    "pdf_graph": LocationAnalyticsGraphsPDFView,
+    "dump_all_data": DumpAllDataView,
+}
+
+DEFAULT_FILENAMES = {
+    "pdf_table": "location_level_report.pdf",
+    "pdf_graph": "location_level_graphs.pdf",
+    "dump_all_data": "data.zip",
+}
+
+FILENAME_IN_DISPOSITION = re.compile(r'filename="?([^";]+)"?')
+
+
+class ReportJobError(Exception):
+    pass
+
+
+def claim_next_job():
+    """
+    Mark the oldest pending job as running and return it, or None. SKIP LOCKED
+    lets several workers poll the table without claiming the same job.
+    """
+    with transaction.atomic():
+        job = (ReportJob.objects.select_for_update(skip_locked=True)
+               .filter(status=ReportJob.STATUS_PENDING)
+               .order_by("created_at")
+               .first())
+        if job is None:
+            return None
+        job.status = ReportJob.STATUS_RUNNING
+        job.progress = 5
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "progress", "started_at", "updated_at"])
+    return job
+
+
+def set_progress(job, progress):
+    job.progress = progress
+    job.save(update_fields=["progress", "updated_at"])
+
+
+def build_request(params):
+    """A GET request carrying a job's params as its query string."""
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = "/"
+    request.META = {"REQUEST_METHOD": "GET", "SERVER_NAME": "localhost", "SERVER_PORT": "80"}
+    query = QueryDict(mutable=True)
+    for key, value in params.items():
+        query.setlist(key, [str(item) for item in value] if isinstance(value, (list, tuple)) else [str(value)])
+    query._mutable = False
+    request.GET = query
+    return request
+
+
+def _get_error(response):
+    if hasattr(response, "render"):
+        response.render()
+    try:
+        return json.loads(response.content).get("error") or response.content.decode()
+    except (ValueError, AttributeError):
+        return f"Report view returned status {response.status_code}"
+
+
+def run_job(job):
+    """
+    Render a claimed job through its report view and store the artifact.
+    Failures are recorded on the job rather than raised.
+    """
+    try:
+        view = REPORT_VIEWS[job.report_type].as_view()
+        response = view(build_request(job.params))
+        if response.status_code >= 400:
+            raise ReportJobError(_get_error(response))
+        set_progress(job, 50)
+
+        disposition = FILENAME_IN_DISPOSITION.search(response.get("Content-Disposition", ""))
+        filename = disposition.group(1) if disposition else DEFAULT_FILENAMES[job.report_type]
+
+        # Streamed reports are spooled to a temporary file, never held in memory
+        with tempfile.TemporaryFile() as spool:
+            for chunk in (response.streaming_content if response.streaming else [response.content]):
+                spool.write(chunk)
+            spool.seek(0)
+            job.artifact.save(filename, File(spool), save=False)
+
+        job.filename = filename
+        job.content_type = response.get("Content-Type", "application/octet-stream")
+        job.status = ReportJob.STATUS_COMPLETED
+        job.progress = 100
+    except Exception as e:
+        job.status = ReportJob.STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def requeue_stale_jobs(older_than):
+    """
+    Return jobs that have been running for longer than `older_than` (a
+    timedelta), i.e. left behind by a worker that died, to the queue.
+    """
+    return ReportJob.objects.filter(
+        status=ReportJob.STATUS_RUNNING, started_at__lt=timezone.now() - older_than
+    ).update(status=ReportJob.STATUS_PENDING, progress=0, started_at=None, updated_at=timezone.now())
+
+
+def delete_expired_jobs(older_than=None):
+    """
+    Delete completed and failed jobs that finished more than `older_than` (a
+    timedelta, by default settings.REPORT_JOB_RETENTION_DAYS days) ago,
+    together with their artifact files. Returns the number of jobs deleted.
+    """
+    if older_than is None:
+        older_than = timedelta(days=settings.REPORT_JOB_RETENTION_DAYS)
+    expired = ReportJob.objects.filter(
+        status__in=[ReportJob.STATUS_COMPLETED, ReportJob.STATUS_FAILED],
+        finished_at__lt=timezone.now() - older_than,
+    )
+    deleted = 0
+    for job in expired.iterator():
+        # The file goes first, so a failure never leaves an artifact without its row
+        if job.artifact:
+            job.artifact.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
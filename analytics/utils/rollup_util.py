@@ -0,0 +1,272 @@
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Sum, Count, Min, Max, F, Value, Case, When, IntegerField, DateField
+from django.db.models.functions import ExtractYear, TruncMonth
+from django.utils import timezone
+
+from analytics.models import GroupRollup, GroupMemberGrowth
+from cluster_management.models import Member
+from data_collection.models import AnnualData, SixMonthData, AnnualSelfHelpGroupData
+
+
+def get_period_start(created_at):
+    """First day of the half-year a row was created in."""
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return date(created_at.year, 1 if created_at.month <= 6 else 7, 1)
+
+
+def get_month(created_at):
+    """First day of the month a row was created in."""
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return date(created_at.year, created_at.month, 1)
+
+
+class RollupSource:
+    """
+    Describes how rows of one model feed GroupRollup.
+
+    fields maps a GroupRollup field to (kind, source_field), where kind is
+    'count' (one per row), 'count_value' (one per non-null value) or 'sum'.
+    Both the incremental signal deltas and the full rebuild are derived from
+    this mapping, so the two can never disagree. Tables that are only ever
+    recomputed (GroupMonthlyBucket) may also use 'min' and 'max'.
+
+    period maps a row's created_at to the period_start it counts towards:
+    half-years for GroupRollup, months for GroupMemberGrowth.
+    """
+
+    def __init__(self, model, group_lookup, fields, period=None):
+        self.model = model
+        self.group_lookup = group_lookup
+        self.fields = fields
+        self.period = period or get_period_start
+
+    @property
+    def source_fields(self):
+        return sorted({source_field for kind, source_field in self.fields.values() if kind != 'count'})
+
+    def read(self, pk):
+        """Current contribution of one row: (group_id, period_start, deltas) or None."""
+        row = (self.model.objects.filter(pk=pk)
+                .values(self.group_lookup, 'created_at', *self.source_fields)
+                .first())
+        if row is None:
+            return None
+        return self.contribution(row[self.group_lookup], row['created_at'], row)
+
+    def contribution(self, group_id, created_at, values):
+        """(group_id, period_start, deltas) of a row given its source field values."""
+        deltas = {}
+        for rollup_field, (kind, source_field) in self.fields.items():
+            value = values.get(source_field)
+            if kind == 'count':
+                deltas[rollup_field] = 1
+            elif kind == 'count_value':
+                deltas[rollup_field] = 0 if value is None else 1
+            else:
+                deltas[rollup_field] = value or 0
+        return group_id, self.period(created_at), deltas
+
+    def aggregates(self):
+        aggregates = {}
+        for rollup_field, (kind, source_field) in self.fields.items():
+            if kind == 'count':
+                aggregates[rollup_field] = Count('id')
+            elif kind == 'count_value':
+                aggregates[rollup_field] = Count(source_field)
+            elif kind == 'min':
+                aggregates[rollup_field] = Min(source_field)
+            elif kind == 'max':
+                aggregates[rollup_field] = Max(source_field)
+            else:
+                aggregates[rollup_field] = Sum(source_field)
+        return aggregates
+
+
+ROLLUP_SOURCES = {
+    Member: RollupSource(Member, 'group_id', {
+        'member_count': ('count', 'id'),
+        'hh_size_total': ('sum', 'hh_size'),
+    }),
+    AnnualData: RollupSource(AnnualData, 'member__group_id', {
+        'annual_data_count': ('count', 'id'),
+        'savings_total': ('sum', 'total_savings'),
+    }),
+    SixMonthData: RollupSource(SixMonthData, 'member__group_id', {
+        'six_month_data_count': ('count', 'id'),
+        'iga_capital_total': ('sum', 'iga_capital'),
+        'iga_capital_count': ('count_value', 'iga_capital'),
+        'loan_circulated_total': ('sum', 'loan_amount_received_shg'),
+        'other_source_loan_total': ('sum', 'loan_amount_from_other_sources'),
+    }),
+    AnnualSelfHelpGroupData: RollupSource(AnnualSelfHelpGroupData, 'group_id', {
+        'group_data_count': ('count', 'id'),
+        'shg_capital_total': ('sum', 'shg_capital'),
+        'social_expenditure_total': ('sum', 'expenditure_social_savings'),
+    }),
+}
+
+
+# Feeds GroupMemberGrowth: one per member, in the month it was created
+MEMBER_GROWTH_SOURCE = RollupSource(Member, 'group_id', {
+    'members_joined': ('count', 'id'),
+}, period=get_month)
+
+
+def apply_rollup_changes(previous=None, current=None, rollup_model=GroupRollup):
+    """
+    Move a row's contribution from `previous` to `current` (either may be None)
+    using F-expression updates, so concurrent writers never lose increments.
+    rollup_model is GroupRollup or GroupMemberGrowth.
+    """
+    changes = {}
+    for contribution, sign in ((previous, -1), (current, 1)):
+        if contribution is None:
+            continue
+        group_id, period_start, deltas = contribution
+        key_deltas = changes.setdefault((group_id, period_start), {})
+        for field, value in deltas.items():
+            key_deltas[field] = key_deltas.get(field, 0) + sign * value
+
+    with transaction.atomic():
+        for (group_id, period_start), deltas in changes.items():
+            updates = {field: F(field) + value for field, value in deltas.items() if value}
+            if not updates or group_id is None:
+                continue
+            updates['updated_at'] = timezone.now()
+            rollups = rollup_model.objects.filter(group_id=group_id, period_start=period_start)
+            if rollups.update(**updates):
+                continue
+            # Only additions create a row; removals from a missing row mean the
+            # group itself is being deleted
+            if not any(value > 0 for value in deltas.values()):
+                continue
+            rollup_model.objects.get_or_create(group_id=group_id, period_start=period_start)
+            rollups.update(**updates)
+
+
+def _lookup_value(instance, lookup):
+    # 'member__group_id' -> instance.member.group_id
+    value = instance
+    for part in lookup.split('__'):
+        value = getattr(value, part)
+    return value
+
+
+def apply_created_rows(instances):
+    """
+    Add the GroupRollup (and, for members, GroupMemberGrowth) contributions
+    of rows written without signals, e.g. by bulk_create, summed per group
+    and period: one update per touched period instead of one per row.
+    """
+    for rollup_model, sources in ((GroupRollup, ROLLUP_SOURCES), (GroupMemberGrowth, {Member: MEMBER_GROWTH_SOURCE})):
+        changes = {}
+        for instance in instances:
+            source = sources.get(type(instance))
+            if source is None:
+                continue
+            values = {field: getattr(instance, field) for field in source.source_fields}
+            group_id, period_start, deltas = source.contribution(
+                _lookup_value(instance, source.group_lookup), instance.created_at, values
+            )
+            key_deltas = changes.setdefault((group_id, period_start), {})
+            for field, value in deltas.items():
+                key_deltas[field] = key_deltas.get(field, 0) + value
+
+        for (group_id, period_start), deltas in changes.items():
+            apply_rollup_changes(current=(group_id, period_start, deltas), rollup_model=rollup_model)
+
+
+def move_member_survey_rollups(member_id, old_group_id, new_group_id):
+    """
+    Shift the survey totals of a member that changed group, one grouped
+    query per survey model.
+    """
+    for model in (AnnualData, SixMonthData):
+        source = ROLLUP_SOURCES[model]
+        for _, period_start, deltas in _aggregate_by_period(source, model.objects.filter(member_id=member_id)):
+            apply_rollup_changes(
+                previous=(old_group_id, period_start, deltas),
+                current=(new_group_id, period_start, deltas),
+            )
+
+
+def _aggregate_by_period(source, queryset):
+    rows = (queryset.order_by()
+            .annotate(
+                period_year=ExtractYear('created_at'),
+                period_month=Case(When(created_at__month__lte=6, then=Value(1)), default=Value(7), output_field=IntegerField()),
+            )
+            .values(source.group_lookup, 'period_year', 'period_month')
+            .annotate(**source.aggregates()))
+    for row in rows:
+        group_id = row.pop(source.group_lookup)
+        period_start = date(row.pop('period_year'), row.pop('period_month'), 1)
+        yield group_id, period_start, {field: value or 0 for field, value in row.items()}
+
+
+def rebuild_group_rollups():
+    """
+    Recompute every GroupRollup row from the source tables with one grouped
+    query per source model. Returns the number of rows written.
+    """
+    totals = {}
+    for source in ROLLUP_SOURCES.values():
+        for group_id, period_start, fields in _aggregate_by_period(source, source.model.objects.all()):
+            totals.setdefault((group_id, period_start), {}).update(fields)
+
+    with transaction.atomic():
+        GroupRollup.objects.all().delete()
+        GroupRollup.objects.bulk_create(
+            [GroupRollup(group_id=group_id, period_start=period_start, **fields)
+             for (group_id, period_start), fields in totals.items()],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def rebuild_member_growth():
+    """
+    Recompute every GroupMemberGrowth row from the members table. Returns
+    the number of rows written.
+    """
+    rows = (Member.objects.order_by()
+            .annotate(month=TruncMonth('created_at', output_field=DateField()))
+            .values('group_id', 'month')
+            .annotate(**MEMBER_GROWTH_SOURCE.aggregates()))
+
+    with transaction.atomic():
+        GroupMemberGrowth.objects.all().delete()
+        growth = GroupMemberGrowth.objects.bulk_create(
+            [GroupMemberGrowth(group_id=row.pop('group_id'), period_start=row.pop('month'), **row) for row in rows],
+            batch_size=1000,
+        )
+    return len(growth)
+
+
+def get_rollup_totals(scope):
+    """
+    Report totals summed from the GroupRollup rows of an undated AnalyticsScope.
+    """
+    totals = scope.filter(GroupRollup.objects.all()).aggregate(
+        member_count=Sum('member_count'),
+        hh_size_total=Sum('hh_size_total'),
+        annual_data_count=Sum('annual_data_count'),
+        savings_total=Sum('savings_total'),
+        six_month_data_count=Sum('six_month_data_count'),
+        iga_capital_total=Sum('iga_capital_total'),
+        iga_capital_count=Sum('iga_capital_count'),
+        loan_circulated_total=Sum('loan_circulated_total'),
+    )
+    iga_capital_count = totals['iga_capital_count'] or 0
+    return {
+        'total_members': totals['member_count'] or 0,
+        'total_household_size': totals['hh_size_total'] if totals['member_count'] else None,
+        'total_savings': totals['savings_total'] if totals['annual_data_count'] else None,
+        'total_capital': totals['iga_capital_total'] if iga_capital_count else None,
+        'total_loan_circulated': totals['loan_circulated_total'] if totals['six_month_data_count'] else None,
+        'average_iga_capital': totals['iga_capital_total'] / iga_capital_count if iga_capital_count else None,
+    }
@@ -0,0 +1,141 @@
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from analytics.models import GroupRollup, GroupMemberGrowth, GroupMonthlyBucket
+from cluster_management.models import SelfHelpGroup, Member
+from data_collection.models import AnnualData, SixMonthData, AnnualChildrenStatus, AnnualSelfHelpGroupData
+
+
+# Path from each model to its SelfHelpGroup
+GROUP_PATHS = {
+    SelfHelpGroup: "",
+    Member: "group__",
+    SixMonthData: "member__group__",
+    AnnualData: "member__group__",
+    AnnualChildrenStatus: "member__group__",
+    AnnualSelfHelpGroupData: "group__",
+    GroupRollup: "group__",
+    GroupMemberGrowth: "group__",
+    GroupMonthlyBucket: "group__",
+}
+
+# Path from each model to its Member (group-level models have none)
+MEMBER_PATHS = {
+    Member: "",
+    SixMonthData: "member__",
+    AnnualData: "member__",
+    AnnualChildrenStatus: "member__",
+}
+
+# Scope keyword -> SelfHelpGroup column
+GROUP_FIELDS = {
+    "cluster": "cluster_id",
+    "facilitator": "facilitator_id",
+    "group": "id",
+    "location": "location",
+}
+
+# Scope keywords holding ids
+ID_FIELDS = ("cluster", "facilitator", "group")
+
+# Models whose created_at is restricted by the scope's date range
+DATED_MODELS = (SixMonthData, AnnualData, AnnualChildrenStatus, AnnualSelfHelpGroupData)
+
+
+def parse_id(name, value):
+    """A scope id as uuid.UUID, from a model instance or any form uuid.UUID accepts. Raises ValueError."""
+    value = getattr(value, "pk", value)
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError(f"{name} must be a valid id, not \"{value}\".")
+
+
+def parse_report_datetime(value):
+    """
+    Accept a datetime, an ISO datetime string or a "YYYY-MM-DD" string and
+    return an aware datetime. Raises ValueError for anything else.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = parse_datetime(value) or datetime.strptime(value, "%Y-%m-%d")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class AnalyticsScope:
+    """
+    The slice of data an analytics query covers: the whole system or any
+    combination of cluster, facilitator, group, location and member, plus an
+    optional created_at range.
+
+    filter() compiles the scope into direct join lookups for the queryset's
+    model (e.g. member__group__cluster_id=...), so every report gets the same
+    join plan instead of nested member__in subqueries.
+    """
+
+    def __init__(self, start_date=None, end_date=None, member=None, **group_filters):
+        unknown = set(group_filters) - set(GROUP_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown scope filter(s): {', '.join(sorted(unknown))}")
+
+        # Ids are validated here, so a malformed one is a ValueError (a 400 in
+        # the views) rather than a ValidationError from the query
+        self.group_filters = {
+            key: parse_id(key, value) if key in ID_FIELDS else value
+            for key, value in group_filters.items() if value
+        }
+        self.member = parse_id("member", member) if member is not None else None
+
+        self.start_date = self.end_date = None
+        if start_date and end_date:
+            self.start_date = parse_report_datetime(start_date)
+            self.end_date = parse_report_datetime(end_date)
+
+    @classmethod
+    def from_request(cls, request, **filters):
+        """Scope with the start_date/end_date query parameters of a request."""
+        return cls(
+            start_date=request.query_params.get("start_date"),
+            end_date=request.query_params.get("end_date"),
+            **filters,
+        )
+
+    @property
+    def is_dated(self):
+        return self.start_date is not None
+
+    @property
+    def can_use_rollups(self):
+        # GroupRollup rows cover whole groups and all periods
+        return not self.is_dated and self.member is None
+
+    def as_q(self, model, dated=True):
+        lookups = {}
+        group_path = GROUP_PATHS[model]
+        for key, value in self.group_filters.items():
+            lookups[f"{group_path}{GROUP_FIELDS[key]}"] = value
+        if self.member is not None:
+            if model not in MEMBER_PATHS:
+                raise ValueError(f"{model.__name__} cannot be scoped to a single member.")
+            lookups[f"{MEMBER_PATHS[model]}id"] = self.member
+        if dated and self.is_dated and model in DATED_MODELS:
+            lookups["created_at__range"] = [self.start_date, self.end_date]
+        return Q(**lookups)
+
+    def filter(self, queryset, dated=True):
+        """
+        Restrict a queryset of any scoped model. dated=False skips the date
+        range even for survey models.
+        """
+        return queryset.filter(self.as_q(queryset.model, dated=dated))
+
+    def __repr__(self):
+        return (f"AnalyticsScope(group_filters={self.group_filters!r}, member={self.member!r}, "
+                f"start_date={self.start_date!r}, end_date={self.end_date!r})")
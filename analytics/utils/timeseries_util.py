@@ -0,0 +1,157 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import Count, Sum, F, DateField
+from django.db.models.functions import TruncMonth
+
+from analytics.models import GroupMemberGrowth
+from cluster_management.models import SelfHelpGroup, Member
+from data_collection.models import AnnualData, SixMonthData
+from user_management.models import CustomUser
+from .rollup_util import get_month
+
+
+# Series served by the growth endpoint: name -> (model, {split_by name: lookup})
+GROWTH_SERIES = {
+    "members": (Member, {
+        "gender": "gender",
+        "group": "group_id",
+        "cluster": "group__cluster_id",
+        "location": "group__location",
+    }),
+    "groups": (SelfHelpGroup, {
+        "cluster": "cluster_id",
+        "facilitator": "facilitator_id",
+        "location": "location",
+    }),
+    "six-month-data": (SixMonthData, {
+        "gender": "member__gender",
+        "group": "member__group_id",
+        "cluster": "member__group__cluster_id",
+        "location": "member__group__location",
+    }),
+    "annual-data": (AnnualData, {
+        "gender": "member__gender",
+        "group": "member__group_id",
+        "cluster": "member__group__cluster_id",
+        "location": "member__group__location",
+    }),
+    "users": (CustomUser, {
+        "user_type": "user_type",
+    }),
+}
+
+# The per-month counts come from the ORM; the CTEs around them generate every
+# month between the bounds, cross it with every split value and run the
+# cumulative window sum. Months before start_month only feed the cumulative
+# totals and are cut by the outer WHERE.
+SERIES_SQL = """
+    WITH counts AS ({counts_sql}),
+    bounds AS (
+        SELECT LEAST(MIN(series_month), %s::date) AS first_month,
+               COALESCE(%s::date, MAX(series_month)) AS last_month
+        FROM counts
+    ),
+    months AS (
+        SELECT generate_series(first_month, last_month, interval '1 month')::date AS month FROM bounds
+    ),
+    series_keys AS ({keys_sql}),
+    series AS (
+        SELECT months.month,
+               series_keys.series_key,
+               COALESCE(counts.series_count, 0)::bigint AS new,
+               SUM(COALESCE(counts.series_count, 0)) OVER (
+                   {partition} ORDER BY months.month
+               )::bigint AS cumulative
+        FROM months
+        CROSS JOIN series_keys
+        LEFT JOIN counts ON counts.series_month = months.month {key_join}
+    )
+    SELECT month, series_key, new, cumulative
+    FROM series
+    WHERE %s::date IS NULL OR month >= %s::date
+    ORDER BY month, series_key
+"""
+
+
+def get_monthly_series(queryset, split_by=None, start_date=None, end_date=None, date_field='created_at', weight=None):
+    """
+    Gap-filled monthly growth of a queryset, in one query: a row for every
+    month from start_date (default: the first row's month) to end_date
+    (default: the last row's month) with the rows `new` that month and the
+    `cumulative` total up to it, which includes rows before start_date.
+
+    split_by is a lookup (e.g. "gender", "user_type", "group__cluster_id")
+    giving one series per value; every value gets every month. weight sums
+    a field instead of counting rows, for pre-aggregated tables such as
+    GroupMemberGrowth.
+
+    Returns [{"month": "YYYY-MM", "split": value, "new": n, "cumulative": n}],
+    ordered by month and split value ("split" only with split_by).
+    """
+    counts = queryset.order_by().annotate(series_month=TruncMonth(date_field, output_field=DateField()))
+    if end_date:
+        counts = counts.filter(**{f"{date_field}__lte": end_date})
+    if split_by:
+        counts = counts.annotate(series_key=F(split_by)).values('series_month', 'series_key')
+    else:
+        counts = counts.values('series_month')
+    counts = counts.annotate(series_count=Sum(weight) if weight else Count('pk'))
+    try:
+        counts_sql, counts_params = counts.query.get_compiler(using=counts.db).as_sql()
+    except EmptyResultSet:
+        # queryset.none() and the like
+        return []
+
+    sql = SERIES_SQL.format(
+        counts_sql=counts_sql,
+        keys_sql="SELECT DISTINCT series_key FROM counts" if split_by else "SELECT NULL AS series_key",
+        partition="PARTITION BY series_keys.series_key" if split_by else "",
+        key_join="AND counts.series_key IS NOT DISTINCT FROM series_keys.series_key" if split_by else "",
+    )
+    start_month = get_month(start_date) if start_date else None
+    end_month = get_month(end_date) if end_date else None
+    with connections[counts.db].cursor() as cursor:
+        cursor.execute(sql, [*counts_params, start_month, end_month, start_month, start_month])
+        rows = cursor.fetchall()
+
+    series = []
+    for month, key, new, cumulative in rows:
+        point = {"month": month.strftime('%Y-%m')}
+        if split_by:
+            point["split"] = key
+        point.update(new=new, cumulative=cumulative)
+        series.append(point)
+    return series
+
+
+def get_member_growth(scope, start_date=None, end_date=None):
+    """
+    The dashboard's member growth series of a scope: members joined and the
+    running total per month. Without a date range it is read from the
+    GroupMemberGrowth counters instead of the members table.
+    """
+    if start_date and end_date:
+        series = get_monthly_series(scope.filter(Member.objects.all()), start_date=start_date, end_date=end_date)
+    else:
+        series = get_monthly_series(
+            scope.filter(GroupMemberGrowth.objects.filter(members_joined__gt=0)),
+            date_field='period_start', weight='members_joined',
+        )
+    return [
+        {"month": point["month"], "total_members": point["new"], "cumulative_members": point["cumulative"]}
+        for point in series
+    ]
+
+
+def get_entity_growth(start_date=None, end_date=None):
+    """New and cumulative facilitators, cluster managers and SHG leads per month."""
+    users = CustomUser.objects.filter(user_type__in=['facilitator', 'cluster_manager', 'shg_lead'])
+    return [
+        {
+            "month": point["month"],
+            "user_type": point["split"],
+            "total_users": point["new"],
+            "cumulative_users": point["cumulative"],
+        }
+        for point in get_monthly_series(users, split_by='user_type', start_date=start_date, end_date=end_date)
+    ]
@@ -8,24 +8,27 @@ from cluster_management.models import SelfHelpGroup, Cluster, Member
 from user_management.models import CustomUser
 from django.utils.dateparse import parse_datetime
 from django.contrib.auth.models import AnonymousUser
-from django.db.models.functions import TruncMonth
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
-import csv
 from django.http import HttpResponse
-# ReportLab imports
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 
-from io import BytesIO
-from datetime import datetime
-
-from .utils.analytics_util import get_location_level_group_report, get_location_level_loan_saving_report, get_location_level_hh_report  
-import os
-from django.conf import settings
+from .utils.analytics_util import (
+    get_location_level_group_report,
+    get_location_level_loan_saving_report,
+    get_location_level_hh_report,
+    get_scope_report,
+    get_loan_saving_pivot,
+    format_loan_by_purpose,
+    get_latest_member_snapshots,
+    get_school_enrollment_percentage,
+)
+from .utils.timeseries_util import GROWTH_SERIES, get_monthly_series, get_member_growth, get_entity_growth
+from .utils.metric_query import DIMENSIONS, run_metric_query
+from .utils.export_util import csv_streaming_response, iter_chunks
+from .utils.distribution_util import DISTRIBUTION_FIELDS, DEFAULT_QUANTILES, get_field_distribution
+from .utils.report_cache import get_cached_report
+from .utils.scope import AnalyticsScope, GROUP_PATHS, parse_id
 
 class SystemLevelReportView(APIView):
     """
@@ -34,36 +37,14 @@ class SystemLevelReportView(APIView):
 
     def get(self, request):
         # Parsing date range parameters
-        start_date = request.query_params.get('start_date', None)
-        end_date = request.query_params.get('end_date', None)
-
-        if start_date:
-            start_date = parse_datetime(start_date)
-        if end_date:
-            end_date = parse_datetime(end_date)
-
-        # Filtering data based on the time range
-        filters = {}
-        if start_date and end_date:
-            filters['created_at__range'] = [start_date, end_date]
+        try:
+            scope = AnalyticsScope.from_request(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Aggregating data
-        total_shgs = SelfHelpGroup.objects.count()
-        total_members = Member.objects.count()
-        total_household_size = Member.objects.aggregate(total=Sum('hh_size'))['total']
-        total_savings = AnnualData.objects.filter(**filters).aggregate(total=Sum('total_savings'))['total']
-        total_capital = SixMonthData.objects.filter(**filters).aggregate(total=Sum('iga_capital'))['total']
-        total_loan_circulated = SixMonthData.objects.filter(**filters).aggregate(total=Sum('loan_amount_received_shg'))['total']
-        average_iga_capital = SixMonthData.objects.filter(**filters).aggregate(avg=Avg('iga_capital'))['avg']
-
         return Response({
-            'total_shgs': total_shgs,
-            'total_members': total_members,
-            'total_household_size': total_household_size,
-            'total_savings': total_savings,
-            'total_capital': total_capital,
-            'total_loan_circulated': total_loan_circulated,
-            'average_iga_capital': average_iga_capital,
+            **get_scope_report(scope),
         }, status=status.HTTP_200_OK)
 
 class ClusterLevelReportView(APIView):
@@ -71,48 +52,22 @@ class ClusterLevelReportView(APIView):
     Cluster-level report, aggregated for a given cluster.
     """
     def get(self, request, cluster_id):
-        # Parsing date range parameters
-        start_date = request.query_params.get('start_date', None)
-        end_date = request.query_params.get('end_date', None)
-
-        if start_date:
-            start_date = parse_datetime(start_date)
-        if end_date:
-            end_date = parse_datetime(end_date)
-
         # Get the cluster
         try:
             cluster = Cluster.objects.get(id=cluster_id)
         except Cluster.DoesNotExist:
             return Response({"error": "Cluster not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get all groups and members in the cluster
-        groups = SelfHelpGroup.objects.filter(cluster=cluster)
-        members = Member.objects.filter(group__in=groups)
-
-        # Filtering data based on the time range
-        filters = {}
-        if start_date and end_date:
-            filters['created_at__range'] = [start_date, end_date]
+        # Parsing date range parameters
+        try:
+            scope = AnalyticsScope.from_request(request, cluster=cluster)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Aggregating data
-        total_shgs = groups.count()
-        total_members = members.count()
-        total_household_size = members.aggregate(total=Sum('hh_size'))['total']
-        total_savings = AnnualData.objects.filter(member__in=members, **filters).aggregate(total=Sum('total_savings'))['total']
-        total_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(total=Sum('iga_capital'))['total']
-        total_loan_circulated = SixMonthData.objects.filter(member__in=members, **filters).aggregate(total=Sum('loan_amount_received_shg'))['total']
-        average_iga_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(avg=Avg('iga_capital'))['avg']
-
         return Response({
             'cluster': cluster.cluster_name,
-            'total_shgs': total_shgs,
-            'total_members': total_members,
-            'total_household_size': total_household_size,
-            'total_savings': total_savings,
-            'total_capital': total_capital,
-            'total_loan_circulated': total_loan_circulated,
-            'average_iga_capital': average_iga_capital,
+            **get_scope_report(scope),
         }, status=status.HTTP_200_OK)
 
 
@@ -121,46 +76,26 @@ class SelfHelpGroupLevelReportView(APIView):
     Self-help group-level report, aggregated for a given self-help group.
     """
     def get(self, request, group_id):
-        # Parsing date range parameters
-        start_date = request.query_params.get('start_date', None)
-        end_date = request.query_params.get('end_date', None)
-
-        if start_date:
-            start_date = parse_datetime(start_date)
-        if end_date:
-            end_date = parse_datetime(end_date)
-
         # Get the self-help group
         try:
             group = SelfHelpGroup.objects.get(id=group_id)
         except SelfHelpGroup.DoesNotExist:
             return Response({"error": "SelfHelpGroup not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get all members in the group
-        members = Member.objects.filter(group=group)
-
-        # Filtering data based on the time range
-        filters = {}
-        if start_date and end_date:
-            filters['created_at__range'] = [start_date, end_date]
+        # Parsing date range parameters
+        try:
+            scope = AnalyticsScope.from_request(request, group=group)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Aggregating data
-        total_members = members.count()
-        total_household_size = members.aggregate(total=Sum('hh_size'))['total']
-        total_savings = AnnualData.objects.filter(member__in=members, **filters).aggregate(total=Sum('total_savings'))['total']
-        total_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(total=Sum('iga_capital'))['total']
-        total_loan_circulated = SixMonthData.objects.filter(member__in=members, **filters).aggregate(total=Sum('loan_amount_received_shg'))['total']
-        average_iga_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(avg=Avg('iga_capital'))['avg']
+        totals = get_scope_report(scope)
+        totals.pop('total_shgs')
         
         # Prepare data response
         json_report_data = {
             "group_name": group.group_name,
-            "total_members": total_members,
-            "total_household_size": total_household_size,
-            "total_savings": total_savings,
-            "total_capital": total_capital,
-            "total_loan_circulated": total_loan_circulated,
-            "average_iga_capital": average_iga_capital,
+            **totals,
         }
         
         response_format = request.query_params.get('format', 'json')
@@ -168,17 +103,11 @@ class SelfHelpGroupLevelReportView(APIView):
         if response_format == 'csv':
             csv_data = [
                 ['Group Name', 'Total Members', 'Total Household Size', 'Total Savings', 'Total Capital', 'Total Loan Circulated', 'Average IGA Capital'],
-                [group.group_name, total_members, total_household_size, total_savings, total_capital, total_loan_circulated, average_iga_capital],
+                [group.group_name, totals['total_members'], totals['total_household_size'], totals['total_savings'],
+                 totals['total_capital'], totals['total_loan_circulated'], totals['average_iga_capital']],
             ]
 
-            # Create the CSV response
-            csv_response = HttpResponse(content_type='text/csv')
-            csv_response['Content-Disposition'] = f'attachment; filename="{group.group_name}_report.csv"'
-            
-            writer = csv.writer(csv_response)
-            writer.writerows(csv_data)
-
-            return csv_response
+            return csv_streaming_response(csv_data, f"{group.group_name}_report.csv")
         
         return Response(json_report_data, status=status.HTTP_200_OK)
             
@@ -201,6 +130,11 @@ class DashboardMetricsView(APIView):
         # Extract cluster_id or group_id from request query parameters
         cluster_id = request.query_params.get('cluster_id', None)
         group_id = request.query_params.get('group_id', None)
+        try:
+            cluster_id = parse_id("cluster_id", cluster_id) if cluster_id else None
+            group_id = parse_id("group_id", group_id) if group_id else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Parse date range (optional for growth metrics)
         start_date = request.query_params.get('start_date', None)
@@ -211,13 +145,18 @@ class DashboardMetricsView(APIView):
         if end_date:
             end_date = parse_datetime(end_date)
 
+        # Counters come from the cached per-scope totals (GroupRollup), so a
+        # page load runs no count over the member or survey tables
+
         # Super Admin: System-wide data
         if user_type == 'super_admin':
+            scope = AnalyticsScope()
+            totals = get_scope_report(scope)
             data = {
-                "total_clusters": Cluster.objects.count(),
-                "total_groups": SelfHelpGroup.objects.count(),
-                "total_members": Member.objects.count(),
-                "total_savings": AnnualData.objects.aggregate(total_savings=Sum('total_savings'))['total_savings'],
+                "total_clusters": get_cached_report("total_clusters", scope, Cluster.objects.count),
+                "total_groups": totals['total_shgs'],
+                "total_members": totals['total_members'],
+                "total_savings": totals['total_savings'],
                 "member_growth": self.get_member_growth_graph(
                                                             start_date=start_date, 
                                                             end_date=end_date, 
@@ -233,12 +172,11 @@ class DashboardMetricsView(APIView):
             if not cluster_id:
                 return Response({"error": "Cluster ID is required for cluster managers."}, status=status.HTTP_400_BAD_REQUEST)
 
+            totals = get_scope_report(AnalyticsScope(cluster=cluster_id))
             data = {
-                "total_groups": SelfHelpGroup.objects.filter(cluster=cluster_id).count(),
-                "total_members": Member.objects.filter(group__cluster=cluster_id).count(),
-                "total_savings": AnnualData.objects.filter(member__group__cluster=cluster_id).aggregate(
-                    total_savings=Sum('total_savings')
-                )['total_savings'],
+                "total_groups": totals['total_shgs'],
+                "total_members": totals['total_members'],
+                "total_savings": totals['total_savings'],
                 "member_growth": self.get_member_growth_graph(
                                                             start_date=start_date, 
                                                             end_date=end_date, 
@@ -253,11 +191,10 @@ class DashboardMetricsView(APIView):
             if not group_id:
                 return Response({"error": "Group ID is required for group admins."}, status=status.HTTP_400_BAD_REQUEST)
 
+            totals = get_scope_report(AnalyticsScope(group=group_id))
             data = {
-                "total_members": Member.objects.filter(group_id=group_id).count(),
-                "total_savings": AnnualData.objects.filter(member__group_id=group_id).aggregate(
-                    total_savings=Sum('total_savings')
-                )['total_savings'],
+                "total_members": totals['total_members'],
+                "total_savings": totals['total_savings'],
                 "member_growth": self.get_member_growth_graph(
                                                             start_date=start_date, 
                                                             end_date=end_date, 
@@ -272,31 +209,11 @@ class DashboardMetricsView(APIView):
     def get_entity_growth_graph(self, start_date, end_date, cluster_id=None):
         """
         Generate data for entity growth graph over time (e.g., monthly), divided by user type.
+        Every month in the range is present, with new and cumulative users per type.
         """
-        filters = {}
-        if start_date and end_date:
-            filters['created_at__range'] = [start_date, end_date]
-        # if cluster_id:
-        #     filters['cluster'] = cluster_id  # Assuming users are linked to clusters
-
-        # Group by month and user type, then count new users
-        growth_data = (
-            CustomUser.objects.filter(user_type__in=['facilitator', 'cluster_manager', 'shg_lead'], **filters)
-            .annotate(month=TruncMonth('created_at'))
-            .values('month', 'user_type')
-            .annotate(total_users=Count('id'))
-            .order_by('month', 'user_type')
-        )
-
-        # Convert to a list of dictionaries for graph consumption
-        return [
-            {
-                "month": entry['month'].strftime('%Y-%m'),
-                "user_type": entry['user_type'],
-                "total_users": entry['total_users']
-            }
-            for entry in growth_data
-        ]
+        if not (start_date and end_date):
+            start_date = end_date = None
+        return get_entity_growth(start_date=start_date, end_date=end_date)
 
     def get_member_growth(self, start_date, end_date, cluster_id=None, group_id=None):
         """
@@ -333,29 +250,125 @@ class DashboardMetricsView(APIView):
     def get_member_growth_graph(self, start_date, end_date, cluster_id=None, group_id=None):
         """
         Generate data for member growth graph over time (e.g., monthly).
+        Every month in the range is present, with new and cumulative members.
         """
-        filters = {}
+        scope = AnalyticsScope(cluster=cluster_id, group=group_id)
         if start_date and end_date:
-            filters['created_at__range'] = [start_date, end_date]
-        if cluster_id:
-            filters['group__cluster'] = cluster_id
-        if group_id:
-            filters['group'] = group_id
-
-        # Group by month and count new members
-        growth_data = (
-            Member.objects.filter(**filters)
-            .annotate(month=TruncMonth('created_at'))
-            .values('month')
-            .annotate(total_members=Count('id'))
-            .order_by('month')
+            return get_member_growth(scope, start_date=start_date, end_date=end_date)
+
+        # Without a date range the series is the GroupMemberGrowth counters,
+        # which writes keep current month by month
+        return get_cached_report("member_growth_series", scope, lambda: get_member_growth(scope))
+
+class GrowthSeriesView(APIView):
+    """
+    Gap-filled monthly growth (new and cumulative rows) of members, groups,
+    survey submissions or users. Optional query parameters: split_by (e.g.
+    gender, cluster, user_type), start_date, end_date, and cluster, group,
+    facilitator or location to scope the series.
+    """
+
+    SCOPE_PARAMS = ("cluster", "group", "facilitator", "location")
+
+    def get(self, request, series):
+        if series not in GROWTH_SERIES:
+            return Response({"error": f"Unknown series '{series}'."}, status=status.HTTP_404_NOT_FOUND)
+        model, splits = GROWTH_SERIES[series]
+
+        split_by = request.query_params.get("split_by")
+        if split_by and split_by not in splits:
+            return Response(
+                {"error": f"split_by must be one of: {', '.join(splits)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        filters = {key: request.query_params.get(key) for key in self.SCOPE_PARAMS if request.query_params.get(key)}
+        try:
+            scope = AnalyticsScope.from_request(request, **filters)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = model.objects.all()
+        if filters:
+            if model not in GROUP_PATHS:
+                return Response({"error": f"The {series} series cannot be scoped."}, status=status.HTTP_400_BAD_REQUEST)
+            # Rows before start_date still count towards the cumulative totals
+            queryset = scope.filter(queryset, dated=False)
+
+        data = get_monthly_series(
+            queryset,
+            split_by=splits[split_by] if split_by else None,
+            start_date=scope.start_date,
+            end_date=scope.end_date,
         )
+        if split_by:
+            for point in data:
+                point[split_by] = point.pop("split")
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class MetricQueryView(APIView):
+    """
+    Ad-hoc analytics: metrics (comma-separated METRICS names) broken down by
+    dimensions (comma-separated: location, cluster, group, facilitator,
+    month, gender, iga_code). Any dimension may also be passed as a filter,
+    e.g. ?gender=Female, along with start_date and end_date.
+    """
+
+    def get(self, request):
+        metrics = [name for name in request.query_params.get("metrics", "").split(",") if name]
+        dimensions = [name for name in request.query_params.get("dimensions", "").split(",") if name]
+        filters = {
+            name: request.query_params[name]
+            for name in DIMENSIONS if name != "month" and request.query_params.get(name)
+        }
+        try:
+            rows = run_metric_query(
+                metrics, dimensions, filters,
+                start_date=request.query_params.get("start_date"),
+                end_date=request.query_params.get("end_date"),
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"metrics": metrics, "dimensions": dimensions, "rows": rows}, status=status.HTTP_200_OK)
+
+
+class DistributionView(APIView):
+    """
+    Distribution of total_savings, approx_monthly_personal_income,
+    approx_monthly_household_income or iga_capital: count, mean, stddev,
+    min, max, quantiles and a histogram, overall or per location, cluster
+    or group (by). Optional query parameters: quantiles (comma-separated
+    fractions), bins, start_date, end_date, and cluster, group, facilitator
+    or location to scope it.
+    """
+
+    SCOPE_PARAMS = ("cluster", "group", "facilitator", "location")
+
+    def get(self, request, field):
+        if field not in DISTRIBUTION_FIELDS:
+            return Response({"error": f"Unknown field '{field}'."}, status=status.HTTP_404_NOT_FOUND)
+
+        filters = {key: request.query_params.get(key) for key in self.SCOPE_PARAMS if request.query_params.get(key)}
+        by = request.query_params.get("by")
+        try:
+            quantiles = [float(fraction) for fraction in request.query_params.get("quantiles", "").split(",") if fraction]
+            bins = int(request.query_params.get("bins", 10))
+        except ValueError:
+            return Response({"error": "quantiles and bins must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            scope = AnalyticsScope.from_request(request, **filters)
+            data = get_field_distribution(scope, field, by=by, quantiles=quantiles or DEFAULT_QUANTILES, bins=bins)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for row in data["rows"]:
+            key = row.pop("key")
+            if by:
+                row[by] = key
+        return Response({"field": field, "by": by, **data}, status=status.HTTP_200_OK)
 
-        # Convert to a list of dictionaries for graph consumption
-        return [
-            {"month": entry['month'].strftime('%Y-%m'), "total_members": entry['total_members']}
-            for entry in growth_data
-        ]
 
 class LoanSavingReportView(APIView):
     """
@@ -372,41 +385,25 @@ class LoanSavingReportView(APIView):
         if entity_type == 'cluster':
             try:
                 entity = Cluster.objects.get(id=entity_id)
-                groups = SelfHelpGroup.objects.filter(cluster=entity)
-                members = Member.objects.filter(group__in=groups)
+                scope = AnalyticsScope(cluster=entity)
                 entity_name = entity.cluster_name
-                total_groups = groups.count()
             except Cluster.DoesNotExist:
                 return Response({"error": "Cluster not found"}, status=status.HTTP_404_NOT_FOUND)
         elif entity_type == 'group':
             try:
                 entity = SelfHelpGroup.objects.get(id=entity_id)
-                members = Member.objects.filter(group=entity)
+                scope = AnalyticsScope(group=entity)
                 entity_name = entity.group_name
-                total_groups = None  
             except SelfHelpGroup.DoesNotExist:
                 return Response({"error": "SelfHelpGroup not found"}, status=status.HTTP_404_NOT_FOUND)
         else:
             return Response({"error": "Invalid entity type. Use 'cluster' or 'group'."}, status=status.HTTP_400_BAD_REQUEST)
 
-        max_loan_round = SixMonthData.objects.filter(member__in=members).aggregate(max_loan=Max('loan_amount_received_shg'))['max_loan']
-
-        iga_capital_range = SixMonthData.objects.filter(member__in=members).aggregate(
-            min_iga=Min('iga_capital'), max_iga=Max('iga_capital')
-        )
-
-        # Amount of loan received from other sources
-        total_loan_other_sources = SixMonthData.objects.filter(member__in=members).aggregate(
-            total_loan_other_sources=Sum('loan_amount_from_other_sources')
-        )['total_loan_other_sources']
-
-        # Amount of loan taken per category (purpose of loan)
-        loan_by_purpose = SixMonthData.objects.filter(member__in=members).values('loan_purpose').annotate(
-            total_loan=Sum('loan_amount_received_shg')
-        )
+        # Max loan, IGA capital range, other-source total and loan per purpose in one query
+        loan_pivot = get_loan_saving_pivot(scope.filter(SixMonthData.objects.all()))
 
         # Range of member’s regular saving
-        savings_range = AnnualData.objects.filter(member__in=members).aggregate(
+        savings_range = scope.filter(AnnualData.objects.all()).aggregate(
             min_savings=Min('total_savings'), max_savings=Max('total_savings')
         )
         
@@ -416,25 +413,18 @@ class LoanSavingReportView(APIView):
              'Total Loan from Other Sources', 'Loan by Purpose', 'Min Savings', 'Max Savings'],
             [
                 entity_name,
-                members.count(),
-                max_loan_round,
-                iga_capital_range['min_iga'],
-                iga_capital_range['max_iga'],
-                total_loan_other_sources,
-                ', '.join([f"{item['loan_purpose']}: {item['total_loan']}" for item in loan_by_purpose]),
+                scope.filter(Member.objects.all()).count(),
+                loan_pivot['max_loan'],
+                loan_pivot['min_iga'],
+                loan_pivot['max_iga'],
+                loan_pivot['total_loan_other_sources'],
+                format_loan_by_purpose(loan_pivot),
                 savings_range['min_savings'],
                 savings_range['max_savings'],
             ],
         ]
 
-        # Create the CSV response
-        csv_response = HttpResponse(content_type='text/csv')
-        csv_response['Content-Disposition'] = f'attachment; filename="{entity_name}_loan_saving_report.csv"'
-        
-        writer = csv.writer(csv_response)
-        writer.writerows(csv_data)
-
-        return csv_response
+        return csv_streaming_response(csv_data, f"{entity_name}_loan_saving_report.csv")
 
 
 class MemberDataReportView(APIView):
@@ -459,15 +449,14 @@ class MemberDataReportView(APIView):
             elif cluster_id:
                 # Fetch members for the given cluster
                 cluster = get_object_or_404(Cluster, id=cluster_id)
-                groups = SelfHelpGroup.objects.filter(cluster=cluster)
-                members = Member.objects.filter(group__in=groups)
+                members = AnalyticsScope(cluster=cluster).filter(Member.objects.all())
                 context = {"cluster_id": cluster_id}
                 location =  cluster.location
 
             elif member_id:
                 # Fetch a single member
                 member = get_object_or_404(Member, id=member_id)
-                members = [member]
+                members = Member.objects.filter(id=member.id)
                 context = {"member_id": member_id} 
                 location = member.group.location
 
@@ -477,66 +466,42 @@ class MemberDataReportView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            if not members:
+            if not members.exists():
                 return Response({"error": "No members found."}, status=status.HTTP_404_NOT_FOUND)
 
-            # Prepare data
-            data = self.get_member_data(members,location = location)
-
-            # Generate CSV response
-            return self.generate_csv_response(data)
+            # Stream the CSV while the member rows are being read, a chunk at a time
+            return csv_streaming_response(self.iter_csv_rows(members, location=location), "member_data_report.csv")
 
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def get_member_data(self, members, location):
         """
-        Helper method to fetch and aggregate member-level data.
+        Generator of member-level data, read in chunks of EXPORT_CHUNK_ROWS
+        members with their latest survey snapshots fetched per chunk.
         """
-        data = []
-        for member in members:
-            data.append(self.get_single_member_data(member,location))
-        return data
+        for chunk in iter_chunks(members):
+            # Latest survey snapshots of the chunk, three queries for the whole chunk
+            snapshots = get_latest_member_snapshots(chunk)
+            for member in chunk:
+                yield self.get_single_member_data(member, location, snapshots)
 
-    def get_single_member_data(self, member,location):
+    def get_single_member_data(self, member, location, snapshots=None):
         """
         Helper method to fetch data for a single member.
         """
-        six_month_data = SixMonthData.objects.filter(member=member).order_by('-created_at').first()
-        annual_data = AnnualData.objects.filter(member=member).order_by('-created_at').first()
-        children_status = AnnualChildrenStatus.objects.filter(member=member).order_by('-created_at').first()
-
-        total_household_size = annual_data.household_size if annual_data else None
-        avg_meals_per_day = (
-            six_month_data.aggregate(
-                avg_meals=Avg(F("meals_per_day_for_children") + F("meals_per_day_for_adults"))
-            )["avg_meals"]
-            if six_month_data != None
-            else None
-        )
-        total_child_morbidity = (
-            six_month_data.aggregate(
-                morbidity=Sum(F("days_diarrhea_children") + F("days_other_illness_children"))
-            )["morbidity"]
-            if six_month_data != None
-            else None
-        )
-        total_child_mortality = annual_data.mortality_children_under_5 if annual_data else None
-
-        school_age_children = 0
-        enrolled_children = 0
+        if snapshots is None:
+            snapshots = get_latest_member_snapshots([member])
+        six_month_data = snapshots["six_month"].get(member.id)
+        annual_data = snapshots["annual"].get(member.id)
+        children_status = snapshots["children_status"].get(member.id)
 
-        if children_status:
-            for i in range(1, 6):  # Assuming up to 5 children per member
-                school_status = getattr(children_status, f"child_{i}_school_status", None)
-                if school_status:
-                    school_age_children += 1
-                    if school_status == "enrolled":
-                        enrolled_children += 1
+        total_household_size = annual_data["household_size"] if annual_data else None
+        avg_meals_per_day = six_month_data["meals_per_day"] if six_month_data else None
+        total_child_morbidity = six_month_data["child_morbidity"] if six_month_data else None
+        total_child_mortality = annual_data["mortality_children_under_5"] if annual_data else None
 
-        percentage_school_enrollment = (
-            (enrolled_children / school_age_children) * 100 if school_age_children > 0 else None
-        )
+        percentage_school_enrollment = get_school_enrollment_percentage(children_status or {})
 
         return {
             "member_id": member.id,
@@ -549,15 +514,11 @@ class MemberDataReportView(APIView):
             "percentage_school_enrollment": percentage_school_enrollment,
         }
     
-    def generate_csv_response(self, data):
+    def iter_csv_rows(self, members, location):
         """
-        Generate CSV response from data.
+        Generator of the CSV rows of the member report, header first.
         """
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="member_data_report.csv"'
-
-        writer = csv.writer(response)
-        headers = [
+        yield [
             "Member ID",
             "Member Name",
             "Location",
@@ -567,10 +528,8 @@ class MemberDataReportView(APIView):
             "Total Child Mortality",
             "Percentage School Enrollment",
         ]
-        writer.writerow(headers)
-
-        for row in data:
-            writer.writerow([
+        for row in self.get_member_data(members, location):
+            yield [
                 row["member_id"],
                 row["member_name"],
                 row["location"],
@@ -579,10 +538,7 @@ class MemberDataReportView(APIView):
                 row["total_child_morbidity"],
                 row["total_child_mortality"],
                 row["percentage_school_enrollment"],
-            ])
-
-        return response
-
+            ]
 
 
 class FacilitatorAnalyticsView(APIView):
@@ -600,42 +556,15 @@ class FacilitatorAnalyticsView(APIView):
             return Response({"error": "User is not a facilitator"}, status=status.HTTP_403_FORBIDDEN)
         
         # Parsing date range parameters
-        start_date = request.query_params.get('start_date', None)
-        end_date = request.query_params.get('end_date', None)
-
-        if start_date:
-            start_date = parse_datetime(start_date)
-        if end_date:
-            end_date = parse_datetime(end_date)
-
-
-        # Get all groups and members in the cluster
-        groups = SelfHelpGroup.objects.filter(facilitator_id=facilitator_id)
-        members = Member.objects.filter(group__in=groups)
-
-        # Filtering data based on the time range
-        filters = {}
-        if start_date and end_date:
-            filters['created_at__range'] = [start_date, end_date]
+        try:
+            scope = AnalyticsScope.from_request(request, facilitator=facilitator_id)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Aggregating data
-        total_shgs = groups.count()
-        total_members = members.count()
-        total_household_size = members.aggregate(total=Sum('hh_size'))['total']
-        total_savings = AnnualData.objects.filter(member__in=members, **filters).aggregate(total=Sum('total_savings'))['total']
-        total_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(total=Sum('iga_capital'))['total']
-        total_loan_circulated = SixMonthData.objects.filter(member__in=members, **filters).aggregate(total=Sum('loan_amount_received_shg'))['total']
-        average_iga_capital = SixMonthData.objects.filter(member__in=members, **filters).aggregate(avg=Avg('iga_capital'))['avg']
-
         return Response({
             'facilitator': weema_entity.user.first_name + " " + weema_entity.user.last_name, 
-            'total_shgs': total_shgs,
-            'total_members': total_members,
-            'total_household_size': total_household_size,
-            'total_savings': total_savings,
-            'total_capital': total_capital,
-            'total_loan_circulated': total_loan_circulated,
-            'average_iga_capital': average_iga_capital,
+            **get_scope_report(scope),
         }, status=status.HTTP_200_OK)
 
 
@@ -670,97 +599,19 @@ class LocationLevelAnalyticsPDFView(APIView):
         if shg_data:
             group_report = get_location_level_group_report(start_date=start_date, end_date=end_date, cluster=cluster)
 
-        # Create a BytesIO buffer for the PDF
-        # Create a buffer for PDF output
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), leftMargin=40, rightMargin=40, topMargin=0, bottomMargin=30)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        # Define a centered title style
-        title_style = ParagraphStyle(
-            'CenteredTitle',
-            parent=styles['Heading2'],
-            alignment=1,  # Centered
-            spaceAfter=6  # Reduce space after the title
-        )
+        for report in (hh_report, loan_saving_report, group_report):
+            if isinstance(report, dict) and "error" in report:
+                return Response(report, status=status.HTTP_400_BAD_REQUEST)
 
-        # Define an improved table style
-        table_style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#B6D7A8")),  # Light green header
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),  # Reduced font size for better fit
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('TOPPADDING', (0, 0), (-1, 0), 6),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#F5F5F5")]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('WORDWRAP', (0, 0), (-1, -1), True),
-        ])
-
-        # ======= Add HEADER with Logo, Company Name, Title & Date =======
-        logo_left_path = os.path.join(settings.BASE_DIR, 'logo_real.png')  # Change to your actual logo path
-        logo_right_path = logo_left_path  # Change to your actual logo path
-
-        # Load logos
-        logo_left = Image(logo_left_path, width=110, height=110)
-
-        # Company Name & Report Details
-        company_name = Paragraph("<b>WEEMA</b>", styles["Title"])
-        report_title = Paragraph("<b>Self Help Group (SHG) Data Summary Report</b>", styles["Heading2"])
-        report_date = Paragraph(f"Date of Report: {datetime.now().strftime('%Y-%m-%d')}", styles["Normal"])
-
-        # Create Header Table
-        header_data = [
-            [logo_left],  # Row 1: Logos & Company Name
-            [report_title],  # Row 2: Report Title
-            [report_date]  # Row 3: Report Date
-        ]
+        # ReportLab is only loaded by workers that render PDFs
+        from .utils.pdf_util import PDFReportBuilder
 
-        header_table = Table(header_data, colWidths=[800])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor("#B6D7A8")),  # Light green background
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),  # Reduced font size for better fit
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-            ('TOPPADDING', (0, 0), (-1, 0), 6),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#F5F5F5")]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('WORDWRAP', (0, 0), (-1, -1), True),
-        ]))
-
-        # Add header table to the document
-        elements.append(header_table)
-        elements.append(Spacer(1, 12))  # Add some space after the header
-
-        # ======= Add Reports =======
-        def add_section(title, data):
-            if not data:
-                return
-            elements.append(Paragraph(title, title_style))
-            elements.append(Spacer(1, 6))
-            table = Table(data)
-            table.setStyle(table_style)
-            elements.append(table)
-            elements.append(Spacer(1, 12))# Add each report as a section
-        if  hh_report: add_section("Member Household Report", hh_report)
-        if loan_saving_report: add_section("Member Loan & Saving Report", loan_saving_report)
-        if group_report: add_section("SHG Data Report", group_report)
-
-        # Build the PDF document
-        doc.build(elements)
-        pdf = buffer.getvalue()
-        buffer.close()
+        # Header, then each requested report as a section
+        builder = PDFReportBuilder()
+        builder.add_header("Self Help Group (SHG) Data Summary Report")
+        if hh_report: builder.add_table_section("Member Household Report", hh_report)
+        if loan_saving_report: builder.add_table_section("Member Loan & Saving Report", loan_saving_report)
+        if group_report: builder.add_table_section("SHG Data Report", group_report)
 
+        pdf = builder.build()
         return HttpResponse(pdf, content_type='application/pdf')
\ No newline at end of file
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from cluster_management.models import Cluster, SelfHelpGroup, Member
+
+
+# (counter table, counter column, counted table, foreign key to the counter row)
+COUNTERS = [
+    (SelfHelpGroup, "total_members", Member, "group_id"),
+    (Cluster, "total_groups", SelfHelpGroup, "cluster_id"),
+]
+
+# One UPDATE ... FROM per counter; rows whose counter is already right are not written
+RECONCILE_SQL = """
+    UPDATE {table} AS target
+    SET {column} = counts.total
+    FROM (
+        SELECT parent.id, COUNT(child.id) AS total
+        FROM {table} AS parent
+        LEFT JOIN {child_table} AS child ON child.{foreign_key} = parent.id
+        GROUP BY parent.id
+    ) AS counts
+    WHERE target.id = counts.id AND target.{column} <> counts.total
+"""
+
+
+class Command(BaseCommand):
+    help = ("Recompute SelfHelpGroup.total_members and Cluster.total_groups from the member "
+            "and group tables, fixing any drift from writes that bypassed the model methods.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model, column, child_model, foreign_key in COUNTERS:
+                cursor.execute(RECONCILE_SQL.format(
+                    table=connection.ops.quote_name(model._meta.db_table),
+                    column=connection.ops.quote_name(column),
+                    child_table=connection.ops.quote_name(child_model._meta.db_table),
+                    foreign_key=connection.ops.quote_name(foreign_key),
+                ))
+                self.stdout.write(self.style.SUCCESS(
+                    f"Corrected {model.__name__}.{column} on {cursor.rowcount} rows."
+                ))
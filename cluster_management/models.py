@@ -1,8 +1,25 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from user_management.models import WEEMAEntities
 from WEEMA.models import BaseModel
 from django.core.exceptions import ValidationError
 
+
+# Cluster.total_groups and SelfHelpGroup.total_members are denormalized counters
+# maintained with F-expression updates in the transaction of each insert,
+# delete or move (python manage.py reconcile_counters recomputes them).
+
+def _exclude_counters(instance, save_kwargs, counters):
+    """Restrict an update save() of an existing row to every field but the counters."""
+    if not instance._state.adding and save_kwargs.get('update_fields') is None:
+        save_kwargs['update_fields'] = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in counters
+        ]
+
+
 # Cluster Model
 class Cluster(BaseModel):
     cluster_name = models.CharField(max_length=255)
@@ -12,14 +29,30 @@ class Cluster(BaseModel):
     cluster_manager = models.ForeignKey(WEEMAEntities, on_delete=models.SET_NULL, null=True, related_name="coordinated_clusters")
     description = models.TextField(blank=True, null=True)
 
+    @staticmethod
+    def adjust_total_groups(cluster_id, delta):
+        """
+        Add delta to a cluster's total_groups in the database (never below
+        zero). The F expression makes concurrent adjustments safe; the
+        in-memory value of loaded instances is not updated. updated_at is
+        set too, so delta exports carry the new count.
+        """
+        if cluster_id and delta:
+            Cluster.objects.filter(pk=cluster_id).update(
+                total_groups=Greatest(F('total_groups') + delta, 0), updated_at=timezone.now(),
+            )
+
     def increment_total_groups(self):
-        self.total_groups += 1
-        self.save()
+        Cluster.adjust_total_groups(self.pk, 1)
 
     def decrement_total_groups(self):
-        if self.total_groups > 0:
-            self.total_groups -= 1
-            self.save()
+        Cluster.adjust_total_groups(self.pk, -1)
+
+    def save(self, *args, **kwargs):
+        # total_groups is only written by adjust_total_groups, so saving a
+        # stale instance cannot overwrite a concurrent adjustment
+        _exclude_counters(self, kwargs, ['total_groups'])
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.cluster_name
@@ -45,6 +78,17 @@ class SelfHelpGroup(BaseModel):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Location breakdowns, alone or within a cluster/facilitator scope
+            # (cluster_id and facilitator_id alone are covered by the FK indexes)
+            models.Index(fields=["location"], name="shg_location_idx"),
+            models.Index(fields=["cluster", "location"], name="shg_cluster_location_idx"),
+            models.Index(fields=["facilitator", "location"], name="shg_facilitator_location_idx"),
+            # Incremental refreshes and delta exports keyed on updated_at
+            models.Index(fields=["updated_at"], name="shg_updated_idx"),
+        ]
+
     def clean(self):
         # A group must be associated with either a cluster or a facilitator,
         # but not both at the same time.
@@ -53,33 +97,45 @@ class SelfHelpGroup(BaseModel):
         if self.cluster and self.facilitator:
             raise ValidationError("A group cannot be associated with both a cluster and a facilitator at the same time.")
 
-    
+    @staticmethod
+    def adjust_total_members(group_id, delta):
+        """Add delta to a group's total_members in the database (never below zero)."""
+        if group_id and delta:
+            SelfHelpGroup.objects.filter(pk=group_id).update(
+                total_members=Greatest(F('total_members') + delta, 0), updated_at=timezone.now(),
+            )
+
     def increment_totals(self):
-        self.total_members += 1
-        self.save()
+        SelfHelpGroup.adjust_total_members(self.pk, 1)
 
     def decrement_totals(self):
-        if self.total_members > 0:
-            self.total_members -= 1
-        self.save()
+        SelfHelpGroup.adjust_total_members(self.pk, -1)
 
     def save(self, *args, **kwargs):
         self.clean()
-        # is_new = self._state.adding
-        # if not is_new:
-        #     old_cluster = SelfHelpGroup.objects.get(pk=self.pk).cluster
-        #     if old_cluster != self.cluster:
-        #         old_cluster.decrement_total_groups()
-        #         self.cluster.increment_total_groups()
-        # else:
-        #     self.cluster.increment_total_groups()
-
-        super().save(*args, **kwargs)
+        _exclude_counters(self, kwargs, ['total_members'])
+        # The cluster counters change in the same transaction as the group;
+        # locking the old row serializes concurrent moves of one group
+        with transaction.atomic():
+            old_cluster_id = None
+            if not self._state.adding:
+                old_cluster_id = (SelfHelpGroup.objects.select_for_update()
+                                  .filter(pk=self.pk).values_list('cluster_id', flat=True).first())
+            super().save(*args, **kwargs)
+            if old_cluster_id != self.cluster_id:
+                Cluster.adjust_total_groups(old_cluster_id, -1)
+                Cluster.adjust_total_groups(self.cluster_id, 1)
 
     def delete(self, *args, **kwargs):
-        cluster = self.cluster
-        super().delete(*args, **kwargs)
-        # cluster.decrement_total_groups()
+        # Lock the row and read its current cluster; a group that is already
+        # gone deletes nothing and must not be counted again
+        with transaction.atomic():
+            cluster_id = (SelfHelpGroup.objects.select_for_update()
+                          .filter(pk=self.pk).values_list('cluster_id', flat=True).first())
+            result = super().delete(*args, **kwargs)
+            if result[1].get(self._meta.label, 0) > 0:
+                Cluster.adjust_total_groups(cluster_id, -1)
+        return result
 
     def __str__(self):
         return self.group_name
@@ -120,23 +176,36 @@ class Member(BaseModel):
     contact_details = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=[('Active', 'Active'), ('Inactive', 'Inactive')], default='Active')
     group = models.ForeignKey('SelfHelpGroup', on_delete=models.CASCADE, related_name="members")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["group", "created_at"], include=["hh_size"], name="member_group_created_idx"),
+            models.Index(fields=["updated_at"], name="member_updated_idx"),
+        ]
     
     def save(self, *args, **kwargs):
-        is_new = self._state.adding
-        # if not is_new:
-        #     old_group = Member.objects.get(pk=self.pk).group
-        #     if old_group != self.group:
-        #         old_group.decrement_totals()
-        #         self.group.increment_totals()
-        # else:
-        #     self.group.increment_totals()
-
-        super().save(*args, **kwargs)
+        # The group counters change in the same transaction as the member;
+        # locking the old row serializes concurrent moves of one member
+        with transaction.atomic():
+            old_group_id = None
+            if not self._state.adding:
+                old_group_id = (Member.objects.select_for_update()
+                                .filter(pk=self.pk).values_list('group_id', flat=True).first())
+            super().save(*args, **kwargs)
+            if old_group_id != self.group_id:
+                SelfHelpGroup.adjust_total_members(old_group_id, -1)
+                SelfHelpGroup.adjust_total_members(self.group_id, 1)
 
     def delete(self, *args, **kwargs):
-        group = self.group
-        super().delete(*args, **kwargs)
-        # group.decrement_totals()
+        # Lock the row and read its current group; a member that is already
+        # gone deletes nothing and must not be counted again
+        with transaction.atomic():
+            group_id = (Member.objects.select_for_update()
+                        .filter(pk=self.pk).values_list('group_id', flat=True).first())
+            result = super().delete(*args, **kwargs)
+            if result[1].get(self._meta.label, 0) > 0:
+                SelfHelpGroup.adjust_total_members(group_id, -1)
+        return result
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
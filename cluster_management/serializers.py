@@ -5,11 +5,13 @@ class ClusterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cluster
         fields = '__all__'
+        read_only_fields = ['total_groups']
 
 class SelfHelpGroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = SelfHelpGroup
         fields = '__all__'
+        read_only_fields = ['total_members']
 
 class MemberSerializer(serializers.ModelSerializer):
     class Meta:
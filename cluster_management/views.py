@@ -5,6 +5,7 @@ from .models import Cluster, SelfHelpGroup, Member
 from .serializers import ClusterSerializer, SelfHelpGroupSerializer, MemberSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from analytics.utils.report_cache import get_group_tokens, bump_report_versions
 
 
 # Cluster ViewSet
@@ -48,7 +49,10 @@ class MemberViewSet(ModelViewSet):
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from collections import Counter
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
 from .models import SelfHelpGroup, Cluster
 
 class TransferGroupsAPIView(APIView):
@@ -138,11 +142,23 @@ class TransferGroupsAPIView(APIView):
         # Count the groups to be transferred
         groups_count = groups_qs.count()
 
-        # Update the groups: set their cluster to the target cluster and clear the facilitator
-        groups_qs.update(cluster=target_cluster, facilitator=None)
-
-        # Optionally, you might need to update any counters on the old or target clusters.
-        # For example, you could recalculate total_groups or call your increment/decrement functions.
+        # Cached reports of the groups' old cluster/facilitator and of the target cluster
+        # go stale; a bulk update() does not send the signals that would invalidate them
+        group_ids = list(groups_qs.values_list("id", flat=True))
+        stale_tokens = get_group_tokens(group_ids)
+
+        # Update the groups: set their cluster to the target cluster and clear the facilitator.
+        # The bulk update() bypasses SelfHelpGroup.save(), so the cluster counters
+        # are moved here, in the same transaction. updated_at is set by hand so
+        # readers syncing by it (the analytics snapshot) see the move
+        with transaction.atomic():
+            groups_qs = SelfHelpGroup.objects.select_for_update().filter(id__in=group_ids)
+            old_clusters = Counter(groups_qs.values_list("cluster_id", flat=True))
+            groups_qs.update(cluster=target_cluster, facilitator=None, updated_at=timezone.now())
+            for cluster_id, count in old_clusters.items():
+                Cluster.adjust_total_groups(cluster_id, -count)
+            Cluster.adjust_total_groups(target_cluster.id, len(group_ids))
+        bump_report_versions(stale_tokens | get_group_tokens(group_ids))
 
         return Response(
             {"message": f"Successfully transferred {groups_count} groups to cluster '{target_cluster.cluster_name}'."},
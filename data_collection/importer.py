@@ -0,0 +1,268 @@
+import csv
+import io
+import uuid
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from analytics.utils.report_cache import get_group_tokens, bump_report_versions
+from analytics.utils.rollup_util import apply_created_rows
+from cluster_management.models import SelfHelpGroup, Member
+from cluster_management.serializers import MemberSerializer
+from .ingest import INGEST_TYPES, PreloadedRelatedField
+
+
+# Rows validated and written per transaction
+IMPORT_BATCH_ROWS = 5000
+
+# Row errors listed in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Marks a name shared by several groups (or members) in a lookup map
+AMBIGUOUS = object()
+
+
+class MemberImportSerializer(MemberSerializer):
+    group = PreloadedRelatedField("groups")
+
+
+# Record type -> (model, serializer): the member roster and the survey forms
+IMPORT_TYPES = {
+    "members": (Member, MemberImportSerializer),
+    **INGEST_TYPES,
+}
+
+
+def _name_key(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def _add_unique(mapping, key, obj):
+    mapping[key] = AMBIGUOUS if key in mapping else obj
+
+
+def _canonical_id(value):
+    """str(uuid) of any form uuid.UUID accepts (upper case, no hyphens, braces), or None."""
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def _load_groups(cluster=None):
+    """Groups by str(id) and by normalized name, from one query."""
+    groups = SelfHelpGroup.objects.only("id", "group_name")
+    if cluster:
+        groups = groups.filter(cluster=cluster)
+    by_id, by_name = {}, {}
+    for group in groups:
+        by_id[str(group.pk)] = group
+        _add_unique(by_name, _name_key(group.group_name), group)
+    return by_id, by_name
+
+
+def _resolve_group(name, groups_by_id, groups_by_name):
+    """(group, None) for a group id or name, or (None, error message)."""
+    group_id = _canonical_id(name)
+    if group_id in groups_by_id:
+        return groups_by_id[group_id], None
+    group = groups_by_name.get(_name_key(name))
+    if group is None:
+        return None, f'No self-help group named "{name}".'
+    if group is AMBIGUOUS:
+        return None, f'Several self-help groups are named "{name}"; import within a cluster to tell them apart.'
+    return group, None
+
+
+def _load_members(rows, groups_by_id, groups_by_name):
+    """
+    Members a batch of survey rows refers to, by str(id) and by (group id,
+    first name, last name), from one query.
+    """
+    member_ids, group_ids = set(), set()
+    for row in rows:
+        member_id = _canonical_id(row.get("member"))
+        if member_id:
+            member_ids.add(member_id)
+        elif row.get("group"):
+            group, _ = _resolve_group(row["group"], groups_by_id, groups_by_name)
+            if group:
+                group_ids.add(group.pk)
+
+    by_id, by_name = {}, {}
+    members = Member.objects.filter(Q(id__in=member_ids) | Q(group_id__in=group_ids)).only(
+        "id", "group_id", "first_name", "last_name"
+    )
+    for member in members:
+        by_id[str(member.pk)] = member
+        _add_unique(by_name, (member.group_id, _name_key(member.first_name), _name_key(member.last_name)), member)
+    return by_id, by_name
+
+
+def _resolve_member(row, groups_by_id, groups_by_name, members_by_name):
+    """
+    Point a survey row's member column at a member id, given either the id
+    or the member's group, first_name and last_name. Returns errors or None.
+    """
+    if row.get("member"):
+        return None
+    if not all(row.get(column) for column in ("group", "first_name", "last_name")):
+        return {"member": ["Give a member id, or the member's group, first_name and last_name."]}
+    group, error = _resolve_group(row.pop("group"), groups_by_id, groups_by_name)
+    if error:
+        return {"group": [error]}
+    key = (group.pk, _name_key(row.pop("first_name")), _name_key(row.pop("last_name")))
+    member = members_by_name.get(key)
+    if member is None:
+        return {"member": [f"No member with that name in {group.group_name}."]}
+    if member is AMBIGUOUS:
+        return {"member": [f"Several members of {group.group_name} have that name; give the member id."]}
+    row["member"] = str(member.pk)
+    return None
+
+
+def _copy_value(value):
+    # COPY csv: an unquoted empty field is NULL, so every value is quoted
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_insert(model, instances):
+    """
+    Insert new instances with one COPY ... FROM STDIN, several times faster
+    than bulk_create's multi-row INSERT. Defaults and auto_now(_add)
+    values are applied through pre_save() exactly as bulk_create does;
+    like bulk_create it sends no signals.
+    """
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    for instance in instances:
+        buffer.write(",".join(
+            _copy_value(field.get_db_prep_save(field.pre_save(instance, True), connection)) for field in fields
+        ))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    for instance in instances:
+        instance._state.adding = False
+        instance._state.db = connection.alias
+
+
+def _import_batch(record_type, batch, groups_by_id, groups_by_name, report):
+    model, serializer_class = IMPORT_TYPES[record_type]
+    context = {"groups": groups_by_id}
+    members_by_name = {}
+    if model is not Member:
+        context["members"], members_by_name = _load_members(
+            [row for _, row in batch], groups_by_id, groups_by_name
+        )
+    # One serializer validates every row, as ListSerializer does
+    serializer = serializer_class(context=context)
+
+    instances = []
+    for line, row in batch:
+        if model is Member:
+            errors = None
+            if row.get("group"):
+                group, error = _resolve_group(row["group"], groups_by_id, groups_by_name)
+                if error:
+                    errors = {"group": [error]}
+                else:
+                    row["group"] = str(group.pk)
+        else:
+            errors = _resolve_member(row, groups_by_id, groups_by_name, members_by_name)
+
+        if not errors:
+            try:
+                instances.append(model(**serializer.run_validation(row)))
+            except ValidationError as exc:
+                errors = exc.detail
+        if errors:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": line, "errors": errors})
+
+    if not instances:
+        return
+
+    # COPY sends no signals and skips Member.save(), so the rollups, member
+    # growth, group counters and report cache are updated here
+    with transaction.atomic():
+        _copy_insert(model, instances)
+        apply_created_rows(instances)
+        if model is Member:
+            for group_id, count in Counter(instance.group_id for instance in instances).items():
+                SelfHelpGroup.adjust_total_members(group_id, count)
+
+    if model is Member:
+        tokens = get_group_tokens({instance.group_id for instance in instances})
+    else:
+        members = {instance.member for instance in instances}
+        tokens = get_group_tokens({member.group_id for member in members}) | {f"member:{member.pk}" for member in members}
+    bump_report_versions(tokens)
+    report["created"] += len(instances)
+
+
+def import_csv(lines, record_type, cluster=None):
+    """
+    Import a CSV of members (record_type "members") or survey forms
+    ("six_month", "annual", "children_status"), read from `lines` (a text
+    file or any iterable of lines) as it is consumed.
+
+    Columns are the model's serializer fields; empty cells are left out.
+    Members name their group in the group column (name or id). Survey rows
+    give a member id, or the member's group, first_name and last_name.
+    Group names are resolved from one map of all groups (of `cluster`, when
+    given, to tell same-named groups apart).
+
+    Rows are validated and COPYed in IMPORT_BATCH_ROWS at a time, each
+    batch in its own transaction; invalid rows are skipped and reported by
+    line number without stopping the import. Text that cannot be decoded
+    or parsed stops it: the rows read before are still imported, and the
+    report gives the line it stopped at as an error of the "file".
+
+    Returns {"created": n, "invalid": n, "errors": [{"row", "errors"}]}.
+    Raises ValueError for an unknown record_type or a file without a
+    readable header.
+    """
+    if record_type not in IMPORT_TYPES:
+        raise ValueError(f"record_type must be one of: {', '.join(IMPORT_TYPES)}.")
+    reader = csv.DictReader(lines)
+    try:
+        fieldnames = reader.fieldnames
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f"The header cannot be read: {e}")
+    if not fieldnames:
+        raise ValueError("The file is empty.")
+
+    groups_by_id, groups_by_name = _load_groups(cluster)
+    report = {"created": 0, "invalid": 0, "errors": []}
+    batch = []
+    try:
+        for row in reader:
+            cleaned = {
+                column.strip(): value.strip()
+                for column, value in row.items()
+                if column and isinstance(value, str) and value.strip()
+            }
+            batch.append((reader.line_num, cleaned))
+            if len(batch) == IMPORT_BATCH_ROWS:
+                _import_batch(record_type, batch, groups_by_id, groups_by_name, report)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Earlier batches are already committed, so report what was imported
+        report["errors"].append({"row": reader.line_num + 1, "errors": {
+            "file": [f"The import stopped at this line; the file cannot be read from here on ({e})."],
+        }})
+    if batch:
+        _import_batch(record_type, batch, groups_by_id, groups_by_name, report)
+    return report
@@ -0,0 +1,154 @@
+import uuid
+from collections import defaultdict
+
+from django.db import transaction
+from rest_framework import serializers
+
+from analytics.utils.report_cache import get_group_tokens, bump_report_versions
+from analytics.utils.rollup_util import apply_created_rows
+from cluster_management.models import Member
+from .models import SixMonthData, AnnualData, AnnualChildrenStatus, SyncSubmission
+from .serializers import SixMonthDataSerializer, AnnualDataSerializer, AnnualChildrenStatusSerializer
+
+
+# Records accepted per ingest request
+MAX_INGEST_RECORDS = 1000
+
+
+class PreloadedRelatedField(serializers.Field):
+    """
+    Related object looked up by pk in a dict the caller loaded once for the
+    whole batch (context[context_key], keyed by str(pk)) instead of with one
+    query per record.
+    """
+
+    default_error_messages = {
+        "does_not_exist": 'Invalid pk "{pk_value}" - object does not exist.',
+        "incorrect_type": "Incorrect type. Expected pk value, received {data_type}.",
+    }
+
+    def __init__(self, context_key, **kwargs):
+        self.context_key = context_key
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        # Any form uuid.UUID accepts, as PrimaryKeyRelatedField does
+        try:
+            pk = str(uuid.UUID(str(data)))
+        except ValueError:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        obj = self.context[self.context_key].get(pk)
+        if obj is None:
+            self.fail("does_not_exist", pk_value=data)
+        return obj
+
+    def to_representation(self, value):
+        return str(value.pk)
+
+
+class SixMonthDataIngestSerializer(SixMonthDataSerializer):
+    member = PreloadedRelatedField("members")
+
+
+class AnnualDataIngestSerializer(AnnualDataSerializer):
+    member = PreloadedRelatedField("members")
+
+
+class AnnualChildrenStatusIngestSerializer(AnnualChildrenStatusSerializer):
+    member = PreloadedRelatedField("members")
+
+
+# Record type -> (model, serializer)
+INGEST_TYPES = {
+    "six_month": (SixMonthData, SixMonthDataIngestSerializer),
+    "annual": (AnnualData, AnnualDataIngestSerializer),
+    "children_status": (AnnualChildrenStatus, AnnualChildrenStatusIngestSerializer),
+}
+
+
+def _load_members(records):
+    member_ids = set()
+    for record in records:
+        data = record.get("data") if isinstance(record, dict) else None
+        if isinstance(data, dict):
+            try:
+                member_ids.add(uuid.UUID(str(data.get("member"))))
+            except ValueError:
+                pass
+    return {str(member.pk): member for member in Member.objects.filter(id__in=member_ids).only("id", "group_id")}
+
+
+def ingest_submissions(records):
+    """
+    Store a batch of offline-collected survey records. Each record is
+    {"type": one of INGEST_TYPES, "idempotency_key": str, "data": {...}}
+    with data as the model's serializer expects it.
+
+    Members are loaded in one query, known idempotency keys in another,
+    and the new rows of each model written with one bulk_create, all in a
+    single transaction. bulk_create sends no signals, so the GroupRollup
+    totals (apply_created_rows) and report cache versions are updated here;
+    monthly buckets and delta exports pick the rows up through updated_at.
+
+    Returns one result per record, in order: {"idempotency_key", "status":
+    "created" | "duplicate" | "invalid", and "id" or "errors"}. A replayed
+    key (or one repeated in the batch) is a duplicate of the stored row.
+    Raises ValueError for a batch that is not a list of at most
+    MAX_INGEST_RECORDS records.
+    """
+    if not isinstance(records, list) or not records:
+        raise ValueError("records must be a non-empty list.")
+    if len(records) > MAX_INGEST_RECORDS:
+        raise ValueError(f"At most {MAX_INGEST_RECORDS} records can be sent at once.")
+
+    keys = [record.get("idempotency_key") if isinstance(record, dict) else None for record in records]
+    stored = dict(SyncSubmission.objects.filter(
+        idempotency_key__in=[key for key in keys if isinstance(key, str)]
+    ).values_list("idempotency_key", "object_id"))
+    context = {"members": _load_members(records)}
+
+    results = []
+    accepted = {}  # idempotency key -> new instance
+    for record, key in zip(records, keys):
+        if (not isinstance(key, str) or not key or len(key) > 100
+                or record.get("type") not in INGEST_TYPES or not isinstance(record.get("data"), dict)):
+            results.append({"idempotency_key": key, "status": "invalid", "errors": {
+                "record": [f"A record needs a type ({', '.join(INGEST_TYPES)}), an idempotency_key "
+                           f"of at most 100 characters and a data object."],
+            }})
+            continue
+        if key in stored or key in accepted:
+            object_id = stored[key] if key in stored else accepted[key].pk
+            results.append({"idempotency_key": key, "status": "duplicate", "id": str(object_id)})
+            continue
+
+        model, serializer_class = INGEST_TYPES[record["type"]]
+        serializer = serializer_class(data=record["data"], context=context)
+        if not serializer.is_valid():
+            results.append({"idempotency_key": key, "status": "invalid", "errors": serializer.errors})
+            continue
+        instance = accepted[key] = model(**serializer.validated_data)
+        results.append({"idempotency_key": key, "status": "created", "id": str(instance.pk)})
+
+    if not accepted:
+        return results
+
+    by_model = defaultdict(list)
+    for instance in accepted.values():
+        by_model[type(instance)].append(instance)
+    record_types = {model: record_type for record_type, (model, _) in INGEST_TYPES.items()}
+
+    with transaction.atomic():
+        for model, instances in by_model.items():
+            model.objects.bulk_create(instances)
+        SyncSubmission.objects.bulk_create([
+            SyncSubmission(idempotency_key=key, record_type=record_types[type(instance)], object_id=instance.pk)
+            for key, instance in accepted.items()
+        ])
+        apply_created_rows(accepted.values())
+
+    members = {instance.member for instance in accepted.values()}
+    bump_report_versions(
+        get_group_tokens({member.group_id for member in members}) | {f"member:{member.pk}" for member in members}
+    )
+    return results
@@ -0,0 +1,38 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from cluster_management.models import Cluster
+from data_collection.importer import IMPORT_TYPES, import_csv
+
+
+class Command(BaseCommand):
+    help = ("Import a CSV of members or of six_month, annual or children_status forms in "
+            "batches. Invalid rows are listed by line number and skipped; the rest are imported.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("record_type", choices=list(IMPORT_TYPES))
+        parser.add_argument("path", help="CSV file with a header row of serializer field names.")
+        parser.add_argument("--cluster", help="Cluster id; group names are resolved within this cluster only.")
+
+    def handle(self, *args, **options):
+        cluster = None
+        if options["cluster"]:
+            try:
+                cluster = Cluster.objects.get(id=options["cluster"])
+            except (Cluster.DoesNotExist, ValidationError):
+                raise CommandError(f"Cluster {options['cluster']} not found.")
+
+        with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+            try:
+                report = import_csv(lines, options["record_type"], cluster=cluster)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in report["errors"]:
+            details = "; ".join(f"{field}: {' '.join(map(str, messages))}" for field, messages in error["errors"].items())
+            self.stderr.write(f"Line {error['row']}: {details}")
+        if report["invalid"] > len(report["errors"]):
+            self.stderr.write(f"... {report['invalid'] - len(report['errors'])} more invalid rows.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} {options['record_type']} rows; {report['invalid']} invalid."
+        ))
@@ -48,6 +48,20 @@ class SixMonthData(BaseModel):
     days_diarrhea_others = models.IntegerField()
     days_other_illness_others = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            # Per-member date-range scans and latest-snapshot (DISTINCT ON) lookups;
+            # the included columns let the report SUM/AVG/MAX run index-only
+            models.Index(
+                fields=["member", "-created_at"],
+                include=["iga_capital", "loan_amount_received_shg", "loan_amount_from_other_sources"],
+                name="sixmonth_member_created_idx",
+            ),
+            models.Index(fields=["created_at"], name="sixmonth_created_idx"),
+            # Incremental refreshes and delta exports keyed on updated_at
+            models.Index(fields=["updated_at"], name="sixmonth_updated_idx"),
+        ]
+
 class AnnualData(BaseModel):
     # Choices for Marital Status
     MARITAL_STATUS_CHOICES = [
@@ -130,6 +144,17 @@ class AnnualData(BaseModel):
     electricity = models.BooleanField(default=False, verbose_name="Electricity?")
     drinking_water = models.CharField(max_length=50, choices=DRINKING_WATER_CHOICES, verbose_name="Drinking Water Source")
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["member", "-created_at"],
+                include=["total_savings", "household_size", "mortality_children_under_5"],
+                name="annual_member_created_idx",
+            ),
+            models.Index(fields=["created_at"], name="annual_created_idx"),
+            models.Index(fields=["updated_at"], name="annual_updated_idx"),
+        ]
+
     def __str__(self):
         return f"Annual Data for Household with {self.members} Members"
 
@@ -184,6 +209,12 @@ class AnnualChildrenStatus(BaseModel):
     child_5_age = models.IntegerField(null=True, blank=True)
     child_5_school_status = models.CharField(max_length=20, choices=SCHOOL_STATUS_CHOICES, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["member", "-created_at"], name="children_member_created_idx"),
+            models.Index(fields=["updated_at"], name="children_updated_idx"),
+        ]
+
     def __str__(self):
         return f"Household with {self.number_of_children} children"
 
@@ -213,5 +244,26 @@ class AnnualSelfHelpGroupData(BaseModel):
     other_social_need_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     others = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["group", "-created_at"],
+                include=["shg_capital", "expenditure_social_savings"],
+                name="groupdata_group_created_idx",
+            ),
+            models.Index(fields=["updated_at"], name="groupdata_updated_idx"),
+        ]
+
     def __str__(self):
         return self.name
+
+
+# A record received through the offline-sync ingest endpoint, keyed by the
+# client's idempotency key so replayed records are not stored twice
+class SyncSubmission(BaseModel):
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    record_type = models.CharField(max_length=50)
+    object_id = models.UUIDField()
+
+    def __str__(self):
+        return f"{self.record_type} {self.idempotency_key}"
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SixMonthDataViewSet, AnnualDataViewSet, AnnualChildrenStatusViewSet, AnnualSelfHelpGroupDataViewSet
+from .views import SixMonthDataViewSet, AnnualDataViewSet, AnnualChildrenStatusViewSet, AnnualSelfHelpGroupDataViewSet, SyncIngestView, CSVImportView
 
 router = DefaultRouter()
 router.register(r"six-month-data", SixMonthDataViewSet)
@@ -9,5 +9,7 @@ router.register(r"annual-children-status", AnnualChildrenStatusViewSet)
 router.register(r"annual-group-data", AnnualSelfHelpGroupDataViewSet)
 
 urlpatterns = [
+    path("sync/", SyncIngestView.as_view(), name="sync-ingest"),
+    path("import/<str:record_type>/", CSVImportView.as_view(), name="csv-import"),
     path("", include(router.urls)),
 ]
@@ -4,6 +4,15 @@ from .serializers import SixMonthDataSerializer, AnnualDataSerializer, AnnualChi
 from .pagination import CustomPageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+import io
+from django.db import IntegrityError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from cluster_management.models import Cluster
+from .ingest import ingest_submissions
+from .importer import IMPORT_TYPES, import_csv
 
 class SixMonthDataViewSet(ModelViewSet):
     queryset = SixMonthData.objects.all()
@@ -43,4 +52,54 @@ class AnnualSelfHelpGroupDataViewSet(ModelViewSet):
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['group_iga_code1','group', 'shg_capital', 'largest_loan_given','expenditure_social_savings' ]
     search_fields = ['group_iga_code1','group', 'shg_capital', 'largest_loan_given' ]
-    ordering_fields = ['created_at', 'updated_at' ]
\ No newline at end of file
+    ordering_fields = ['created_at', 'updated_at' ]
+
+
+class SyncIngestView(APIView):
+    """
+    Offline-sync upload: {"records": [{"type", "idempotency_key", "data"}, ...]}
+    with six_month, annual and children_status records mixed. Responds with
+    one result per record; replayed idempotency keys are not stored again.
+    """
+
+    def post(self, request):
+        try:
+            results = ingest_submissions(request.data.get("records"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # Another upload stored one of the keys meanwhile; a retry reports it as a duplicate
+            return Response({"error": "Records were stored concurrently; retry the batch."}, status=status.HTTP_409_CONFLICT)
+
+        counts = {state: sum(result["status"] == state for result in results) for state in ("created", "duplicate", "invalid")}
+        return Response({**counts, "results": results}, status=status.HTTP_200_OK)
+
+
+class CSVImportView(APIView):
+    """
+    Bulk import of a CSV upload (multipart field "file") of members or of
+    six_month, annual or children_status forms, see import_csv. An optional
+    cluster id resolves group names within that cluster only. Invalid rows
+    are reported by line number; the valid ones are imported regardless.
+    """
+
+    def post(self, request, record_type):
+        if record_type not in IMPORT_TYPES:
+            return Response({"error": f"Unknown record type '{record_type}'."}, status=status.HTTP_404_NOT_FOUND)
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload the CSV in the 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+        cluster = request.data.get("cluster")
+        if cluster:
+            try:
+                cluster = Cluster.objects.get(id=cluster)
+            except (Cluster.DoesNotExist, DjangoValidationError):
+                return Response({"error": "Cluster not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Rows are parsed straight from the uploaded (temporary) file as they are imported
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            report = import_csv(lines, record_type, cluster=cluster)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
@@ -17,5 +17,11 @@ class Attendance(BaseModel):
     member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name="attendances")
     attended = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["meeting", "member"], include=["attended"], name="attendance_meeting_member_idx"),
+            models.Index(fields=["member", "meeting"], include=["attended"], name="attendance_member_meeting_idx"),
+        ]
+
     def __str__(self):
         return f"{self.member} - {'Attended' if self.attended else 'Absent'}"